@@ -1,81 +1,72 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_geo
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
+TN_CENTER = bd_data.TN_CENTER
 
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
 
-TN_CENTER = [10.8, 78.7]
+# ╔══════════════════════════════════════════════════════════╗
+# ║  Bulk point → district assignment (STRtree)             ║
+# ╚══════════════════════════════════════════════════════════╝
+def assign_points_to_districts(lon, lat, district_geometries):
+    """
+    SPATIAL OP : STRtree over prepared district polygons, queried with all points at once
+    RETURNS    : int array — index into district_geometries for each point, -1 if outside all.
+    A point on a shared border is given to exactly one of the districts.
+    """
+    pt_idx, poly_idx = bd_geo.points_in_polygons(np.column_stack([lon, lat]), district_geometries)
 
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+    labels = np.full(len(lon), -1, dtype=np.int64)
+    labels[pt_idx] = poly_idx
+    return labels
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q1 — District Dead Zones (Point-in-Polygon Containment)║
-# ║  $geoWithin on district polygons                        ║
+# ║  Bulk STRtree labelling of every tower by district      ║
 # ╚══════════════════════════════════════════════════════════╝
-def query1_district_dead_zones():
+def query1_district_dead_zones(state="Tamil Nadu"):
     """
-    SPATIAL OP : $geoWithin  (point-in-polygon containment)
+    SPATIAL OP : point-in-polygon containment (one STRtree pass over all towers)
     QUESTION   : Which Tamil Nadu districts contain ZERO telecom towers?
     INSIGHT    : Entire administrative regions with no coverage — policy-level gap.
+    Pass state=None to scan every district in the collection (all of India).
     """
     print("\n[Q1] Scanning districts for zero-tower zones...")
-    tn_districts = list(districs.find({"properties.st_nm": "Tamil Nadu"}))
-    
+    bd_trace.phase("compute")
+    tn_districts = bd_data.load_districts(state)
+
+    tower_coords, _ = bd_data.load_tower_points()
+    labels = assign_points_to_districts(tower_coords[:, 0], tower_coords[:, 1], [d["geometry"] for d in tn_districts])
+    counts = np.bincount(labels[labels >= 0], minlength=len(tn_districts))
+
     results = []
-    for d in tn_districts:
-        count = towers.count_documents({
-            "geometry": {
-                "$geoWithin": {"$geometry": d["geometry"]}
-            }
-        })
+    for d, count in zip(tn_districts, counts):
         results.append({
             "district": d["properties"]["district"],
-            "tower_count": count,
+            "tower_count": int(count),
             "geometry": d["geometry"]
         })
     
     results.sort(key=lambda x: x["tower_count"])
     
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB positron")
-    
-    for r in results:
-        is_dead = r["tower_count"] == 0
-        color   = "#e74c3c" if is_dead else "#27ae60"
-        opacity = 0.7 if is_dead else 0.25
-        
-        folium.GeoJson(
-            r["geometry"],
-            style_function=lambda x, c=color, o=opacity: {
-                "fillColor": c, "fillOpacity": o,
-                "color": "#333", "weight": 0.8
-            },
-            tooltip=folium.Tooltip(
-                f"<b>{r['district']}</b><br>Towers: {r['tower_count']}"
-                + (" ⚠️ DEAD ZONE" if r["tower_count"] == 0 else "")
-            )
-        ).add_to(m)
+    bd_trace.phase("render")
+    m = bd_render.new_map()
+
+    # Dead zones first, so they survive the layer budget on very large states
+    bd_render.polygon_layer(
+        [r["geometry"] for r in results],
+        [{"fill_color": "#e74c3c" if r["tower_count"] == 0 else "#27ae60",
+          "fill_opacity": 0.7 if r["tower_count"] == 0 else 0.25,
+          "color": "#333", "weight": 0.8} for r in results],
+        tooltips=[f"<b>{r['district']}</b><br>Towers: {r['tower_count']}"
+                  + (" ⚠️ DEAD ZONE" if r["tower_count"] == 0 else "") for r in results],
+        name="Districts",
+    ).add_to(m)
     
     dead_count = sum(1 for r in results if r["tower_count"] == 0)
     
@@ -89,12 +80,12 @@ def query1_district_dead_zones():
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
     
-    m.save("q1_district_dead_zones.html")
+    bd_render.save_map(m, "q1_district_dead_zones.html")
     print(f"  Dead zone districts: {[r['district'] for r in results if r['tower_count'] == 0]}")
-    print("  ✅ Saved: q1_district_dead_zones.html")
     return results
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query1_district_dead_zones()
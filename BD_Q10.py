@@ -0,0 +1,98 @@
+import numpy as np
+import folium
+import bd_data
+import bd_render
+import bd_roads
+import bd_trace
+import bd_tiles
+
+TN_CENTER = bd_data.TN_CENTER
+
+
+# ╔══════════════════════════════════════════════════════════╗
+# ║  Q10 — Road Distance to the Nearest Tower              ║
+# ║  Multi-source Dijkstra over the road graph → tiles      ║
+# ╚══════════════════════════════════════════════════════════╝
+def query10_road_distance_heatmap(tiles=True, tile_dir="q10_road_distance_tiles", zooms=range(6, 13),
+                                  batch_size=50_000, vmax_km=30):
+    """
+    SPATIAL OP : Road graph (CSR, snapped nodes) + one multi-source Dijkstra from every tower
+    QUESTION   : How far is each settlement from its nearest tower ALONG THE ROADS?
+    INSIGHT    : Field-access view of coverage — in the Western Ghats and the delta the
+                 road distance is far longer than the straight line Q6 shows.
+    Settlements more than bd_roads.MAX_ACCESS_M from any road are "off the network"
+    and drawn at vmax_km.
+    """
+    print("\n[Q10] Computing road distance to the nearest tower...")
+    bd_trace.phase("compute")
+
+    tower_coords, _ = bd_data.load_tower_points()
+    graph = bd_data.load_road_graph()
+    field = bd_roads.tower_field(graph, tower_coords)
+
+    chunks = []
+    for coords, _, _, straight_m in bd_data.iter_settlement_nearest(batch_size):
+        _, road_m = bd_roads.lookup(field, coords)
+        chunks.append(np.column_stack([coords[:, 1], coords[:, 0], road_m / 1000.0, straight_m / 1000.0]))
+
+    # Columns: lat, lon, road distance (km, inf = off the network), straight-line distance (km)
+    road_data = np.vstack(chunks) if chunks else np.empty((0, 4))
+    on_network = np.isfinite(road_data[:, 2])
+    detour = road_data[on_network, 2] / np.maximum(road_data[on_network, 3], 1e-3)
+    n_off = int((~on_network).sum())
+    median_road = float(np.median(road_data[on_network, 2])) if on_network.any() else float("nan")
+    median_detour = float(np.median(detour)) if len(detour) else float("nan")
+    print(f"  Road graph: {len(graph['nodes']):,} nodes, {len(graph['indices']) // 2:,} edges")
+    print(f"  Median road distance: {median_road:.1f} km  |  median detour ×{median_detour:.2f}"
+          f"  |  off the road network: {n_off:,}")
+
+    # ── MAP ──────────────────────────────────────────────────
+    bd_trace.phase("render")
+    m = bd_render.new_map(tiles="CartoDB dark_matter")
+
+    if tiles:
+        n_tiles = bd_tiles.render_tile_pyramid(
+            road_data[:, 1], road_data[:, 0], np.minimum(road_data[:, 2], vmax_km),
+            tile_dir, zooms=zooms, vmax=vmax_km
+        )
+        folium.TileLayer(
+            tiles=tile_dir + "/{z}/{x}/{y}.png",
+            attr="Road distance to nearest tower",
+            name="Road distance to tower",
+            overlay=True,
+            min_zoom=min(zooms), max_native_zoom=max(zooms),
+        ).add_to(m)
+        print(f"  Rendered {n_tiles:,} tiles (z{min(zooms)}–z{max(zooms)}) into {tile_dir}/")
+
+    # Worst detours first — the ones kept if the layer hits its budget
+    worst = np.flatnonzero(on_network)[np.argsort(-detour, kind="stable")[:2000]]
+    bd_render.point_layer(
+        road_data[worst, 1], road_data[worst, 0],
+        {"radius": 3, "color": "#f1c40f", "fill_opacity": 0.8},
+        tooltips=[f"Road {r:.1f} km vs straight {s:.1f} km" for r, s in road_data[worst, 2:4].tolist()],
+        name="Worst detours", priority=True,
+    ).add_to(m)
+
+    legend = f"""
+    <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
+                background:#1a1a2e;color:white;padding:12px 16px;border-radius:8px;
+                font-family:sans-serif;font-size:13px'>
+      <b>Q10 — Road Distance to Nearest Tower</b><br>
+      Heat intensity = distance along the road network<br>
+      <span style='color:red'>■</span> ≥ {vmax_km} km by road, or off the network ({n_off:,})<br>
+      <span style='color:cyan'>■</span> Close by road<br>
+      <span style='color:#f1c40f'>●</span> Largest road / straight-line detours<br>
+      Median detour: ×{median_detour:.2f}
+    </div>"""
+    m.get_root().html.add_child(folium.Element(legend))
+
+    bd_render.save_map(m, "q10_road_distance_heatmap.html")
+    print(f"  Processed {len(road_data)} settlement road distances")
+    return road_data
+
+
+
+
+if __name__ == "__main__":
+    bd_data.print_summary()
+    query10_road_distance_heatmap()
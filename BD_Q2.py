@@ -1,111 +1,207 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
+import sys
+
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
-
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
+from shapely.geometry import shape
 
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
+import bd_data
+import bd_points
+import bd_render
+import bd_stream
+import bd_trace
+from BD_Q1 import assign_points_to_districts
 
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+TN_CENTER = bd_data.TN_CENTER
 
 
 # ╔══════════════════════════════════════════════════════════╗
-# ║  Q2 — True Uncovered Settlements (Buffer + Difference)  ║
-# ║  Union of tower buffers → settlements outside union     ║
+# ║  Q2 — True Uncovered Settlements (Nearest-Tower Radius) ║
+# ║  KD-tree over every tower → settlements beyond radius   ║
 # ╚══════════════════════════════════════════════════════════╝
-def query2_uncovered_settlements(radius_km=5):
+def query2_uncovered_settlements(radius_km=5, batch_size=50_000, max_map_points=50_000):
     """
-    SPATIAL OP : Buffer + unary_union + point-not-in-polygon (spatial difference)
+    SPATIAL OP : Nearest-neighbour radius test (KD-tree over all towers, metric coords)
     QUESTION   : Which residential settlements fall OUTSIDE all tower coverage zones?
     INSIGHT    : True last-mile gap — people with no tower within radius_km.
+    RETURNS    : (covered, uncovered) bd_points.PointStores — iterate for PointRow(lon, lat, id, name)
+    In streaming mode (bd_data.use_streaming) both are random samples of at most
+    max_map_points settlements; the counts still cover every settlement.
     """
     print(f"\n[Q2] Finding settlements outside {radius_km}km coverage bubble...")
-
-    # Sample TN towers (limit for performance)
-    tower_docs = list(towers.find({}, {"geometry": 1}).limit(3000))
-    tower_geoms = [shape(t["geometry"]) for t in tower_docs]
-
-    DEG = radius_km / 111.0
-    coverage_union = unary_union([g.buffer(DEG) for g in tower_geoms])
-
-    pop_docs = list(population.find({}, {"geometry": 1, "properties": 1}))
-
-    covered, uncovered = [], []
-    for p in pop_docs:
-        pt = shape(p["geometry"])
-        name = p.get("properties", {}).get("name", "Unknown")
-        entry = {"name": name, "coords": [pt.y, pt.x]}
-        if coverage_union.contains(pt):
-            covered.append(entry)
-        else:
-            uncovered.append(entry)
+    bd_trace.phase("compute")
+
+    # Every tower, coordinates only — one cursor pass
+    tower_lonlat, _ = bd_data.load_tower_points()
+    radius_m = radius_km * 1000.0
+
+    # Split each batch into two compact point-store row sets (24 bytes a settlement)
+    none = np.empty(0, dtype=bd_points.POINT_DTYPE)
+    covered, uncovered = bd_stream.keep(max_map_points, 0, none), bd_stream.keep(max_map_points, 1, none)
+    n_settlements, vocab = 0, []
+    for coords, names, _, dist in bd_data.iter_settlement_nearest(batch_size, names=True):
+        is_covered = dist <= radius_m
+        batch = bd_points.PointStore.from_columns(coords, names, first_id=n_settlements)
+        n_settlements += len(coords)
+        vocab = names.vocab
+        covered.add(batch.rows[is_covered])
+        uncovered.add(batch.rows[~is_covered])
+    n_covered, n_uncovered = covered.seen, uncovered.seen
+    covered, uncovered = bd_points.PointStore(covered.result(), vocab), bd_points.PointStore(uncovered.result(), vocab)
 
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB dark_matter")
-
-    # Coverage footprint
-    folium.GeoJson(
-        mapping(coverage_union),
-        style_function=lambda x: {
-            "fillColor": "#2ecc71", "fillOpacity": 0.15,
-            "color": "#2ecc71", "weight": 0.3
-        },
-        name="Coverage zone"
+    bd_trace.phase("render")
+    m = bd_render.new_map(tiles="CartoDB dark_matter")
+
+    # Covered — small green dots, drawn first so the red gaps sit on top
+    bd_render.point_layer(
+        covered.lon, covered.lat,
+        {"radius": 2, "color": "#2ecc71", "fill_opacity": 0.4},
+        name="Covered",
     ).add_to(m)
 
     # Uncovered settlements — red
-    for u in uncovered[:2000]:
-        folium.CircleMarker(
-            u["coords"], radius=3, color="#e74c3c",
-            fill=True, fill_opacity=0.8,
-            tooltip=f"⚠️ {u['name']} — NO coverage"
-        ).add_to(m)
-
-    # Covered — small green dots
-    for c in covered[:1000]:
-        folium.CircleMarker(
-            c["coords"], radius=2, color="#2ecc71",
-            fill=True, fill_opacity=0.4
-        ).add_to(m)
-
-    pct_uncovered = len(uncovered) / max(len(pop_docs), 1) * 100
+    # Tooltips are formatted once per distinct name, not once per settlement
+    bd_render.point_layer(
+        uncovered.lon, uncovered.lat,
+        {"radius": 3, "color": "#e74c3c", "fill_opacity": 0.8},
+        tooltips=uncovered.names.map(lambda name: f"⚠️ {name or 'Unknown'} — NO coverage"),
+        name="Uncovered",
+    ).add_to(m)
+
+    pct_uncovered = n_uncovered / max(n_settlements, 1) * 100
     legend = f"""
     <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
                 background:#1a1a2e;color:white;padding:12px 16px;border-radius:8px;
                 box-shadow:0 2px 8px rgba(0,0,0,0.5);font-family:sans-serif;font-size:13px'>
       <b>Q2 — True Uncovered Settlements</b><br>
-      <span style='color:#e74c3c'>●</span> No coverage within {radius_km}km — {len(uncovered):,} settlements ({pct_uncovered:.1f}%)<br>
-      <span style='color:#2ecc71'>●</span> Covered — {len(covered):,} settlements<br>
-      <span style='color:#2ecc71'>▬</span> Coverage footprint (union of all buffers)
+      <span style='color:#e74c3c'>●</span> No coverage within {radius_km}km — {n_uncovered:,} settlements ({pct_uncovered:.1f}%)<br>
+      <span style='color:#2ecc71'>●</span> Covered — {n_covered:,} settlements<br>
+      Towers considered: {len(tower_lonlat):,} (all)
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q2_uncovered_settlements.html")
-    print(f"  Covered: {len(covered):,}  |  Uncovered: {len(uncovered):,}  ({pct_uncovered:.1f}%)")
-    print("  ✅ Saved: q2_uncovered_settlements.html")
+    bd_render.save_map(m, "q2_uncovered_settlements.html")
+    print(f"  Covered: {n_covered:,}  |  Uncovered: {n_uncovered:,}  ({pct_uncovered:.1f}%)")
     return covered, uncovered
 
 
 
+# ╔══════════════════════════════════════════════════════════╗
+# ║  Q2 sweep — Coverage Curve over Many Radii              ║
+# ║  One nearest-distance pass → first covering radius      ║
+# ╚══════════════════════════════════════════════════════════╝
+def coverage_curve(batches, radii_m, n_groups=0):
+    """
+    SPATIAL OP : Nearest-tower distance → index of the first radius that covers it → cumulative counts
+    RETURNS    : (covered, totals) — covered[g, i] = settlements of group g within radii_m[i]
+                 (ascending) of a tower, totals[g] = settlements of group g. Row n_groups
+                 collects settlements outside every group.
+    batches yields (dist_m, group) arrays, group in [-1, n_groups). One bincount per batch
+    whatever the number of radii; memory is groups × radii.
+    """
+    radii_m = np.asarray(radii_m, dtype=float)
+    k = len(radii_m)
+    counts = np.zeros((n_groups + 1, k + 1), dtype=np.int64)
+    for dist_m, group in batches:
+        first = np.searchsorted(radii_m, dist_m, side="left")     # k = beyond every radius
+        row = np.where(group >= 0, group, n_groups)
+        counts += np.bincount(row * (k + 1) + first, minlength=counts.size).reshape(counts.shape)
+    return np.cumsum(counts[:, :k], axis=1), counts.sum(axis=1)
+
+
+def query2_coverage_curve(radii_km=range(1, 31), state="Tamil Nadu", batch_size=50_000, report_km=5):
+    """
+    SPATIAL OP : One nearest-neighbour pass (KD-tree) + STRtree district labels, folded per radius
+    QUESTION   : How does the share of uncovered settlements fall as the coverage radius grows?
+    INSIGHT    : Where the curve flattens, more radius buys little — those districts need towers.
+    RETURNS    : {"radii_km", "uncovered_pct" (every settlement, as Q2 counts them), "n_settlements",
+                  "state_uncovered_pct", "state_settlements" (only those inside state's districts),
+                  "districts": [{"district", "settlements", "uncovered_pct"}]} — percentages per radius
+    Costs one Q2 run whatever the number of radii (plus the district lookup), and streams
+    in constant memory.
+    """
+    radii_km = np.unique(np.asarray(list(radii_km), dtype=float))
+    print(f"\n[Q2] Coverage curve over {len(radii_km)} radii ({radii_km[0]:g}–{radii_km[-1]:g} km)...")
+    bd_trace.phase("compute")
+
+    districts = bd_data.load_districts(state)
+    geoms = [shape(d["geometry"]) for d in districts]
+
+    def batches():
+        for coords, _, _, dist in bd_data.iter_settlement_nearest(batch_size):
+            yield dist, assign_points_to_districts(coords[:, 0], coords[:, 1], geoms)
+
+    covered, totals = coverage_curve(batches(), radii_km * 1000.0, len(districts))
+    n_settlements = int(totals.sum())
+    curve = 100.0 * (1.0 - covered.sum(axis=0) / max(n_settlements, 1))
+    n_state = int(totals[:-1].sum())
+    state_curve = 100.0 * (1.0 - covered[:-1].sum(axis=0) / max(n_state, 1))
+    district_pct = 100.0 * (1.0 - covered[:-1] / np.maximum(totals[:-1, None], 1))
+
+    results = [
+        {"district": d["properties"]["district"], "settlements": int(t), "uncovered_pct": pct.tolist()}
+        for d, t, pct in zip(districts, totals[:-1].tolist(), district_pct)
+    ]
+
+    print(f"  Settlements: {n_settlements:,} ({n_state:,} inside {len(districts)} districts)")
+    cells = [f"{r:g} km {p:.1f}%" for r, p in zip(radii_km.tolist(), curve.tolist())]
+    for start in range(0, len(cells), 6):
+        print("  " + "  |  ".join(cells[start:start + 6]))
+
+    # ── MAP ──────────────────────────────────────────────────
+    bd_trace.phase("render")
+    m = bd_render.new_map()
+
+    ref = int(np.argmin(np.abs(radii_km - report_km)))
+    shown = [i for i, r in enumerate(radii_km.tolist()) if r in (1, 2, 5, 10, 20, 30)] or list(range(len(radii_km)))
+
+    def district_style(pct):
+        color = "#e74c3c" if pct > 50 else "#f39c12" if pct > 20 else "#27ae60"
+        return {"fill_color": color, "fill_opacity": 0.6, "color": "#333", "weight": 0.8}
+
+    # Worst districts first, so they survive the layer budget on very large states
+    order = sorted(range(len(results)), key=lambda k: -district_pct[k, ref])
+    bd_render.polygon_layer(
+        [districts[k]["geometry"] for k in order],
+        [district_style(district_pct[k, ref]) for k in order],
+        tooltips=[f"<b>{results[k]['district']}</b> — {results[k]['settlements']:,} settlements<br>"
+                  + "<br>".join(f"{radii_km[i]:g} km: {district_pct[k, i]:.1f}% uncovered" for i in shown)
+                  for k in order],
+        name=f"% uncovered at {radii_km[ref]:g} km",
+    ).add_to(m)
+
+    # All-settlement curve (Q2's counts) as an inline sparkline: x = radius, y = % uncovered
+    x = (radii_km - radii_km[0]) / max(radii_km[-1] - radii_km[0], 1e-9) * 160
+    points = " ".join(f"{a:.1f},{60 - p * 0.6:.1f}" for a, p in zip(x.tolist(), curve.tolist()))
+    legend = f"""
+    <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
+                background:white;padding:12px 16px;border-radius:8px;
+                box-shadow:0 2px 8px rgba(0,0,0,0.2);font-family:sans-serif;font-size:13px'>
+      <b>Q2 — Coverage Curve</b><br>
+      % of settlements with no tower within the radius<br>
+      <svg width='160' height='60' style='background:#f4f4f4;margin:4px 0'>
+        <polyline points='{points}' fill='none' stroke='#e74c3c' stroke-width='2'/>
+      </svg><br>
+      {radii_km[0]:g} km: {curve[0]:.1f}%  →  {radii_km[-1]:g} km: {curve[-1]:.1f}%<br>
+      Districts at {radii_km[ref]:g} km:
+      <span style='color:#e74c3c'>■</span> &gt;50%
+      <span style='color:#f39c12'>■</span> &gt;20%
+      <span style='color:#27ae60'>■</span> ≤20% uncovered
+    </div>"""
+    m.get_root().html.add_child(folium.Element(legend))
+
+    bd_render.save_map(m, "q2_coverage_curve.html")
+    worst = [results[k] for k in order[:5]]
+    print(f"  Least covered at {radii_km[ref]:g} km: "
+          + ", ".join(f"{r['district']} ({r['uncovered_pct'][ref]:.0f}%)" for r in worst))
+    return {"radii_km": radii_km.tolist(), "uncovered_pct": curve.tolist(), "n_settlements": n_settlements,
+            "state_uncovered_pct": state_curve.tolist(), "state_settlements": n_state, "districts": results}
+
+
+
 if __name__ == "__main__":
-    query2_uncovered_settlements()
+    bd_data.print_summary()
+    if "--sweep" in sys.argv[1:]:
+        query2_coverage_curve()
+    else:
+        query2_uncovered_settlements()
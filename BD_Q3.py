@@ -1,93 +1,67 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
-
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
-
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+TN_CENTER = bd_data.TN_CENTER
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q3 — Redundant Tower Pairs (Spatial Self-Join)         ║
-# ║  $near on same collection — towers within 2 km          ║
+# ║  KD-tree pair join over all towers — within 2 km        ║
 # ╚══════════════════════════════════════════════════════════╝
-def query3_redundant_towers(dist_m=2000):
+def query3_redundant_towers(dist_m=2000, max_map_pairs=5000):
     """
-    SPATIAL OP : $near / $geoNear — spatial self-join
+    SPATIAL OP : KD-tree query_pairs — full spatial self-join in metric coordinates
     QUESTION   : Which towers are so close to each other that their coverage overlaps wastefully?
     INSIGHT    : Over-investment map — where resources are duplicated instead of extended.
     """
     print(f"\n[Q3] Finding tower pairs within {dist_m}m of each other...")
+    bd_trace.phase("compute")
 
-    sample = list(towers.find({}, {"geometry": 1}).limit(1000))
-    pairs = []
+    coords, tower_ids = bd_data.load_tower_points()
+
+    # $minDistance 1 in the old $near query — co-located duplicates are not "pairs"
+    i, j, dist = bd_data.close_tower_pairs(dist_m, min_dist_m=1)
+    neighbor_count = np.bincount(np.concatenate([i, j]), minlength=len(coords))
 
-    for t in sample:
-        neighbors = list(towers.find({
-            "geometry": {
-                "$near": {
-                    "$geometry": t["geometry"],
-                    "$maxDistance": dist_m,
-                    "$minDistance": 1
-                }
-            },
-            "_id": {"$ne": t["_id"]}
-        }).limit(5))
-
-        for n in neighbors:
-            c1 = t["geometry"]["coordinates"]
-            c2 = n["geometry"]["coordinates"]
-            pairs.append({
-                "tower": [c1[1], c1[0]],
-                "neighbor": [c2[1], c2[0]],
-                "neighbor_count": len(neighbors)
-            })
+    lonlat = coords.tolist()
+    pairs = []
+    for a, b, d in zip(i.tolist(), j.tolist(), dist.tolist()):
+        pairs.append({
+            "tower_id": tower_ids[a],
+            "neighbor_id": tower_ids[b],
+            "tower": [lonlat[a][1], lonlat[a][0]],
+            "neighbor": [lonlat[b][1], lonlat[b][0]],
+            "dist_m": round(d, 1),
+            "neighbor_count": int(neighbor_count[a])
+        })
+
+    redundant = np.flatnonzero(neighbor_count)
 
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB positron")
-
-    seen = set()
-    for p in pairs:
-        key = (round(p["tower"][0],4), round(p["tower"][1],4))
-        if key in seen:
-            continue
-        seen.add(key)
-
-        # Line connecting redundant pair
-        folium.PolyLine(
-            [p["tower"], p["neighbor"]],
-            color="#e74c3c", weight=1.5, opacity=0.5
-        ).add_to(m)
-
-        # Tower dot sized by neighbor count
-        folium.CircleMarker(
-            p["tower"],
-            radius=3 + p["neighbor_count"],
-            color="#c0392b", fill=True, fill_opacity=0.7,
-            tooltip=f"Redundant tower — {p['neighbor_count']} neighbor(s) within {dist_m}m"
-        ).add_to(m)
+    bd_trace.phase("render")
+    m = bd_render.new_map()
+
+    # Closest pairs first — those are the most wasteful overlaps
+    a, b = i[:max_map_pairs], j[:max_map_pairs]
+    bd_render.line_layer(
+        coords[a, 0], coords[a, 1], coords[b, 0], coords[b, 1],
+        {"color": "#e74c3c", "weight": 1.5, "opacity": 0.5},
+        tooltips=[f"{d:.0f} m apart" for d in dist[:max_map_pairs].tolist()],
+        name="Redundant pairs",
+    ).add_to(m)
+
+    # Tower dot sized by neighbor count, most crowded first
+    top = redundant[np.argsort(-neighbor_count[redundant], kind="stable")][:max_map_pairs]
+    top_counts = neighbor_count[top].tolist()
+    bd_render.point_layer(
+        coords[top, 0], coords[top, 1],
+        [{"radius": 3 + min(n, 12), "color": "#c0392b", "fill_opacity": 0.7} for n in top_counts],
+        tooltips=[f"Redundant tower — {n} neighbor(s) within {dist_m}m" for n in top_counts],
+        name="Redundant towers", priority=True,
+    ).add_to(m)
 
     legend = f"""
     <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
@@ -96,17 +70,18 @@ def query3_redundant_towers(dist_m=2000):
       <b>Q3 — Redundant Tower Pairs</b><br>
       <span style='color:#e74c3c'>—</span> Towers within {dist_m}m (wasted overlap)<br>
       Larger dot = more redundant neighbors<br>
-      Total redundant pairs found: {len(seen):,}
+      Total redundant pairs found: {len(pairs):,}<br>
+      Towers with a redundant neighbor: {len(redundant):,}
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q3_redundant_towers.html")
-    print(f"  Redundant tower positions found: {len(seen):,}")
-    print("  ✅ Saved: q3_redundant_towers.html")
+    bd_render.save_map(m, "q3_redundant_towers.html")
+    print(f"  Redundant pairs: {len(pairs):,}  |  Towers involved: {len(redundant):,}")
     return pairs
 
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query3_redundant_towers()
@@ -1,74 +1,58 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
+from shapely.geometry import shape
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
-
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
-
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+TN_CENTER = bd_data.TN_CENTER
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q4 — District Centroid Remoteness (KNN + Aggregation)  ║
-# ║  $near from centroid of each polygon                    ║
+# ║  One batched KD-tree KNN from every polygon centroid    ║
 # ╚══════════════════════════════════════════════════════════╝
-def query4_district_centroid_remoteness():
+def query4_district_centroid_remoteness(state="Tamil Nadu", representative_points=False):
     """
-    SPATIAL OP : Centroid computation + $near (KNN search)
+    SPATIAL OP : Centroid computation + batched KNN (in-memory KD-tree, metres)
     QUESTION   : Which district centroid is furthest from any tower?
     INSIGHT    : Ranks district administrative centres by connectivity — useful for policy targeting.
+    representative_points=True uses a point guaranteed inside each polygon instead of
+    the centroid (matters for crescent-shaped coastal districts). state=None ranks all districts.
     """
     print("\n[Q4] Computing nearest tower to each district centroid...")
+    bd_trace.phase("compute")
 
-    tn_districts = list(districs.find({"properties.st_nm": "Tamil Nadu"}))
-    results = []
+    tn_districts = bd_data.load_districts(state)
+
+    tower_coords, tower_ids = bd_data.load_tower_points()
 
+    anchors = []
     for d in tn_districts:
         poly = shape(d["geometry"])
-        centroid = poly.centroid
-
-        nearest = towers.find_one({
-            "geometry": {
-                "$near": {
-                    "$geometry": {"type": "Point", "coordinates": [centroid.x, centroid.y]}
-                }
-            }
-        })
+        pt = poly.representative_point() if representative_points else poly.centroid
+        anchors.append([pt.x, pt.y])
+    anchors = np.array(anchors, dtype=float).reshape(-1, 2)
+
+    nearest_idx, dist_m = bd_data.nearest_towers(anchors)
 
-        if nearest:
-            t_pt = shape(nearest["geometry"])
-            dist_km = centroid.distance(t_pt) * 111
-            results.append({
-                "district": d["properties"]["district"],
-                "centroid": [centroid.y, centroid.x],
-                "nearest_tower": [t_pt.y, t_pt.x],
-                "dist_km": round(dist_km, 2)
-            })
+    results = []
+    for d, (cx, cy), t, dm in zip(tn_districts, anchors.tolist(), nearest_idx.tolist(), dist_m.tolist()):
+        if t < 0:
+            continue
+        tx, ty = tower_coords[t].tolist()
+        results.append({
+            "district": d["properties"]["district"],
+            "centroid": [cy, cx],
+            "nearest_tower_id": tower_ids[t],
+            "nearest_tower": [ty, tx],
+            "dist_km": round(dm / 1000, 2)
+        })
 
     results.sort(key=lambda x: x["dist_km"], reverse=True)
 
     # ── MAP ──────────────────────────────────────────────────
+    bd_trace.phase("render")
     m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB positron")
 
     max_d = max(r["dist_km"] for r in results) if results else 1
@@ -107,15 +91,15 @@ def query4_district_centroid_remoteness():
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q4_district_centroid_remoteness.html")
+    bd_render.save_map(m, "q4_district_centroid_remoteness.html")
     print("  Top 5 most remote districts:")
     for r in results[:5]:
         print(f"    {r['district']}: {r['dist_km']} km")
-    print("  ✅ Saved: q4_district_centroid_remoteness.html")
     return results
 
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query4_district_centroid_remoteness()
@@ -1,104 +1,85 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
+TN_CENTER = bd_data.TN_CENTER
 
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
 
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+# ╔══════════════════════════════════════════════════════════╗
+# ║  Bulk settlement → nearest-tower load assignment        ║
+# ╚══════════════════════════════════════════════════════════╝
+def compute_tower_loads(n_towers, nearest_batches, max_dist_m=5000):
+    """
+    Assign every settlement to its nearest tower within max_dist_m, batch by batch.
+    nearest_batches yields (coords, names, idx, dist_m) chunks, as
+    bd_data.iter_settlement_nearest does.
+    Returns (load, n_settlements, n_unserved) — load is an int array of length n_towers.
+    """
+    load = np.zeros(n_towers, dtype=np.int64)
+    n_settlements = n_unserved = 0
+    for _, _, idx, dist in nearest_batches:
+        served = dist <= max_dist_m
+        load += np.bincount(idx[served], minlength=n_towers)
+        n_settlements += len(idx)
+        n_unserved += int((~served).sum())
+    return load, n_settlements, n_unserved
 
 
 # ╔══════════════════════════════════════════════════════════╗
-# ║  Q5 — Tower Load Hotspots (Aggregation Pipeline)        ║
-# ║  $geoNear inside $lookup aggregation                    ║
+# ║  Q5 — Tower Load Hotspots (Nearest-Tower Assignment)    ║
+# ║  Every settlement → its nearest tower within 5 km       ║
 # ╚══════════════════════════════════════════════════════════╝
-def query5_tower_load_hotspots():
+def query5_tower_load_hotspots(max_dist_m=5000, batch_size=50_000):
     """
-    SPATIAL OP : MongoDB aggregation pipeline with $geoNear
+    SPATIAL OP : Bulk nearest-neighbour assignment (KD-tree, metric coords) + bincount
     QUESTION   : Which towers serve the most settlements? (Network congestion risk)
     INSIGHT    : Overloaded towers need hardware upgrades or additional towers nearby.
     """
-    print("\n[Q5] Computing tower load via aggregation pipeline...")
-
-    # For each settlement, find nearest tower within 5km
-    pipeline = [
-        {
-            "$geoNear": {
-                "near": {"type": "Point", "coordinates": [80.2707, 13.0827]},
-                "distanceField": "dist_to_seed",
-                "maxDistance": 600000,  # broad TN filter
-                "spherical": True
-            }
-        },
-        {"$limit": 3000}
-    ]
-
-    # Better approach: for each settlement find its nearest tower
-    pop_sample = list(population.find({}, {"geometry": 1, "properties": 1}).limit(2000))
-
-    tower_load = {}
+    print("\n[Q5] Computing tower load over all settlements...")
+    bd_trace.phase("compute")
 
-    for p in pop_sample:
-        nearest_t = towers.find_one({
-            "geometry": {
-                "$near": {
-                    "$geometry": p["geometry"],
-                    "$maxDistance": 5000  # 5km
-                }
-            }
-        })
+    tower_coords, tower_ids = bd_data.load_tower_points()
 
-        if nearest_t:
-            tid = str(nearest_t["_id"])
-            coords = nearest_t["geometry"]["coordinates"]
-            if tid not in tower_load:
-                tower_load[tid] = {"coords": [coords[1], coords[0]], "count": 0}
-            tower_load[tid]["count"] += 1
+    load, n_settlements, n_unserved = compute_tower_loads(
+        len(tower_coords), bd_data.iter_settlement_nearest(batch_size), max_dist_m=max_dist_m
+    )
 
-    sorted_towers = sorted(tower_load.values(), key=lambda x: x["count"], reverse=True)
+    lonlat = tower_coords.tolist()
+    sorted_towers = [
+        {"tower_id": tower_ids[k],
+         "coords": [lonlat[k][1], lonlat[k][0]],
+         "count": int(load[k])}
+        for k in np.argsort(-load, kind="stable") if load[k] > 0
+    ]
+    print(f"  Settlements assigned: {n_settlements - n_unserved:,} / {n_settlements:,}"
+          f"  ({n_unserved:,} beyond {max_dist_m / 1000:g}km of any tower)")
 
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB positron")
+    bd_trace.phase("render")
+    m = bd_render.new_map()
 
     max_load = max((t["count"] for t in sorted_towers), default=1)
 
-    for t in sorted_towers:
-        ratio = t["count"] / max_load
-        radius = 4 + int(ratio * 18)
-
+    def load_style(count):
+        ratio = count / max_load
         if ratio > 0.66:
             color = "#e74c3c"   # overloaded
         elif ratio > 0.33:
             color = "#f39c12"   # moderate
         else:
             color = "#27ae60"   # low load
+        return {"radius": 4 + int(ratio * 18), "color": color, "fill_opacity": 0.7}
 
-        folium.CircleMarker(
-            t["coords"], radius=radius,
-            color=color, fill=True, fill_opacity=0.7,
-            tooltip=f"Tower load: {t['count']} settlements depend on this tower"
-        ).add_to(m)
+    # Busiest towers first — they are the ones kept if the layer hits its budget
+    latlon = np.array([t["coords"] for t in sorted_towers]).reshape(-1, 2)
+    bd_render.point_layer(
+        latlon[:, 1], latlon[:, 0],
+        [load_style(t["count"]) for t in sorted_towers],
+        tooltips=[f"Tower load: {t['count']} settlements depend on this tower" for t in sorted_towers],
+        name="Tower load", priority=True,
+    ).add_to(m)
 
     legend = f"""
     <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
@@ -113,13 +94,13 @@ def query5_tower_load_hotspots():
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q5_tower_load_hotspots.html")
-    print(f"  Most loaded tower serves: {sorted_towers[0]['count']} settlements")
-    print("  ✅ Saved: q5_tower_load_hotspots.html")
+    bd_render.save_map(m, "q5_tower_load_hotspots.html")
+    print(f"  Most loaded tower serves: {max_load} settlements")
     return sorted_towers
 
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query5_tower_load_hotspots()
@@ -1,74 +1,84 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_render
+import bd_stream
+import bd_trace
+import bd_tiles
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
-
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
-
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+TN_CENTER = bd_data.TN_CENTER
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q6 — Nearest Tower Distance Heatmap                   ║
-# ║  $near KNN for every settlement → distance heatmap      ║
+# ║  Bulk KNN for every settlement → raster tile pyramid    ║
 # ╚══════════════════════════════════════════════════════════╝
-def query6_distance_heatmap():
+def query6_distance_heatmap(tiles=True, tile_dir="q6_distance_tiles", zooms=range(6, 13),
+                            batch_size=50_000, max_heatmap_points=3000):
     """
-    SPATIAL OP : $near KNN search for every settlement point
+    SPATIAL OP : Batched KNN (KD-tree, metres) for every settlement point
     QUESTION   : What is the spatial distribution of distance-to-nearest-tower across TN?
     INSIGHT    : Continuous surface view of coverage quality — hot = far from tower.
+    tiles=True pre-renders the surface as a PNG tile pyramid (zooms) served through a
+    TileLayer; tiles=False falls back to a browser-side HeatMap of the first points.
+    In streaming mode (bd_data.use_streaming) memory stays bounded: tiles are folded
+    per pixel as batches arrive and only a random max_heatmap_points sample is kept.
+    Returns [lat, lon, distance km capped at 30] rows (the median uses uncapped distances).
+    Under bd_run --incremental the pyramid bd_incremental keeps current is copied
+    into tile_dir instead of being rendered (when its zooms match).
     """
     print("\n[Q6] Building distance-to-nearest-tower heatmap...")
-
-    pop_sample = list(population.find({}, {"geometry": 1}).limit(3000))
-    heatmap_data = []
-
-    for p in pop_sample:
-        nearest = towers.find_one({
-            "geometry": {
-                "$near": {"$geometry": p["geometry"]}
-            }
-        })
-
-        if nearest:
-            p_coord = p["geometry"]["coordinates"]
-            t_coord = nearest["geometry"]["coordinates"]
-            dist_km = math.sqrt((p_coord[0]-t_coord[0])**2 + (p_coord[1]-t_coord[1])**2) * 111
-            # Weight heatmap by distance (farther = hotter)
-            heatmap_data.append([p_coord[1], p_coord[0], min(dist_km, 30)])
+    bd_trace.phase("compute")
+
+    # Running aggregates: per-pixel tile maxima, a 100 m distance histogram and the
+    # rows themselves (all of them, or a bounded sample when streaming)
+    maintained = bd_data.primed("distance_tiles") if tiles else None
+    if maintained and (maintained["zooms"] != list(zooms) or maintained["vmax"] != 30):
+        maintained = None
+    pixels = bd_tiles.PixelMax(max(zooms), vmax=30) if tiles and not maintained else None
+    hist = bd_stream.Histogram(np.arange(0.0, 30.05, 0.1))
+    rows = bd_stream.keep(max_heatmap_points, empty=np.empty((0, 3)))
+    for coords, _, _, dist_m in bd_data.iter_settlement_nearest(batch_size):
+        dist_km = dist_m / 1000.0
+        if pixels is not None:
+            pixels.add(coords[:, 0], coords[:, 1], dist_km)
+        hist.add(dist_km)
+        rows.add(np.column_stack([coords[:, 1], coords[:, 0], np.minimum(dist_km, 30)]))
+
+    # Columns: lat, lon, distance to nearest tower (km, capped at 30 like the colour scale)
+    heatmap_data = rows.result()
+    median_km = hist.quantile(0.5) if hist.seen else float("nan")
 
     # ── MAP ──────────────────────────────────────────────────
+    bd_trace.phase("render")
     m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB dark_matter")
 
-    HeatMap(
-        heatmap_data,
-        min_opacity=0.3,
-        max_val=30,
-        radius=18,
-        blur=12,
-        gradient={0.2: "blue", 0.4: "cyan", 0.6: "yellow", 0.8: "orange", 1.0: "red"}
-    ).add_to(m)
+    if tiles:
+        if maintained:
+            n_tiles = bd_tiles.copy_pyramid(maintained["dir"], tile_dir)
+        else:
+            n_tiles = pixels.render(tile_dir, zooms=zooms)
+        folium.TileLayer(
+            tiles=tile_dir + "/{z}/{x}/{y}.png",
+            attr="Distance to nearest tower",
+            name="Distance to tower",
+            overlay=True,
+            min_zoom=min(zooms), max_native_zoom=max(zooms),
+        ).add_to(m)
+        print(f"  {'Copied maintained' if maintained else 'Rendered'} {n_tiles:,} tiles "
+              f"(z{min(zooms)}–z{max(zooms)}) into {tile_dir}/")
+    else:
+        from folium.plugins import HeatMap
+
+        sample = heatmap_data[:max_heatmap_points]
+        HeatMap(
+            sample.tolist(),
+            min_opacity=0.3,
+            max_val=30,
+            radius=18,
+            blur=12,
+            gradient={0.2: "blue", 0.4: "cyan", 0.6: "yellow", 0.8: "orange", 1.0: "red"}
+        ).add_to(m)
 
     legend = """
     <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
@@ -82,13 +92,13 @@ def query6_distance_heatmap():
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q6_distance_heatmap.html")
-    print(f"  Processed {len(heatmap_data)} settlement distances")
-    print("  ✅ Saved: q6_distance_heatmap.html")
+    bd_render.save_map(m, "q6_distance_heatmap.html")
+    print(f"  Processed {hist.seen} settlement distances  |  median to nearest tower ≈ {median_km:.1f} km")
     return heatmap_data
 
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query6_distance_heatmap()
@@ -1,45 +1,57 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_geo
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
+TN_CENTER = bd_data.TN_CENTER
 
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
 
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+# ╔══════════════════════════════════════════════════════════╗
+# ║  Region stats — one labelling pass per collection       ║
+# ╚══════════════════════════════════════════════════════════╝
+def region_stats(regions, batch_size=50_000):
+    """
+    SPATIAL OP : bulk point-in-polygon (STRtree) over any number of named regions
+    RETURNS    : {name: {"towers": int, "settlements": int, "tower_coords": (k, 2) [lon, lat]}}
+    Towers and settlements are each read exactly once, coordinates only.
+    A point on a border shared by two regions counts towards both, like $geoWithin.
+    """
+    names = list(regions)
+    geoms = [regions[n] for n in names]
+
+    tower_coords, _ = bd_data.load_tower_points()
+    t_pt, t_reg = bd_geo.points_in_polygons(tower_coords, geoms)
+    tower_counts = np.bincount(t_reg, minlength=len(names))
+
+    pop_counts = np.zeros(len(names), dtype=np.int64)
+    for coords, _ in bd_data.iter_settlement_batches(batch_size):
+        _, p_reg = bd_geo.points_in_polygons(coords, geoms)
+        pop_counts += np.bincount(p_reg, minlength=len(names))
+
+    return {
+        name: {
+            "towers": int(tower_counts[k]),
+            "settlements": int(pop_counts[k]),
+            "tower_coords": tower_coords[t_pt[t_reg == k]],
+        }
+        for k, name in enumerate(names)
+    }
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q7 — Coastal vs Inland Tower Density                  ║
-# ║  Custom polygon region query ($geoWithin)               ║
+# ║  Custom polygon regions — single region_stats pass      ║
 # ╚══════════════════════════════════════════════════════════╝
 def query7_coastal_vs_inland():
     """
-    SPATIAL OP : $geoWithin on custom-defined region polygons
+    SPATIAL OP : point-in-polygon on custom-defined region polygons (one pass per collection)
     QUESTION   : Is tower density different along the Tamil Nadu coast vs inland?
     INSIGHT    : Coastal areas may be underserved due to difficult terrain (fishermen, tourists).
     """
     print("\n[Q7] Comparing coastal vs inland tower density...")
+    bd_trace.phase("compute")
 
     # Tamil Nadu coast is roughly east of longitude 79.5
     # Define coastal strip: a bounding box from coast to 80km inland
@@ -60,43 +72,32 @@ def query7_coastal_vs_inland():
         ]]
     }
 
-    coastal_towers = towers.count_documents({
-        "geometry": {"$geoWithin": {"$geometry": coastal_polygon}}
-    })
-    inland_towers = towers.count_documents({
-        "geometry": {"$geoWithin": {"$geometry": inland_polygon}}
-    })
-    coastal_pop = population.count_documents({
-        "geometry": {"$geoWithin": {"$geometry": coastal_polygon}}
-    })
-    inland_pop = population.count_documents({
-        "geometry": {"$geoWithin": {"$geometry": inland_polygon}}
-    })
+    stats = region_stats({"coastal": coastal_polygon, "inland": inland_polygon})
+    coastal_towers, coastal_pop = stats["coastal"]["towers"], stats["coastal"]["settlements"]
+    inland_towers, inland_pop = stats["inland"]["towers"], stats["inland"]["settlements"]
 
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB positron")
+    bd_trace.phase("render")
+    m = bd_render.new_map()
 
     # Shade regions
-    folium.GeoJson(coastal_polygon, style_function=lambda x: {
-        "fillColor": "#3498db", "fillOpacity": 0.15,
-        "color": "#2980b9", "weight": 2
-    }, tooltip=f"Coastal belt — {coastal_towers} towers / {coastal_pop} settlements").add_to(m)
-
-    folium.GeoJson(inland_polygon, style_function=lambda x: {
-        "fillColor": "#27ae60", "fillOpacity": 0.15,
-        "color": "#219a52", "weight": 2
-    }, tooltip=f"Inland — {inland_towers} towers / {inland_pop} settlements").add_to(m)
-
-    # Plot towers in each zone
-    for t in towers.find({"geometry": {"$geoWithin": {"$geometry": coastal_polygon}}}, {"geometry": 1}):
-        c = t["geometry"]["coordinates"]
-        folium.CircleMarker([c[1], c[0]], radius=2, color="#2980b9",
-                             fill=True, fill_opacity=0.6).add_to(m)
-
-    for t in towers.find({"geometry": {"$geoWithin": {"$geometry": inland_polygon}}}, {"geometry": 1}):
-        c = t["geometry"]["coordinates"]
-        folium.CircleMarker([c[1], c[0]], radius=2, color="#219a52",
-                             fill=True, fill_opacity=0.6).add_to(m)
+    bd_render.polygon_layer(
+        [coastal_polygon, inland_polygon],
+        [{"fill_color": "#3498db", "fill_opacity": 0.15, "color": "#2980b9", "weight": 2},
+         {"fill_color": "#27ae60", "fill_opacity": 0.15, "color": "#219a52", "weight": 2}],
+        tooltips=[f"Coastal belt — {coastal_towers} towers / {coastal_pop} settlements",
+                  f"Inland — {inland_towers} towers / {inland_pop} settlements"],
+        name="Regions",
+    ).add_to(m)
+
+    # Plot towers in each zone (evenly thinned if a region exceeds the layer budget)
+    for region, color in (("coastal", "#2980b9"), ("inland", "#219a52")):
+        pts = stats[region]["tower_coords"]
+        bd_render.point_layer(
+            pts[:, 0], pts[:, 1],
+            {"radius": 2, "color": color, "fill_opacity": 0.6},
+            name=f"{region.title()} towers",
+        ).add_to(m)
 
     c_ratio = coastal_pop / max(coastal_towers, 1)
     i_ratio = inland_pop  / max(inland_towers,  1)
@@ -113,13 +114,14 @@ def query7_coastal_vs_inland():
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q7_coastal_vs_inland.html")
+    bd_render.save_map(m, "q7_coastal_vs_inland.html")
     print(f"  Coastal: {coastal_towers} towers, {coastal_pop} settlements ({c_ratio:.1f}x ratio)")
     print(f"  Inland : {inland_towers} towers, {inland_pop} settlements ({i_ratio:.1f}x ratio)")
-    print("  ✅ Saved: q7_coastal_vs_inland.html")
+    return stats
 
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query7_coastal_vs_inland()
@@ -1,114 +1,107 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
+from shapely.geometry import shape
 from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
+import shapely
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import bd_data
+import bd_geo
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
-
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
-
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+TN_CENTER = bd_data.TN_CENTER
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q8 — Tower Voronoi Coverage Zones (Spatial Partition) ║
-# ║  Voronoi tessellation on tower points                   ║
+# ║  Voronoi on all towers, clipped to the state boundary   ║
 # ╚══════════════════════════════════════════════════════════╝
-def query8_voronoi_coverage_zones():
+def query8_voronoi_coverage_zones(state="Tamil Nadu", batch_size=50_000, max_map_zones=500):
     """
     SPATIAL OP : Voronoi tessellation (spatial partitioning) + settlements per zone
     QUESTION   : If each settlement connects to its nearest tower, what does each
                  tower's natural service area look like? Which zone is overloaded?
     INSIGHT    : Natural service areas — more realistic than fixed-radius buffers.
                  Towers with huge zones + many settlements need splitting.
+    Settlement-in-cell is the same as nearest-tower, so zone counts come from one
+    batched KD-tree pass instead of testing every settlement against every cell.
     """
     print("\n[Q8] Building Voronoi coverage zones from tower positions...")
-
-    from scipy.spatial import Voronoi
-
-    tower_sample = list(towers.find({}, {"geometry": 1}).limit(200))
-    tower_coords = np.array([
-        [t["geometry"]["coordinates"][0], t["geometry"]["coordinates"][1]]
-        for t in tower_sample
-    ])
-
-    # TN bounding box
-    tn_box = {"lon_min": 76.5, "lon_max": 80.5, "lat_min": 8.0, "lat_max": 13.6}
-
-    # Add mirror points to bound the Voronoi
-    mirror_pts = np.array([
-        [tn_box["lon_min"]-2, tn_box["lat_min"]-2],
-        [tn_box["lon_max"]+2, tn_box["lat_min"]-2],
-        [tn_box["lon_max"]+2, tn_box["lat_max"]+2],
-        [tn_box["lon_min"]-2, tn_box["lat_max"]+2],
-    ])
-    all_pts = np.vstack([tower_coords, mirror_pts])
-    vor = Voronoi(all_pts)
-
-    from shapely.ops import voronoi_diagram
-    from shapely.geometry import MultiPoint, box as shapely_box
-
-    tn_bbox = shapely_box(tn_box["lon_min"], tn_box["lat_min"],
-                          tn_box["lon_max"], tn_box["lat_max"])
-    mp = MultiPoint([Point(c[0], c[1]) for c in tower_coords])
-    regions = voronoi_diagram(mp, envelope=tn_bbox)
-
-    # Count settlements in each Voronoi cell
-    pop_sample = list(population.find({}, {"geometry": 1}).limit(3000))
+    bd_trace.phase("compute")
+
+    tower_coords, _ = bd_data.load_tower_points()
+
+    # Real state boundary (union of its districts); TN bounding box if none are stored
+    state_polys = [shape(d["geometry"]) for d in bd_data.load_districts(state)]
+    if state_polys:
+        boundary = unary_union(state_polys)
+    else:
+        boundary = shapely.box(76.5, 8.0, 80.5, 13.6)
+    shapely.prepare(boundary)
+
+    # Voronoi in the UTM plane (conformal, metres) so cell edges are metric bisectors,
+    # matching the nearest-tower assignment; vertices are mapped back to lon/lat
+    x0, y0, x1, y1 = shapely.transform(boundary, lambda c: bd_geo.to_utm(c[:, 0], c[:, 1])).bounds
+    envelope = shapely.box(x0 - 100_000, y0 - 100_000, x1 + 100_000, y1 + 100_000)
+    sites = shapely.multipoints(bd_geo.to_utm(tower_coords[:, 0], tower_coords[:, 1]))
+    cells = shapely.get_parts(shapely.voronoi_polygons(sites, extend_to=envelope))
+    cells = shapely.transform(cells, lambda c: bd_geo.from_utm(c[:, 0], c[:, 1]))
+
+    # Cell ↔ tower (voronoi output order is arbitrary; co-located towers share a cell)
+    t_idx, c_idx = bd_geo.points_in_polygons(tower_coords, cells)
+    cell_of_tower = np.full(len(tower_coords), -1, dtype=np.int64)
+    cell_of_tower[t_idx] = c_idx
+
+    # Settlements per tower = settlements whose nearest tower it is (-1: no tower at all)
+    tower_pop = np.zeros(len(tower_coords), dtype=np.int64)
+    for _, _, nearest, _ in bd_data.iter_settlement_nearest(batch_size):
+        tower_pop += np.bincount(nearest[nearest >= 0], minlength=len(tower_coords))
+
+    has_cell = cell_of_tower >= 0
+    cell_pop = np.bincount(cell_of_tower[has_cell], weights=tower_pop[has_cell],
+                           minlength=len(cells)).astype(np.int64)
+    tower_of_cell = np.full(len(cells), -1, dtype=np.int64)
+    tower_of_cell[cell_of_tower[has_cell]] = np.flatnonzero(has_cell)
+
+    clipped = shapely.intersection(cells, boundary)
+    keep = np.flatnonzero(~shapely.is_empty(clipped))
 
     zone_data = []
-    for region in list(regions.geoms)[:150]:
-        clipped = region.intersection(tn_bbox)
-        if clipped.is_empty:
-            continue
-
-        pop_in_zone = sum(1 for p in pop_sample if clipped.contains(shape(p["geometry"])))
-        zone_data.append({"geometry": clipped, "pop_count": pop_in_zone})
+    for c in keep[np.argsort(-cell_pop[keep], kind="stable")]:
+        t = tower_of_cell[c]
+        zone_data.append({
+            "geometry": clipped[c],
+            "pop_count": int(cell_pop[c]),
+            "tower": tower_coords[t][::-1].tolist() if t >= 0 else None
+        })
 
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB positron")
-
-    max_pop = max((z["pop_count"] for z in zone_data), default=1)
-
-    for z in zone_data:
-        ratio = z["pop_count"] / max_pop
-        red   = int(ratio * 220)
-        green = int((1 - ratio) * 180)
-
-        folium.GeoJson(
-            mapping(z["geometry"]),
-            style_function=lambda x, r=red, g=green: {
-                "fillColor": f"#{r:02x}{g:02x}20",
-                "fillOpacity": 0.6,
-                "color": "#7f8c8d", "weight": 0.5
-            },
-            tooltip=f"Voronoi zone: {z['pop_count']} settlements"
-        ).add_to(m)
-
-    # Tower points
-    for t in tower_sample:
-        c = t["geometry"]["coordinates"]
-        folium.CircleMarker([c[1], c[0]], radius=3,
-                             color="#2c3e50", fill=True, fill_opacity=0.8).add_to(m)
+    bd_trace.phase("render")
+    m = bd_render.new_map()
+
+    max_pop = max((z["pop_count"] for z in zone_data), default=1) or 1
+
+    # Most loaded zones first — those are the ones a planner needs to see
+    shown = zone_data[:max_map_zones]
+
+    def zone_style(pop):
+        ratio = pop / max_pop
+        return {"fill_color": f"#{int(ratio * 220):02x}{int((1 - ratio) * 180):02x}20",
+                "fill_opacity": 0.6, "color": "#7f8c8d", "weight": 0.5}
+
+    bd_render.polygon_layer(
+        [z["geometry"] for z in shown],
+        [zone_style(z["pop_count"]) for z in shown],
+        tooltips=[f"Voronoi zone: {z['pop_count']} settlements" for z in shown],
+        name="Voronoi zones",
+    ).add_to(m)
+
+    # Tower positions
+    tower_latlon = np.array([z["tower"] for z in shown if z["tower"]]).reshape(-1, 2)
+    bd_render.point_layer(
+        tower_latlon[:, 1], tower_latlon[:, 0],
+        {"radius": 3, "color": "#2c3e50", "fill_opacity": 0.8},
+        name="Towers", priority=True,
+    ).add_to(m)
 
     legend = f"""
     <div style='position:fixed;bottom:30px;left:30px;z-index:1000;
@@ -122,13 +115,13 @@ def query8_voronoi_coverage_zones():
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q8_voronoi_zones.html")
-    overloaded = sorted(zone_data, key=lambda z: z["pop_count"], reverse=True)
-    print(f"  Most loaded zone: {overloaded[0]['pop_count']} settlements")
-    print("  ✅ Saved: q8_voronoi_zones.html")
+    bd_render.save_map(m, "q8_voronoi_zones.html")
+    print(f"  Zones: {len(zone_data):,} (from {len(tower_coords):,} towers)")
+    print(f"  Most loaded zone: {max_pop} settlements")
     return zone_data
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query8_voronoi_coverage_zones()
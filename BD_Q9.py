@@ -1,106 +1,146 @@
-from pymongo import MongoClient
-from shapely.geometry import shape, mapping, Point, MultiPolygon
-from shapely.ops import unary_union
-import geopandas as gpd
-import pandas as pd
 import numpy as np
 import folium
-from folium.plugins import HeatMap, MarkerCluster
-import json, math
+import heapq
+from scipy import sparse
+from scipy.spatial import cKDTree
+import bd_data
+import bd_geo
+import bd_points
+import bd_render
+import bd_trace
 
-# ─────────────────────────────────────────────
-#  CONNECTION
-# ─────────────────────────────────────────────
-MONGO_URI = "your_mongo_uri"
-client = MongoClient(MONGO_URI)
-db = client["MongoDB"]
+TN_CENTER = bd_data.TN_CENTER
 
-towers     = db.towers_clean_fixed
-population = db.population_points_fixed
-districs   = db.districs
-roads      = db.road_network
 
-TN_CENTER = [10.8, 78.7]
-
-print("✅ Connected to MongoDB")
-print(f"  Towers       : {towers.count_documents({})}")
-print(f"  Settlements  : {population.count_documents({})}")
-print(f"  Districts    : {districs.count_documents({})}")
-print(f"  Road segments: {roads.count_documents({})}")
+# ╔══════════════════════════════════════════════════════════╗
+# ║  Max-coverage placement engine (lazy greedy)            ║
+# ╚══════════════════════════════════════════════════════════╝
+def build_coverage_matrix(candidate_xyz, settlement_xyz, radius_m):
+    """
+    Sparse candidate-site × settlement coverage matrix (CSR, bool-valued):
+    entry (i, j) is set when settlement j lies within radius_m of candidate i.
+    In partitioned mode (bd_data.use_partitions) the join runs tiled across processes.
+    """
+    if bd_data.PARTITIONED:
+        import bd_partition
+        i, j, _ = bd_partition.cross_pairs(candidate_xyz, settlement_xyz, radius_m,
+                                           workers=bd_data.PARTITION_WORKERS, tile_km=bd_data.PARTITION_TILE_KM)
+        return sparse.csr_matrix((np.ones(len(i)), (i, j)), shape=(len(candidate_xyz), len(settlement_xyz)))
+    cand_tree = cKDTree(candidate_xyz)
+    pop_tree = cKDTree(settlement_xyz)
+    cover = cand_tree.sparse_distance_matrix(pop_tree, radius_m, output_type="coo_matrix")
+    cover = cover.tocsr()
+    cover.data[:] = 1
+    return cover
+
+
+def lazy_greedy_max_coverage(cover, k):
+    """
+    Radius-constrained max coverage: pick up to k rows of `cover` (CSR) covering the
+    most columns. Lazy greedy with a max-heap of stale gains — coverage is submodular,
+    so a popped gain that is still current is the true best, and the result is within
+    (1 - 1/e) ≈ 63% of the optimum.
+    Returns (chosen rows, marginal gain of each, owner) — owner[j] is the position in
+    `chosen` of the site that first covered column j, or -1.
+    """
+    indptr, indices = cover.indptr, cover.indices
+    is_covered = np.zeros(cover.shape[1], dtype=bool)
+    owner = np.full(cover.shape[1], -1, dtype=np.int64)
+
+    heap = [(-(indptr[i + 1] - indptr[i]), i) for i in range(cover.shape[0])]
+    heapq.heapify(heap)
+
+    chosen, gains = [], []
+    while heap and len(chosen) < k:
+        neg_gain, i = heapq.heappop(heap)
+        cols = indices[indptr[i]:indptr[i + 1]]
+        fresh = cols[~is_covered[cols]]
+        if len(fresh) == 0:
+            continue
+        if heap and len(fresh) < -heap[0][0]:
+            heapq.heappush(heap, (-len(fresh), i))   # stale — re-queue with the true gain
+            continue
+        is_covered[fresh] = True
+        owner[fresh] = len(chosen)
+        chosen.append(i)
+        gains.append(len(fresh))
+    return np.array(chosen, dtype=np.int64), np.array(gains, dtype=np.int64), owner
 
 
 # ╔══════════════════════════════════════════════════════════╗
 # ║  Q9 — Optimal New Tower Placement                      ║
-# ║  K-Means spatial clustering on uncovered settlements    ║
+# ║  Lazy-greedy max coverage over uncovered settlements    ║
 # ╚══════════════════════════════════════════════════════════╝
-def query9_optimal_new_tower_placement(n_new_towers=10):
+def query9_optimal_new_tower_placement(n_new_towers=10, radius_km=5, candidate_spacing_km=None,
+                                       batch_size=50_000):
     """
-    SPATIAL OP : Spatial clustering (K-Means on uncovered points) + centroid proposal
+    SPATIAL OP : KD-tree coverage test + sparse site × settlement matrix + lazy-greedy max coverage
     QUESTION   : If TN government wants to add exactly 10 new towers,
                  where should they go to maximise coverage of currently uncovered settlements?
     INSIGHT    : Data-driven infrastructure planning — this is what telecom companies actually do.
+    Candidate sites are uncovered settlements thinned to one per candidate_spacing_km grid
+    cell (default radius_km / 2).
     """
     print(f"\n[Q9] Finding optimal placement for {n_new_towers} new towers...")
+    bd_trace.phase("compute")
 
-    from sklearn.cluster import KMeans
+    radius_m = radius_km * 1000.0
+    spacing_m = (candidate_spacing_km or radius_km / 2) * 1000.0
 
-    # Get uncovered settlements (same logic as Q2, faster version)
-    tower_docs = list(towers.find({}, {"geometry": 1}).limit(2000))
-    tower_coords_np = np.array([[t["geometry"]["coordinates"][0],
-                                  t["geometry"]["coordinates"][1]] for t in tower_docs])
+    # Uncovered settlements (same test as Q2 — nothing within radius_km)
+    tower_coords, _ = bd_data.load_tower_points()
 
-    pop_docs = list(population.find({}, {"geometry": 1, "properties.name": 1}).limit(5000))
+    uncovered, start = [], 0
+    for coords, names, _, dist in bd_data.iter_settlement_nearest(batch_size, names=True):
+        uncovered.append(bd_points.PointStore.from_columns(coords, names, first_id=start)[dist > radius_m])
+        start += len(coords)
+    uncovered = bd_points.PointStore.concat(uncovered)
+    unc_coords = uncovered.coords
 
-    uncovered_pts = []
-    for p in pop_docs:
-        lon, lat = p["geometry"]["coordinates"][0], p["geometry"]["coordinates"][1]
-        dx = (tower_coords_np[:, 0] - lon) * 111
-        dy = (tower_coords_np[:, 1] - lat) * 111
-        min_dist = np.min(np.sqrt(dx**2 + dy**2))
-        if min_dist > 5:  # more than 5km from any tower
-            uncovered_pts.append([lon, lat, p.get("properties", {}).get("name", "?")])
+    print(f"  Uncovered settlements to cover: {len(unc_coords):,}")
 
-    print(f"  Uncovered settlements to cluster: {len(uncovered_pts)}")
+    # Candidates: first uncovered settlement in each spacing_m × spacing_m UTM grid cell
+    unc_utm = bd_geo.to_utm(unc_coords[:, 0], unc_coords[:, 1])
+    _, cand = np.unique(np.floor(unc_utm / spacing_m).astype(np.int64), axis=0, return_index=True)
+    unc_xyz = bd_geo.project(unc_coords[:, 0], unc_coords[:, 1])
+    print(f"  Candidate sites: {len(cand):,}")
 
-    if len(uncovered_pts) < n_new_towers:
-        print("  Not enough uncovered points — reducing clusters")
-        n_new_towers = max(2, len(uncovered_pts) // 2)
+    cover = build_coverage_matrix(unc_xyz[cand], unc_xyz, radius_m)
+    chosen, gains, owner = lazy_greedy_max_coverage(cover, n_new_towers)
 
-    X = np.array([[p[0], p[1]] for p in uncovered_pts])
-    kmeans = KMeans(n_clusters=n_new_towers, random_state=42, n_init=10)
-    labels = kmeans.fit_predict(X)
-    centroids = kmeans.cluster_centers_
-
-    # Count settlements per cluster
-    cluster_sizes = np.bincount(labels)
     proposals = [
-        {"lon": c[0], "lat": c[1], "settlements_served": int(cluster_sizes[i])}
-        for i, c in enumerate(centroids)
+        {"lon": float(unc_coords[cand[c], 0]), "lat": float(unc_coords[cand[c], 1]),
+         "settlements_served": int(g)}
+        for c, g in zip(chosen, gains)
     ]
-    proposals.sort(key=lambda x: x["settlements_served"], reverse=True)
+    labels = owner
 
     # ── MAP ──────────────────────────────────────────────────
-    m = folium.Map(location=TN_CENTER, zoom_start=7, tiles="CartoDB dark_matter")
+    bd_trace.phase("render")
+    m = bd_render.new_map(tiles="CartoDB dark_matter")
 
-    # Existing towers (small gray)
-    for t in tower_docs[:2000]:
-        c = t["geometry"]["coordinates"]
-        folium.CircleMarker([c[1], c[0]], radius=2,
-                             color="#7f8c8d", fill=True, fill_opacity=0.3).add_to(m)
+    # Existing towers (small gray, evenly thinned to the layer budget)
+    bd_render.point_layer(
+        tower_coords[:, 0], tower_coords[:, 1],
+        {"radius": 2, "color": "#7f8c8d", "fill_opacity": 0.3},
+        name="Existing towers",
+    ).add_to(m)
 
-    # Uncovered settlements — red
+    # Uncovered settlements — coloured by the proposed tower that would cover them
     colors_by_cluster = [
         "#e74c3c","#3498db","#2ecc71","#f39c12","#9b59b6",
         "#1abc9c","#e67e22","#e91e63","#00bcd4","#8bc34a"
     ]
-    for i, (lon, lat, name) in enumerate(uncovered_pts[:3000]):
-        cluster_id = int(labels[i]) if i < len(labels) else 0
-        folium.CircleMarker(
-            [lat, lon], radius=2,
-            color=colors_by_cluster[cluster_id % len(colors_by_cluster)],
-            fill=True, fill_opacity=0.6,
-            tooltip=f"{name} — cluster {cluster_id+1}"
-        ).add_to(m)
+    cluster_styles = [{"radius": 2, "color": c, "fill_opacity": 0.6} for c in colors_by_cluster]
+    still_uncovered = {"radius": 2, "color": "#555555", "fill_opacity": 0.6}
+    bd_render.point_layer(
+        unc_coords[:, 0], unc_coords[:, 1],
+        [cluster_styles[c % len(cluster_styles)] if c >= 0 else still_uncovered
+         for c in labels.tolist()],
+        tooltips=[f"{name or '?'} — " + (f"proposed tower #{c + 1}" if c >= 0 else "still uncovered")
+                  for name, c in zip(uncovered.names, labels.tolist())],
+        name="Uncovered settlements",
+    ).add_to(m)
 
     # Proposed tower locations — large stars
     for i, p in enumerate(proposals):
@@ -123,21 +163,22 @@ def query9_optimal_new_tower_placement(n_new_towers=10):
                 font-family:sans-serif;font-size:13px'>
       <b>Q9 — Optimal New Tower Placement</b><br>
       ● Gray: existing towers<br>
-      ● Colored dots: uncovered settlements (by cluster)<br>
+      ● Colored dots: uncovered settlements (by proposed tower covering them)<br>
       📶 Signal icon: proposed tower location<br>
-      Uncovered settlements: {len(uncovered_pts):,}<br>
-      Best proposal serves: {proposals[0]['settlements_served']} settlements
+      Uncovered settlements: {len(uncovered):,}<br>
+      Best proposal serves: {proposals[0]['settlements_served'] if proposals else 0} settlements<br>
+      All proposals serve: {sum(p['settlements_served'] for p in proposals):,} settlements
     </div>"""
     m.get_root().html.add_child(folium.Element(legend))
 
-    m.save("q9_optimal_placement.html")
+    bd_render.save_map(m, "q9_optimal_placement.html")
     print(f"  Top 5 proposed locations:")
     for i, p in enumerate(proposals[:5]):
         print(f"    #{i+1}: [{p['lat']:.4f}°N, {p['lon']:.4f}°E] — serves {p['settlements_served']} settlements")
-    print("  ✅ Saved: q9_optimal_placement.html")
     return proposals
 
 
 
 if __name__ == "__main__":
+    bd_data.print_summary()
     query9_optimal_new_tower_placement()
@@ -0,0 +1,264 @@
+"""
+bd_bench — end-to-end and per-phase timings of the BD_Q* queries on synthetic data.
+
+For each scale the suite generates synthetic Tamil Nadu data (bd_synth), loads it
+into a backend and times:
+
+  setup    generate / load (/ snapshot export with --snapshot)
+  phases   each shared bd_data load on its own: towers, tower KD-tree,
+           settlements, nearest-tower pass, districts, road graph
+  warm     each query with those loads cached, split into bd_trace phases
+           (compute / render / save)
+  cold     each query from an empty cache — what a standalone script run costs
+
+Results go to <out>/<timestamp>-<commit>-<scale>.json, one file per scale, so runs
+on different commits can be diffed with --compare.
+
+    python -m bd_bench                              # 10k, columnar stand-in
+    python -m bd_bench --scale 10k,100k,1m --repeat 3
+    python -m bd_bench 2 5 --backend mongomock      # exercise the MongoDB read path in-process
+    python -m bd_bench --scale 1m --uri mongodb://localhost:27017 --snapshot
+    python -m bd_bench --compare old.json new.json
+
+Backends:
+  snapshot   (default) data written straight into bd_snapshot's columnar files —
+             no database at all; scales to 1M in-process.
+  mongomock  in-process MongoDB stand-in (pip install mongomock). Its cursors are
+             O(n²), so keep it to ~20k settlements.
+  mongod     any real server, via --uri.
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import tempfile
+import time
+
+import bd_data
+import bd_synth
+import bd_trace
+from bd_run import QUERIES, resolve
+
+STATE = "Tamil Nadu"
+OUT_DIR = "bench_results"
+
+
+def _git_commit():
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=here, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=here,
+                                    capture_output=True, text=True, check=True).stdout.strip())
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+    return commit, dirty
+
+
+def _client(backend, uri):
+    if backend == "mongod":
+        from pymongo import MongoClient
+        return MongoClient(uri)
+    try:
+        import mongomock
+    except ImportError:
+        raise SystemExit("The mongomock backend needs mongomock (pip install mongomock); "
+                         "use --backend snapshot or --uri mongodb://... instead.")
+    return mongomock.MongoClient()
+
+
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - t0
+
+
+# ─────────────────────────────────────────────
+#  PHASES
+# ─────────────────────────────────────────────
+def time_phases():
+    """Time each shared bd_data load from an empty cache, in dependency order."""
+    bd_data.enable_cache(True)
+    phases = {}
+    _, phases["towers"] = _timed(bd_data.load_tower_points)
+    _, phases["tower_index"] = _timed(bd_data.load_tower_index)
+    _, phases["settlements"] = _timed(bd_data.load_settlements, names=True)
+    _, phases["nearest"] = _timed(bd_data.load_nearest_towers)
+    _, phases["districts"] = _timed(bd_data.load_districts, STATE)
+    _, phases["road_graph"] = _timed(bd_data.load_road_graph)
+    return phases
+
+
+def time_queries(selected, repeat, cold, quiet):
+    """
+    {query: {"warm_s": [...], "cold_s": [...], "spans_s": {...}}}. Warm runs reuse the
+    cache time_phases() filled and record bd_trace spans (of the last repeat); cold runs
+    come last, untraced, and re-load everything each time.
+    """
+    results = {str(n): {"warm_s": []} for n in selected}
+    bd_trace.enable()
+    for n in selected:
+        for _ in range(repeat):
+            with _maybe_quiet(quiet), bd_trace.query(f"Q{n}") as report:
+                _, t = _timed(resolve(n))
+            results[str(n)]["warm_s"].append(t)
+        results[str(n)]["spans_s"] = report["spans"]
+    bd_trace.disable()
+
+    if cold:
+        bd_data.enable_cache(False)
+        for n in selected:
+            results[str(n)]["cold_s"] = []
+            for _ in range(repeat):
+                with _maybe_quiet(quiet):
+                    _, t = _timed(resolve(n))
+                results[str(n)]["cold_s"].append(t)
+
+    for n in selected:
+        entry = results[str(n)]
+        print(f"  Q{n}: warm {statistics.median(entry['warm_s']):.2f}s"
+              + (f"  cold {statistics.median(entry['cold_s']):.2f}s" if cold else ""))
+    return results
+
+
+def _maybe_quiet(quiet):
+    return contextlib.redirect_stdout(io.StringIO()) if quiet else contextlib.nullcontext()
+
+
+# ─────────────────────────────────────────────
+#  SUITE
+# ─────────────────────────────────────────────
+def bench_scale(scale, selected=None, backend="snapshot", uri=None, snapshot=False, repeat=1,
+                cold=True, seed=0, quiet=True, out_dir=OUT_DIR):
+    """Generate, load and time one scale. Returns the result dict (also written to out_dir)."""
+    label, n = bd_synth.parse_scale(scale)
+    selected = sorted(set(selected or QUERIES))
+    print(f"\n📏 Scale {label}: {n:,} settlements ({backend})")
+
+    setup = {}
+    data, setup["generate"] = _timed(bd_synth.generate, n, seed=seed)
+
+    commit, dirty = _git_commit()
+    result = {
+        "suite": "bd_bench",
+        "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "dirty": dirty,
+        "host": {"python": platform.python_version(), "platform": platform.platform(),
+                 "cpus": os.cpu_count()},
+        "backend": backend,
+        "snapshot": snapshot or backend == "snapshot",
+        "scale": label,
+        "seed": seed,
+        "setup_s": setup,
+    }
+
+    # Queries save their maps into the working directory — keep those out of the repo
+    cwd = os.getcwd()
+    client = db_name = None
+    with tempfile.TemporaryDirectory(prefix="bd_bench_") as work:
+        os.chdir(work)
+        try:
+            snapshot_dir = os.path.join(work, "snapshot")
+            if backend == "snapshot":
+                result["counts"], setup["load"] = _timed(bd_synth.write_snapshot, data, snapshot_dir)
+                bd_synth.write_road_graph(data)
+                bd_data.use_snapshot(snapshot_dir, check=False)
+            else:
+                client, db_name = _client(backend, uri), f"bd_bench_{label}"
+                bd_data.use_client(client, db_name)
+                result["counts"], setup["load"] = _timed(bd_synth.load, bd_data.get_db(), data)
+                if snapshot:
+                    import bd_snapshot
+                    with _maybe_quiet(quiet):
+                        _, setup["snapshot"] = _timed(bd_snapshot.refresh, force=True,
+                                                      snapshot_dir=snapshot_dir)
+                    bd_data.use_snapshot(snapshot_dir, check=False)
+            del data
+            print(f"  Generated in {setup['generate']:.2f}s, loaded in {setup['load']:.2f}s"
+                  + (f", snapshot in {setup['snapshot']:.2f}s" if "snapshot" in setup else ""))
+
+            result["phases_s"] = time_phases()
+            for name, t in result["phases_s"].items():
+                print(f"  phase {name:<12} {t:.2f}s")
+            result["queries"] = time_queries(selected, repeat, cold, quiet)
+        finally:
+            os.chdir(cwd)
+            bd_data.use_snapshot(None)
+            bd_data.enable_cache(False)
+            if client is not None:
+                client.drop_database(db_name)
+
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = result["timestamp"].replace(":", "").replace("+0000", "Z")
+    path = os.path.join(out_dir, f"{stamp}-{(commit or 'nogit')[:8]}-{label}.json")
+    with open(path, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"  ✅ Saved: {path}")
+    return result
+
+
+def compare(old_path, new_path):
+    """Print median warm / cold times of two result files side by side."""
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"\n{'':10}{(old['commit'] or '?')[:8]:>12}{(new['commit'] or '?')[:8]:>12}{'ratio':>9}")
+
+    def row(label, a, b):
+        ratio = f"{b / a:8.2f}x" if a else "        –"
+        print(f"{label:<10}{a:>11.2f}s{b:>11.2f}s{ratio}")
+
+    for name in old.get("phases_s", {}):
+        if name in new.get("phases_s", {}):
+            row(name, old["phases_s"][name], new["phases_s"][name])
+    for q in old.get("queries", {}):
+        if q not in new.get("queries", {}):
+            continue
+        for kind in ("warm_s", "cold_s"):
+            if kind in old["queries"][q] and kind in new["queries"][q]:
+                row(f"Q{q} {kind[:4]}", statistics.median(old["queries"][q][kind]),
+                    statistics.median(new["queries"][q][kind]))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bd_bench", description=__doc__.split("\n\n")[0])
+    parser.add_argument("queries", nargs="*", type=int, metavar="N",
+                        help="query numbers to time (1–10); default all")
+    parser.add_argument("--scale", default="10k",
+                        help="comma-separated settlement counts: 10k, 100k, 1m or integers (default 10k)")
+    parser.add_argument("--backend", choices=("snapshot", "mongomock", "mongod"),
+                        help="where the synthetic data lives (default snapshot; mongod if --uri is given)")
+    parser.add_argument("--uri", help="MongoDB URI for the mongod backend")
+    parser.add_argument("--snapshot", action="store_true",
+                        help="with a database backend: export a snapshot and serve loads from it")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per query (median is reported)")
+    parser.add_argument("--no-cold", action="store_true", help="skip the empty-cache runs")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=OUT_DIR, help=f"results directory (default {OUT_DIR}/)")
+    parser.add_argument("--verbose", action="store_true", help="show the queries' own output")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    unknown = [n for n in args.queries if n not in QUERIES]
+    if unknown:
+        parser.error(f"unknown query number(s): {unknown} — choose from 1–10")
+    backend = args.backend or ("mongod" if args.uri else "snapshot")
+    if backend == "mongod" and not args.uri:
+        parser.error("the mongod backend needs --uri")
+    for scale in args.scale.split(","):
+        bench_scale(scale, args.queries, backend=backend, uri=args.uri, snapshot=args.snapshot,
+                    repeat=args.repeat, cold=not args.no_cold, seed=args.seed,
+                    quiet=not args.verbose, out_dir=args.out)
+
+if __name__ == "__main__":
+    main()
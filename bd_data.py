@@ -0,0 +1,478 @@
+"""
+bd_data — shared, lazily-connected MongoDB access for the BD_Q* queries.
+
+Nothing touches the network at import time. The first accessor call builds a
+single pooled MongoClient (reused by every query in the process); document
+counts are only fetched when asked for, from collection metadata
+(estimated_document_count) rather than a full count_documents({}) scan.
+
+The load_* / iter_* helpers are what the queries read through. They serve
+from the local columnar snapshot (bd_snapshot) when one is enabled via
+BD_SNAPSHOT_DIR or use_snapshot(), and straight from MongoDB otherwise.
+Nearest-tower lookups run on a local KD-tree, or as concurrent server-side
+$near queries (bd_near) after use_server_knn() / BD_SERVER_KNN=1, or as
+halo-tiled joins across worker processes (bd_partition) after use_partitions()
+/ BD_PARTITION_WORKERS=N.
+
+In streaming mode (use_streaming() / BD_STREAM=1) the settlement-sized loads
+are never cached: settlements and their nearest towers are read batch by
+batch, one batch ahead on a prefetch thread (see bd_stream).
+"""
+import os
+
+import numpy as np
+from pymongo import MongoClient
+
+import bd_trace
+from pymongo.collection import Collection
+from pymongo.database import Database
+
+MONGO_URI = os.environ.get("MONGO_URI", "your_mongo_uri")
+DB_NAME   = os.environ.get("MONGO_DB", "MongoDB")
+
+TOWERS_COLLECTION     = "towers_clean_fixed"
+POPULATION_COLLECTION = "population_points_fixed"
+DISTRICTS_COLLECTION  = "districs"
+ROADS_COLLECTION      = "road_network"
+
+TN_CENTER = [10.8, 78.7]
+
+# Directory of the local columnar snapshot; None reads MongoDB directly
+SNAPSHOT_DIR = os.environ.get("BD_SNAPSHOT_DIR") or None
+
+# Answer nearest-tower lookups with server-side $near queries instead of a local KD-tree
+SERVER_KNN = os.environ.get("BD_SERVER_KNN") == "1"
+SERVER_KNN_CONCURRENCY = None   # None = the async client's pool size
+
+# Tiled distance joins (bd_partition): BD_PARTITION_WORKERS=N, 0 = every core
+PARTITIONED = os.environ.get("BD_PARTITION_WORKERS") is not None
+PARTITION_WORKERS = int(os.environ.get("BD_PARTITION_WORKERS") or 0) or None
+PARTITION_TILE_KM = None        # None = sized from the data extent and worker count
+
+# Stream settlements batch by batch instead of caching them (bd_stream)
+STREAMING = os.environ.get("BD_STREAM") == "1"
+
+_client = None
+_snapshot_checked = False
+_cache = None     # dict while load caching is on — see enable_cache()
+_primed = {}      # prime_cache() results, served whether or not caching is on
+
+
+def get_client() -> MongoClient:
+    """The process-wide MongoClient, created on first use (connect=False defers the handshake)."""
+    global _client
+    if _client is None:
+        _client = MongoClient(MONGO_URI, connect=False)
+    return _client
+
+
+def get_db() -> Database:
+    return get_client()[DB_NAME]
+
+
+def towers() -> Collection:
+    return get_db()[TOWERS_COLLECTION]
+
+
+def population() -> Collection:
+    return get_db()[POPULATION_COLLECTION]
+
+
+def districs() -> Collection:
+    return get_db()[DISTRICTS_COLLECTION]
+
+
+def roads() -> Collection:
+    return get_db()[ROADS_COLLECTION]
+
+
+def collection_counts(exact=False) -> dict:
+    """
+    Document counts for the four collections.
+    Default uses estimated_document_count (collection metadata, O(1));
+    exact=True falls back to a full count_documents({}).
+    """
+    counts = {}
+    for label, coll in (("towers", towers()), ("settlements", population()),
+                        ("districts", districs()), ("road_segments", roads())):
+        counts[label] = coll.count_documents({}) if exact else coll.estimated_document_count()
+    return counts
+
+
+def print_summary(exact=False):
+    """The old per-script connection banner, now opt-in and metadata-only by default."""
+    counts = collection_counts(exact=exact)
+    print("✅ Connected to MongoDB")
+    print(f"  Towers       : {counts['towers']}")
+    print(f"  Settlements  : {counts['settlements']}")
+    print(f"  Districts    : {counts['districts']}")
+    print(f"  Road segments: {counts['road_segments']}")
+
+
+def use_client(client, db_name=None):
+    """Serve every accessor from an already-built client (a benchmark mongod, mongomock, ...)."""
+    global _client, DB_NAME
+    if _client is not None and _client is not client:
+        _client.close()
+    _client = client
+    if db_name:
+        DB_NAME = db_name
+
+
+def close():
+    """Drop the pooled client (e.g. before forking worker processes)."""
+    global _client
+    if _client is not None:
+        _client.close()
+        _client = None
+
+
+# ─────────────────────────────────────────────
+#  LOADERS (snapshot-aware)
+# ─────────────────────────────────────────────
+def use_snapshot(snapshot_dir=".bd_snapshot", check=True):
+    """
+    Serve the load_* helpers from a local snapshot in snapshot_dir.
+    check=True refreshes stale collections once, on first load; check=False trusts
+    the files on disk and makes no database round-trips at all.
+    """
+    global SNAPSHOT_DIR, _snapshot_checked
+    SNAPSHOT_DIR = snapshot_dir
+    _snapshot_checked = not check
+
+
+def _snapshot():
+    """The bd_snapshot module when snapshots are enabled (refreshed once per process), else None."""
+    global _snapshot_checked
+    if not SNAPSHOT_DIR:
+        return None
+    import bd_snapshot
+    if not _snapshot_checked:
+        bd_snapshot.refresh(snapshot_dir=SNAPSHOT_DIR)
+        _snapshot_checked = True
+    return bd_snapshot
+
+
+def use_server_knn(enabled=True, concurrency=None):
+    """Run nearest_towers() / close_tower_pairs() as concurrent $near queries (see bd_near)."""
+    global SERVER_KNN, SERVER_KNN_CONCURRENCY
+    SERVER_KNN, SERVER_KNN_CONCURRENCY = enabled, concurrency
+
+
+def use_partitions(enabled=True, workers=None, tile_km=None):
+    """
+    Run nearest_towers() / close_tower_pairs() (and Q9's coverage join) as halo-tiled
+    joins on `workers` processes (None = every core; see bd_partition).
+    """
+    global PARTITIONED, PARTITION_WORKERS, PARTITION_TILE_KM
+    PARTITIONED, PARTITION_WORKERS, PARTITION_TILE_KM = enabled, workers, tile_km
+
+
+def use_streaming(enabled=True):
+    """
+    Bounded-memory mode: settlements and the nearest-tower pass are streamed per batch
+    (prefetched one batch ahead) rather than materialised in the cache. Towers,
+    districts and the road graph are still cached.
+    """
+    global STREAMING
+    STREAMING = enabled
+
+
+def enable_cache(enabled=True):
+    """
+    Memoize the load_* / iter_* results for the rest of the process, so several
+    queries run back to back share one data load. Without a snapshot, settlements
+    are then held in memory as one array instead of being re-streamed per query.
+    """
+    global _cache
+    _cache = {} if enabled else None
+
+
+def prime_cache(key, value):
+    """
+    Install an already-built load result (e.g. a shared-memory view) under a cache key.
+    Primed results are kept apart from the load cache: they are served even with
+    caching off, and priming does not switch caching on for the other loaders.
+    """
+    _primed[key] = value
+
+
+def primed(key):
+    """What is primed or cached under key, or None."""
+    if key in _primed:
+        return _primed[key]
+    return _cache.get(key) if _cache is not None else None
+
+
+def _cached(key, loader):
+    if key in _primed:
+        return _primed[key]
+    if _cache is None:
+        with bd_trace.span("fetch"):
+            return loader()
+    if key not in _cache:
+        with bd_trace.span("fetch"):
+            _cache[key] = loader()
+    return _cache[key]
+
+
+class DictColumn:
+    """Dictionary-encoded string column: int32 codes into a vocabulary, -1 = missing."""
+
+    def __init__(self, codes, vocab):
+        self.codes = codes
+        self.vocab = vocab
+
+    @classmethod
+    def encode(cls, values):
+        vocab, codes = {}, np.empty(len(values), dtype=np.int32)
+        for k, v in enumerate(values):
+            codes[k] = -1 if v is None else vocab.setdefault(v, len(vocab))
+        return cls(codes, list(vocab))
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.vocab[c] if c >= 0 else None for c in self.codes[i].tolist()]
+        c = int(self.codes[i])
+        return self.vocab[c] if c >= 0 else None
+
+    def __iter__(self):
+        vocab = self.vocab
+        return (vocab[c] if c >= 0 else None for c in self.codes.tolist())
+
+    def map(self, fn):
+        """Same rows, each value v replaced by fn(v) (fn(None) for missing) — fn runs once per distinct value."""
+        vocab = [fn(v) for v in self.vocab] + [fn(None)]
+        return DictColumn(np.where(self.codes >= 0, self.codes, len(vocab) - 1).astype(np.int32), vocab)
+
+
+def load_tower_points():
+    """Every tower → (coords, ids): an (n, 2) [lon, lat] float array and a parallel id sequence."""
+    return _cached("towers", _load_tower_points)
+
+
+def _load_tower_points():
+    snap = _snapshot()
+    if snap:
+        return snap.tower_points(SNAPSHOT_DIR)
+
+    ids, coords = [], []
+    for t in towers().find({}, {"geometry.coordinates": 1}):
+        ids.append(t["_id"])
+        coords.append(t["geometry"]["coordinates"][:2])
+    return np.array(coords, dtype=float).reshape(-1, 2), ids
+
+
+def load_tower_index():
+    """KD-tree over every tower in bd_geo.project() metres, built once and shared when caching is on."""
+    import bd_geo
+    return _cached("tower_index", lambda: bd_geo.build_point_index(load_tower_points()[0]))
+
+
+def _tower_xyz():
+    """Every tower in bd_geo.project() metres — the shared KD-tree's own point array."""
+    return load_tower_index().data
+
+
+def iter_settlement_batches(batch_size=50_000, names=False):
+    """
+    Stream every settlement in fixed-size chunks → (coords, names).
+    coords is an (n, 2) [lon, lat] array; names is a DictColumn (None where
+    unnamed) when names=True, else None.
+    """
+    return bd_trace.traced(_cached_settlement_batches(batch_size, names))
+
+
+def _cached_settlement_batches(batch_size, names):
+    if STREAMING:
+        import bd_stream
+        yield from bd_stream.prefetch(_iter_settlement_batches(batch_size, names))
+        return
+    if (_cache is None and "settlements" not in _primed) or SNAPSHOT_DIR:
+        # Snapshot columns are already memory-mapped — nothing to gain by copying them
+        yield from _iter_settlement_batches(batch_size, names)
+        return
+
+    # Cached: materialise once as a point store (with names if any caller wants them), then slice
+    store = load_settlements(names)
+    for start in range(0, len(store), batch_size):
+        chunk = store[start:start + batch_size]
+        yield chunk.coords, chunk.names if names else None
+
+
+def load_settlements(names=False):
+    """
+    Every settlement as one bd_points.PointStore — [lon, lat], row id and name code,
+    24 bytes a row. With caching on it is built once (reloaded once if a later
+    caller wants names and the cached store has none).
+    """
+    cached = primed("settlements")
+    if names and cached is not None and cached.vocab is None:
+        _primed.pop("settlements", None)
+        if _cache is not None:
+            _cache.pop("settlements", None)
+    return _cached("settlements", lambda: _load_settlements(names))
+
+
+def _load_settlements(names):
+    import bd_points
+    coords, codes, vocab = [], [], None
+    for chunk, chunk_names in _iter_settlement_batches(50_000, names):
+        coords.append(chunk)
+        if names:
+            codes.append(chunk_names.codes)
+            vocab = chunk_names.vocab
+    coords = np.vstack(coords) if coords else np.empty((0, 2))
+    column = DictColumn(np.concatenate(codes) if codes else np.empty(0, dtype=np.int32), vocab or [])
+    return bd_points.PointStore.from_columns(coords, column if names else None)
+
+
+def _iter_settlement_batches(batch_size, names):
+    snap = _snapshot()
+    if snap:
+        coords, codes, vocab = snap.settlement_columns(SNAPSHOT_DIR)
+        for start in range(0, len(coords), batch_size):
+            chunk_names = DictColumn(codes[start:start + batch_size], vocab) if names else None
+            yield coords[start:start + batch_size], chunk_names
+        return
+
+    import bd_points
+    projection = {"geometry.coordinates": 1, "_id": 0}
+    if names:
+        projection["properties.name"] = 1
+    cursor = bd_points.raw_reads(population()).find({}, projection).batch_size(batch_size)
+    for store in bd_points.iter_cursor(cursor, batch_size, names):
+        yield store.coords, store.names
+
+
+def load_districts(state=None):
+    """District documents ({"properties", "geometry"}) for one state, or every district if state is None."""
+    return _cached(("districts", state), lambda: _load_districts(state))
+
+
+def _load_districts(state):
+    snap = _snapshot()
+    if snap:
+        return snap.district_docs(state, SNAPSHOT_DIR)
+    district_filter = {"properties.st_nm": state} if state else {}
+    return list(districs().find(district_filter, {"geometry": 1, "properties": 1}))
+
+
+def load_road_lines():
+    """Every road_network geometry as (k, 2) [lon, lat] vertex arrays — MultiLineStrings are split."""
+    lines = []
+    for doc in roads().find({}, {"geometry": 1, "_id": 0}).batch_size(50_000):
+        geom = doc.get("geometry") or {}
+        if geom.get("type") == "LineString":
+            parts = [geom["coordinates"]]
+        elif geom.get("type") == "MultiLineString":
+            parts = geom["coordinates"]
+        else:
+            continue
+        lines.extend(np.array(part, dtype=float)[:, :2] for part in parts if len(part) >= 2)
+    return lines
+
+
+def load_road_graph():
+    """
+    The road network compiled into a CSR graph (see bd_roads), from its on-disk cache.
+    With a snapshot enabled an existing cache is trusted, like the snapshot itself.
+    """
+    import bd_roads
+    return _cached("road_graph", lambda: bd_roads.load_graph(check=not SNAPSHOT_DIR))
+
+
+def load_nearest_towers(batch_size=50_000):
+    """
+    Nearest tower for every settlement, in iter_settlement_batches order
+    → (idx, dist_m): int64 tower positions and float64 distances in metres.
+    """
+    return _cached("nearest", lambda: _load_nearest_towers(batch_size))
+
+
+def _load_nearest_towers(batch_size):
+    if PARTITIONED and not SERVER_KNN:
+        # One tiled join over every settlement, rather than one per batch
+        coords = [c for c, _ in iter_settlement_batches(batch_size)]
+        return nearest_towers(np.vstack(coords) if coords else np.empty((0, 2)))
+    idx, dist = [], []
+    for _, _, i, d in _iter_nearest(batch_size, names=False):
+        idx.append(i)
+        dist.append(d)
+    if not idx:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(idx).astype(np.int64), np.concatenate(dist)
+
+
+def iter_settlement_nearest(batch_size=50_000, names=False):
+    """
+    iter_settlement_batches plus each settlement's nearest tower → (coords, names, idx, dist_m).
+    With caching on, the nearest-tower pass runs once and later callers slice it.
+    """
+    return bd_trace.traced(_cached_settlement_nearest(batch_size, names))
+
+
+def _cached_settlement_nearest(batch_size, names):
+    if primed("nearest") is None and (_cache is None or STREAMING):
+        yield from _iter_nearest(batch_size, names)
+        return
+
+    idx_all, dist_all = load_nearest_towers(batch_size)
+    start = 0
+    for coords, chunk_names in iter_settlement_batches(batch_size, names):
+        stop = start + len(coords)
+        yield coords, chunk_names, idx_all[start:stop], dist_all[start:stop]
+        start = stop
+
+
+def _iter_nearest(batch_size, names):
+    towers = None
+    for coords, chunk_names in iter_settlement_batches(batch_size, names):
+        # Resolved on the first batch and reused — without caching each load is a full tower read
+        towers = tower_lookup() if towers is None else towers
+        idx, dist = nearest_towers(coords, towers)
+        yield coords, chunk_names, idx, dist
+
+
+def tower_lookup():
+    """What nearest_towers() searches: the tower id → position map in server-KNN mode, else the tower KD-tree."""
+    if SERVER_KNN:
+        import bd_near
+        return bd_near.tower_positions()
+    return load_tower_index()
+
+
+def nearest_towers(coords, towers=None):
+    """
+    Nearest tower for each (n, 2) [lon, lat] point → (idx, dist_m) into load_tower_points()
+    order: the shared KD-tree, concurrent $near queries in server-KNN mode, or a
+    tiled join in partitioned mode. towers: tower_lookup(), resolved once when called per batch.
+    """
+    towers = tower_lookup() if towers is None else towers
+    if SERVER_KNN:
+        import bd_near
+        return bd_near.nearest_towers(coords, concurrency=SERVER_KNN_CONCURRENCY, positions=towers)
+    import bd_geo
+    if PARTITIONED:
+        import bd_partition
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        # The KD-tree's own point array is the towers in bd_geo.project() metres
+        return bd_partition.nearest(towers.data, bd_geo.project(coords[:, 0], coords[:, 1]),
+                                    workers=PARTITION_WORKERS, tile_km=PARTITION_TILE_KM)
+    return bd_geo.nearest_points(towers, coords)
+
+
+def close_tower_pairs(dist_m, min_dist_m=0.0):
+    """Every unordered tower pair within dist_m → (i, j, dist), closest first (see bd_geo.find_close_pairs)."""
+    if SERVER_KNN:
+        import bd_near
+        return bd_near.close_tower_pairs(dist_m, min_dist_m, concurrency=SERVER_KNN_CONCURRENCY)
+    if PARTITIONED:
+        import bd_partition
+        return bd_partition.close_pairs(_tower_xyz(), dist_m, min_dist_m,
+                                        workers=PARTITION_WORKERS, tile_km=PARTITION_TILE_KM)
+    import bd_geo
+    return bd_geo.find_close_pairs(load_tower_points()[0], dist_m, min_dist_m)
@@ -0,0 +1,156 @@
+"""
+bd_geo — shared metric-space helpers for the BD_Q* spatial queries.
+
+Two metric frames, both computed in bulk with NumPy:
+
+  • project()  — lon/lat lifted onto a sphere of mean Earth radius (ECEF, metres).
+    Straight-line distances between lifted points are chord lengths, which agree
+    with the great-circle distance to within millimetres at the tens-of-km scales
+    these queries use, so a plain cKDTree over them answers "nearest tower" and
+    "anything within d metres" questions directly in metres, anywhere in India.
+  • to_utm() / from_utm() — WGS84 transverse Mercator (UTM zone 44N by default),
+    for planar work that needs 2-D geometry in metres: Voronoi cells, grids.
+    Conformal, so shapes and bisectors are true; scale is off by ≤ 0.3 % across
+    Tamil Nadu, which is why distance tests stay on project().
+
+haversine_m() gives great-circle distances for spot checks of either frame.
+"""
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+from shapely import STRtree
+from shapely.geometry import shape
+
+EARTH_RADIUS_M = 6_371_008.8
+
+# WGS84 ellipsoid and UTM constants
+WGS84_A = 6_378_137.0
+WGS84_F = 1 / 298.257223563
+UTM_K0 = 0.9996
+UTM_FALSE_EASTING = 500_000.0
+UTM_ZONE = 44            # 78°E–84°E, central meridian 81°E — covers most of Tamil Nadu
+
+
+def project(lon, lat):
+    """Vectorized lon/lat (degrees) → (n, 3) ECEF coordinates in metres."""
+    lon = np.radians(np.asarray(lon, dtype=float))
+    lat = np.radians(np.asarray(lat, dtype=float))
+    cos_lat = np.cos(lat)
+    return EARTH_RADIUS_M * np.column_stack([
+        cos_lat * np.cos(lon),
+        cos_lat * np.sin(lon),
+        np.sin(lat),
+    ])
+
+
+def haversine_m(lon1, lat1, lon2, lat2):
+    """Vectorized great-circle distance in metres between lon/lat points (degrees)."""
+    lon1, lat1, lon2, lat2 = (np.radians(np.asarray(v, dtype=float)) for v in (lon1, lat1, lon2, lat2))
+    h = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+# Krüger series coefficients (4th order in n: sub-millimetre within a UTM zone)
+_N = WGS84_F / (2 - WGS84_F)
+_E = np.sqrt(WGS84_F * (2 - WGS84_F))
+_A = WGS84_A / (1 + _N) * (1 + _N ** 2 / 4 + _N ** 4 / 64)
+_ALPHA = np.array([
+    _N / 2 - 2 * _N ** 2 / 3 + 5 * _N ** 3 / 16 + 41 * _N ** 4 / 180,
+    13 * _N ** 2 / 48 - 3 * _N ** 3 / 5 + 557 * _N ** 4 / 1440,
+    61 * _N ** 3 / 240 - 103 * _N ** 4 / 140,
+    49561 * _N ** 4 / 161280,
+])
+_BETA = np.array([
+    _N / 2 - 2 * _N ** 2 / 3 + 37 * _N ** 3 / 96 - _N ** 4 / 360,
+    _N ** 2 / 48 + _N ** 3 / 15 - 437 * _N ** 4 / 1440,
+    17 * _N ** 3 / 480 - 37 * _N ** 4 / 840,
+    4397 * _N ** 4 / 161280,
+])
+_DELTA = np.array([
+    2 * _N - 2 * _N ** 2 / 3 - 2 * _N ** 3 + 116 * _N ** 4 / 45,
+    7 * _N ** 2 / 3 - 8 * _N ** 3 / 5 - 227 * _N ** 4 / 45,
+    56 * _N ** 3 / 15 - 136 * _N ** 4 / 35,
+    4279 * _N ** 4 / 630,
+])
+_J2 = 2 * np.arange(1, 5)[:, None]        # 2j, broadcast against (n,) point arrays
+
+
+def _central_meridian(zone):
+    return np.radians(zone * 6 - 183)
+
+
+def to_utm(lon, lat, zone=UTM_ZONE):
+    """Vectorized lon/lat (degrees) → (n, 2) northern-hemisphere UTM [easting, northing] in metres."""
+    lam = np.radians(np.asarray(lon, dtype=float)) - _central_meridian(zone)
+    phi = np.radians(np.asarray(lat, dtype=float))
+    sin_phi = np.sin(phi)
+    t = np.sinh(np.arctanh(sin_phi) - _E * np.arctanh(_E * sin_phi))   # tan(conformal lat)
+    xi_p = np.arctan2(t, np.cos(lam))
+    eta_p = np.arctanh(np.sin(lam) / np.sqrt(1 + t ** 2))
+    xi = xi_p + (_ALPHA[:, None] * np.sin(_J2 * xi_p) * np.cosh(_J2 * eta_p)).sum(axis=0)
+    eta = eta_p + (_ALPHA[:, None] * np.cos(_J2 * xi_p) * np.sinh(_J2 * eta_p)).sum(axis=0)
+    return np.column_stack([UTM_FALSE_EASTING + UTM_K0 * _A * eta, UTM_K0 * _A * xi])
+
+
+def from_utm(easting, northing, zone=UTM_ZONE):
+    """Inverse of to_utm: (n,) eastings / northings in metres → (n, 2) [lon, lat] in degrees."""
+    xi = np.asarray(northing, dtype=float) / (UTM_K0 * _A)
+    eta = (np.asarray(easting, dtype=float) - UTM_FALSE_EASTING) / (UTM_K0 * _A)
+    xi_p = xi - (_BETA[:, None] * np.sin(_J2 * xi) * np.cosh(_J2 * eta)).sum(axis=0)
+    eta_p = eta - (_BETA[:, None] * np.cos(_J2 * xi) * np.sinh(_J2 * eta)).sum(axis=0)
+    chi = np.arcsin(np.sin(xi_p) / np.cosh(eta_p))
+    phi = chi + (_DELTA[:, None] * np.sin(_J2 * chi)).sum(axis=0)
+    lam = _central_meridian(zone) + np.arctan2(np.sinh(eta_p), np.cos(xi_p))
+    return np.column_stack([np.degrees(lam), np.degrees(phi)])
+
+
+def build_point_index(coords):
+    """KD-tree over (n, 2) [lon, lat] points, queried with project()-ed points in metres."""
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    return cKDTree(project(coords[:, 0], coords[:, 1]))
+
+
+def find_close_pairs(coords, dist_m, min_dist_m=0.0):
+    """
+    Spatial self-join: every unordered pair of points within dist_m metres.
+    Returns (i, j, dist) arrays with i < j, sorted by distance — O(n log n) via query_pairs.
+    Pairs closer than min_dist_m (e.g. duplicate records) are dropped.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    xyz = project(coords[:, 0], coords[:, 1])
+    pairs = cKDTree(xyz).query_pairs(r=dist_m, output_type="ndarray")
+    i, j = pairs[:, 0], pairs[:, 1]
+    dist = np.linalg.norm(xyz[i] - xyz[j], axis=1)
+
+    keep = dist >= min_dist_m
+    order = np.argsort(dist[keep], kind="stable")
+    return i[keep][order], j[keep][order], dist[keep][order]
+
+
+def nearest_points(index, coords, max_dist_m=np.inf):
+    """
+    Batched KNN (k=1): for each (n, 2) [lon, lat] query point, the nearest indexed point.
+    Returns (idx, dist_m) — idx is -1 and dist_m is inf where nothing lies within max_dist_m.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    dist, idx = index.query(
+        project(coords[:, 0], coords[:, 1]), k=1, distance_upper_bound=max_dist_m
+    )
+    idx = np.where(np.isfinite(dist), idx, -1)
+    return idx, dist
+
+
+def points_in_polygons(coords, geometries):
+    """
+    Bulk point-in-polygon: STRtree over prepared polygons, queried with all points at once.
+    geometries are GeoJSON dicts or shapely polygons. Returns (pt_idx, poly_idx) pairs —
+    a point on a shared border appears once per polygon it touches.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    polys = np.array([g if isinstance(g, shapely.Geometry) else shape(g) for g in geometries],
+                     dtype=object)
+    shapely.prepare(polys)
+    tree = STRtree(polys)
+    pt_idx, poly_idx = tree.query(shapely.points(coords), predicate="intersects")
+    return pt_idx, poly_idx
@@ -0,0 +1,454 @@
+"""
+bd_incremental — keep the nearest-tower assignment current as towers come and go.
+
+build() runs the full nearest-tower pass once and persists, per settlement, its
+nearest tower and distance, together with the aggregates Q2 / Q5 / Q6 derive
+from them. Tower changes are then applied locally instead of re-running the pass:
+
+  • added tower   — only settlements now closer to it than to their current tower
+                    are reassigned (one query against a KD-tree of the new towers)
+  • removed tower — only the settlements it served are re-queried against the
+                    remaining towers
+  • moved tower   — removal + addition (an edit that keeps the coordinates is a no-op)
+
+and for the reassigned settlements only, the coverage flags (COVER_RADIUS_M),
+per-tower loads (LOAD_RADIUS_M) and the distance tile pyramid (just the tiles
+their discs touch) are updated.
+
+Changes to towers_clean_fixed are read in one of two modes, chosen at build time:
+
+  stream     a change stream (needs a replica set); the resume token is persisted,
+             so sync() picks up exactly where the last one stopped
+  watermark  documents whose WATERMARK_FIELD is newer than the last sync are
+             re-read; inserts and deletes are found by diffing the _id set
+
+    python -m bd_incremental build --mode stream     # full pass → .bd_incremental/
+    python -m bd_incremental sync                    # apply changes since the last sync
+    python -m bd_incremental watch                   # follow the change stream
+    python -m bd_run 2 5 9 --incremental .bd_incremental
+
+Settlements are not watched: when their fingerprint changes, sync() rebuilds.
+The nearest assignment is served to the queries by position, so prime() also
+checks that settlements still stream in the order the state was built over (a
+hash of the _id sequence) and falls back to a full pass if not.
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import os
+import time
+
+import numpy as np
+from bson import json_util
+
+import bd_data
+import bd_geo
+import bd_snapshot
+import bd_tiles
+
+STATE_DIR = os.environ.get("BD_INCREMENTAL_DIR", ".bd_incremental")
+MANIFEST = "manifest.json"
+MODES = ("stream", "watermark")
+WATERMARK_FIELD = "updated_at"
+
+COVER_RADIUS_M = 5000.0     # Q2's coverage bubble
+LOAD_RADIUS_M = 5000.0      # Q5's service radius
+TILE_ZOOMS = range(6, 13)   # Q6's pyramid
+TILE_VMAX_KM = 30.0
+
+
+def _now():
+    return datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds")
+
+
+def _settlement_fingerprint():
+    """Fingerprint of the settlement source the nearest pass ran over."""
+    if bd_data.SNAPSHOT_DIR:
+        manifest = bd_snapshot._read_manifest(os.path.join(bd_data.SNAPSHOT_DIR, bd_data.POPULATION_COLLECTION))
+        return manifest and manifest.get("fingerprint")
+    return bd_snapshot.fingerprint(bd_data.population())
+
+
+def _hash_ids(digest, ids):
+    id_arr, id_type = bd_snapshot._encode_ids(ids)
+    if id_type == "objectid":
+        digest.update(np.ascontiguousarray(id_arr).tobytes())
+    else:
+        digest.update("".join(f"{i}\0" for i in id_arr.tolist()).encode())
+
+
+def _settlement_order():
+    """Hash of the settlement _id sequence in the order bd_data streams settlements."""
+    digest = hashlib.blake2b(digest_size=16)
+    if bd_data.SNAPSHOT_DIR:
+        name = bd_data.POPULATION_COLLECTION
+        manifest = bd_snapshot._read_manifest(os.path.join(bd_data.SNAPSHOT_DIR, name))
+        ids = bd_snapshot.IdColumn(bd_snapshot._load(name, "ids.npy", bd_data.SNAPSHOT_DIR), manifest["id_type"])
+        for start in range(0, len(ids), 50_000):
+            _hash_ids(digest, [ids[k] for k in range(start, min(start + 50_000, len(ids)))])
+        return digest.hexdigest()
+    # Same unsorted natural-order scan as bd_data's settlement reads, _id only
+    batch = []
+    for doc in bd_data.population().find({}, {"_id": 1}).batch_size(50_000):
+        batch.append(doc["_id"])
+        if len(batch) == 50_000:
+            _hash_ids(digest, batch)
+            batch = []
+    if batch:
+        _hash_ids(digest, batch)
+    return digest.hexdigest()
+
+
+def _latest_watermark():
+    last = bd_data.towers().find_one({WATERMARK_FIELD: {"$exists": True}}, {WATERMARK_FIELD: 1},
+                                     sort=[(WATERMARK_FIELD, -1)])
+    return last[WATERMARK_FIELD] if last else None
+
+
+# ─────────────────────────────────────────────
+#  STATE
+# ─────────────────────────────────────────────
+def build(state_dir=STATE_DIR, mode="watermark", tiles=True):
+    """Full nearest-tower pass over the current towers, persisted as the incremental state."""
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {MODES}, got {mode!r}")
+    print(f"\n🧱 Building incremental state in {state_dir} ({mode})...")
+    t0 = time.perf_counter()
+
+    # Mark the change feed BEFORE reading, so changes made during the load are replayed
+    manifest = {"mode": mode, "built": _now(), "synced": None}
+    if mode == "stream":
+        with bd_data.towers().watch() as stream:
+            manifest["resume_token"] = json_util.dumps(stream.resume_token)
+    else:
+        manifest["watermark"] = json_util.dumps(_latest_watermark())
+    manifest["settlements"] = _settlement_fingerprint()
+    manifest["settlement_order"] = _settlement_order()
+
+    tower_coords, tower_ids = bd_data.load_tower_points()
+    chunks = [c for c, _ in bd_data.iter_settlement_batches()]
+    settlements = np.vstack(chunks) if chunks else np.empty((0, 2))
+    idx, dist = bd_geo.nearest_points(bd_data.load_tower_index(), settlements)
+
+    state = {
+        "dir": state_dir,
+        "manifest": manifest,
+        "tower_coords": np.array(tower_coords, dtype=float).reshape(-1, 2),
+        "tower_ids": list(tower_ids),
+        "alive": np.ones(len(tower_coords), dtype=bool),
+        "settlements": settlements,
+        "idx": idx.astype(np.int64),
+        "dist": dist,
+    }
+    state["load"] = np.bincount(state["idx"][dist <= LOAD_RADIUS_M], minlength=len(tower_coords))
+    manifest["tiles"] = tiles
+    if tiles:
+        bd_tiles.render_tile_pyramid(settlements[:, 0], settlements[:, 1], dist / 1000.0,
+                                     os.path.join(state_dir, "tiles"), zooms=TILE_ZOOMS,
+                                     vmax=TILE_VMAX_KM)
+    save_state(state)
+    print(f"  ✅ {len(settlements):,} settlements × {len(tower_coords):,} towers "
+          f"in {time.perf_counter() - t0:.2f}s")
+    return state
+
+
+def save_state(state):
+    """Write every array, then the manifest last (each file swapped in atomically)."""
+    state_dir = state["dir"]
+    os.makedirs(os.path.join(state_dir, "towers"), exist_ok=True)
+
+    def save(name, arr):
+        path = os.path.join(state_dir, name)
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, arr)
+        os.replace(path + ".tmp", path)
+
+    id_arr, state["manifest"]["id_type"] = bd_snapshot._encode_ids(state["tower_ids"])
+    save("towers/coords.npy", state["tower_coords"])
+    save("towers/ids.npy", id_arr)
+    save("towers/alive.npy", state["alive"])
+    save("settlements.npy", state["settlements"])
+    for name in ("idx", "dist", "load"):
+        save(f"{name}.npy", state[name])
+
+    path = os.path.join(state_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state["manifest"], f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def load_state(state_dir=STATE_DIR):
+    """The persisted state, or None if state_dir holds none."""
+    manifest = bd_snapshot._read_manifest(state_dir)
+    if manifest is None:
+        return None
+
+    def load(name):
+        return np.load(os.path.join(state_dir, name))
+
+    ids = bd_snapshot.IdColumn(load("towers/ids.npy"), manifest["id_type"])
+    state = {
+        "dir": state_dir,
+        "manifest": manifest,
+        "tower_coords": load("towers/coords.npy"),
+        "tower_ids": [ids[k] for k in range(len(ids))],
+        "alive": load("towers/alive.npy"),
+        "settlements": load("settlements.npy"),
+    }
+    for name in ("idx", "dist", "load"):
+        state[name] = load(f"{name}.npy")
+    return state
+
+
+def _slots(state):
+    """id → slot of every live tower."""
+    ids, alive = state["tower_ids"], state["alive"]
+    return {ids[k]: k for k in np.flatnonzero(alive).tolist()}
+
+
+# ─────────────────────────────────────────────
+#  APPLY
+# ─────────────────────────────────────────────
+def apply_changes(state, upserts, deletes):
+    """
+    Apply tower changes to state in memory.
+    upserts : (id, lon, lat) of inserted or edited towers; deletes : ids of removed ones.
+    Tower slots are append-only (removed towers stay as dead slots), so settlement →
+    tower positions never shift. Returns a summary dict.
+    """
+    slot_of = _slots(state)
+    coords, alive = state["tower_coords"], state["alive"]
+
+    removed, added, new_coords, new_ids = [], [], [], []
+    for _id in deletes:
+        k = slot_of.pop(_id, None)
+        if k is not None:
+            alive[k] = False
+            removed.append(k)
+    for _id, lon, lat in upserts:
+        k = slot_of.get(_id)
+        if k is None:
+            slot_of[_id] = len(coords) + len(new_coords)
+            added.append(slot_of[_id])
+            new_coords.append((lon, lat))
+            new_ids.append(_id)
+        elif (coords[k, 0], coords[k, 1]) != (lon, lat):
+            coords[k] = (lon, lat)      # moved — its settlements are re-queried, then it is re-added
+            removed.append(k)
+            added.append(k)
+
+    summary = {"added": len(new_ids), "removed": len(removed) - (len(added) - len(new_ids)),
+               "moved": len(added) - len(new_ids),
+               "reassigned": 0, "newly_covered": 0, "newly_uncovered": 0, "tiles": 0}
+    if not removed and not added:
+        return summary
+
+    if new_ids:
+        coords = state["tower_coords"] = np.vstack([coords, np.array(new_coords, dtype=float)])
+        alive = state["alive"] = np.concatenate([alive, np.ones(len(new_ids), dtype=bool)])
+        state["load"] = np.concatenate([state["load"], np.zeros(len(new_ids), dtype=state["load"].dtype)])
+        state["tower_ids"].extend(new_ids)
+
+    settlements, idx, dist = state["settlements"], state["idx"], state["dist"]
+    new_idx, new_dist = idx.copy(), dist.copy()
+
+    # Settlements whose tower vanished (or moved): re-query against every live tower
+    orphaned = np.flatnonzero(np.isin(idx, removed))
+    if len(orphaned):
+        live = np.flatnonzero(alive)
+        j, d = bd_geo.nearest_points(bd_geo.build_point_index(coords[live]), settlements[orphaned])
+        new_idx[orphaned] = np.where(j >= 0, live[np.maximum(j, 0)], -1)
+        new_dist[orphaned] = d
+
+    # Everyone else only switches if a new (or moved) tower is now closer
+    if added:
+        added = np.array(added, dtype=np.int64)
+        j, d = bd_geo.nearest_points(bd_geo.build_point_index(coords[added]), settlements,
+                                     max_dist_m=float(new_dist.max(initial=0.0)))
+        closer = d < new_dist
+        new_idx[closer] = added[j[closer]]
+        new_dist[closer] = d[closer]
+
+    changed = np.flatnonzero((new_idx != idx) | (new_dist != dist))
+    summary["reassigned"] = len(changed)
+    if len(changed):
+        _update_aggregates(state, changed, new_idx[changed], new_dist[changed], summary)
+    return summary
+
+
+def _update_aggregates(state, changed, idx, dist, summary):
+    """Move loads, coverage counts and tiles of the changed settlements to their new towers."""
+    old_idx, old_dist = state["idx"][changed], state["dist"][changed]
+    load = state["load"]
+    np.subtract.at(load, old_idx[old_dist <= LOAD_RADIUS_M], 1)
+    np.add.at(load, idx[dist <= LOAD_RADIUS_M], 1)
+
+    was, now = old_dist <= COVER_RADIUS_M, dist <= COVER_RADIUS_M
+    summary["newly_covered"] = int((now & ~was).sum())
+    summary["newly_uncovered"] = int((was & ~now).sum())
+
+    state["idx"][changed] = idx
+    state["dist"][changed] = dist
+
+    if state["manifest"].get("tiles"):
+        # Only the tiles whose discs the reassigned settlements touch are re-rendered
+        settlements = state["settlements"]
+        dirty = bd_tiles.tile_keys(settlements[changed, 0], settlements[changed, 1], TILE_ZOOMS)
+        summary["tiles"] = bd_tiles.render_tile_pyramid(
+            settlements[:, 0], settlements[:, 1], state["dist"] / 1000.0,
+            os.path.join(state["dir"], "tiles"), zooms=TILE_ZOOMS, vmax=TILE_VMAX_KM, only=dirty,
+        )
+
+
+# ─────────────────────────────────────────────
+#  CHANGE FEEDS
+# ─────────────────────────────────────────────
+def _tower_entry(doc):
+    lon, lat = doc["geometry"]["coordinates"][:2]
+    return doc["_id"], float(lon), float(lat)
+
+
+def read_stream_changes(state):
+    """Drain the change stream from the persisted resume token → (upserts, deletes, token)."""
+    token = json_util.loads(state["manifest"]["resume_token"])
+    latest = {}
+    with bd_data.towers().watch(resume_after=token, full_document="updateLookup",
+                                max_await_time_ms=1000) as stream:
+        while True:
+            change = stream.try_next()
+            if change is None:
+                break
+            _collect(change, latest)
+        token = stream.resume_token
+    return _split(latest) + (token,)
+
+
+def _collect(change, latest):
+    """Keep only the last event per tower: a full document (upsert) or None (delete)."""
+    op = change["operationType"]
+    if op in ("insert", "update", "replace"):
+        doc = change.get("fullDocument")
+        latest[change["documentKey"]["_id"]] = _tower_entry(doc) if doc else None
+    elif op == "delete":
+        latest[change["documentKey"]["_id"]] = None
+
+
+def _split(latest):
+    upserts = [entry for entry in latest.values() if entry is not None]
+    deletes = [_id for _id, entry in latest.items() if entry is None]
+    return upserts, deletes
+
+
+def read_watermark_changes(state):
+    """Towers edited since the watermark, plus inserts / deletes by _id diff → (upserts, deletes, watermark)."""
+    towers = bd_data.towers()
+    since = json_util.loads(state["manifest"]["watermark"])
+    watermark = _latest_watermark()
+
+    known = set(_slots(state))
+    current = {d["_id"] for d in towers.find({}, {"_id": 1})}
+    fetch = current - known
+    # $gte: edits sharing the watermark's timestamp are re-read (re-applying one is a no-op)
+    edited = {WATERMARK_FIELD: {"$gte": since} if since is not None else {"$exists": True}}
+    fetch |= {d["_id"] for d in towers.find(edited, {"_id": 1})}
+
+    upserts = [_tower_entry(d) for d in towers.find({"_id": {"$in": list(fetch)}}, {"geometry.coordinates": 1})]
+    return upserts, list(known - current), watermark
+
+
+def sync(state_dir=STATE_DIR, mode=None):
+    """Apply every tower change since the last sync (building the state first if needed)."""
+    state = load_state(state_dir)
+    if state is None or state["manifest"].get("settlements") != _settlement_fingerprint():
+        print("  Settlements changed or no state yet — full rebuild")
+        build(state_dir, mode=mode or (state and state["manifest"]["mode"]) or "watermark",
+              tiles=state["manifest"].get("tiles", True) if state else True)
+        return None
+
+    t0 = time.perf_counter()
+    manifest = state["manifest"]
+    if manifest["mode"] == "stream":
+        upserts, deletes, token = read_stream_changes(state)
+        manifest["resume_token"] = json_util.dumps(token)
+    else:
+        upserts, deletes, watermark = read_watermark_changes(state)
+        manifest["watermark"] = json_util.dumps(watermark)
+
+    summary = apply_changes(state, upserts, deletes)
+    manifest["synced"] = _now()
+    save_state(state)
+    summary["seconds"] = time.perf_counter() - t0
+    print(f"  🔄 +{summary['added']} / −{summary['removed']} / ↔{summary['moved']} towers → "
+          f"{summary['reassigned']:,} settlements reassigned "
+          f"({summary['newly_covered']:,} newly covered, {summary['newly_uncovered']:,} newly uncovered), "
+          f"{summary['tiles']} tiles in {summary['seconds']:.2f}s")
+    return summary
+
+
+def watch(state_dir=STATE_DIR, idle_s=5.0):
+    """Keep syncing: every idle_s seconds (change-stream mode blocks up to 1 s per poll)."""
+    print(f"👀 Watching {bd_data.TOWERS_COLLECTION} (Ctrl-C to stop)...")
+    try:
+        while True:
+            summary = sync(state_dir)
+            if not summary or not (summary["added"] or summary["removed"] or summary["moved"]):
+                time.sleep(idle_s)
+    except KeyboardInterrupt:
+        pass
+
+
+# ─────────────────────────────────────────────
+#  QUERY INTEGRATION
+# ─────────────────────────────────────────────
+def prime(state_dir=STATE_DIR):
+    """
+    Serve bd_data's towers / nearest loads from the state, so Q2, Q5, Q6 and Q9 skip
+    the nearest-tower pass, and the maintained tile pyramid, so Q6 copies it instead
+    of rendering. Dead slots are compacted away. Returns False (and primes
+    nothing) if there is no state, the settlements it was built over changed, or they
+    no longer stream in the same order (the assignment is matched up by position).
+    """
+    state = load_state(state_dir)
+    if state is None or state["manifest"].get("settlements") != _settlement_fingerprint():
+        print(f"  ⚠️  No current incremental state in {state_dir} — falling back to a full pass")
+        return False
+    if state["manifest"].get("settlement_order") != _settlement_order():
+        print(f"  ⚠️  Settlements stream in a different order than {state_dir} was built over "
+              f"— falling back to a full pass (run bd_incremental build to refresh it)")
+        return False
+    alive = state["alive"]
+    live = np.flatnonzero(alive)
+    position = np.cumsum(alive) - 1
+    idx = state["idx"]
+    bd_data.prime_cache("towers", (state["tower_coords"][live],
+                                   [state["tower_ids"][k] for k in live.tolist()]))
+    # -1 (no live tower at all) stays -1 rather than indexing position from the end
+    bd_data.prime_cache("nearest", (np.where(idx >= 0, position[np.maximum(idx, 0)], -1), state["dist"]))
+    tile_dir = os.path.join(state_dir, "tiles")
+    if state["manifest"].get("tiles") and os.path.isdir(tile_dir):
+        bd_data.prime_cache("distance_tiles", {"dir": tile_dir, "zooms": list(TILE_ZOOMS), "vmax": TILE_VMAX_KM})
+    return True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bd_incremental", description=__doc__.split("\n\n")[0])
+    parser.add_argument("command", choices=("build", "sync", "watch"))
+    parser.add_argument("--dir", default=STATE_DIR, help=f"state directory (default {STATE_DIR})")
+    parser.add_argument("--mode", choices=MODES, help="change feed for build (default watermark)")
+    parser.add_argument("--no-tiles", action="store_true", help="do not maintain the distance tile pyramid")
+    parser.add_argument("--snapshot", metavar="DIR", help="read settlements from a local columnar snapshot")
+    args = parser.parse_args(argv)
+    if args.snapshot:
+        bd_data.use_snapshot(args.snapshot)
+
+    if args.command == "build":
+        build(args.dir, mode=args.mode or "watermark", tiles=not args.no_tiles)
+    elif args.command == "sync":
+        sync(args.dir, mode=args.mode)
+    else:
+        watch(args.dir)
+
+
+if __name__ == "__main__":
+    main()
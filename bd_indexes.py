@@ -0,0 +1,185 @@
+"""
+bd_indexes — the indexes each query's MongoDB access pattern needs, created and checked.
+
+Every index is declared next to the query shape that relies on it and the
+queries that issue that shape. ensure() creates whichever are missing;
+validate() runs explain() on each shape and fails fast (PlanError, with a
+report) when the winning plan is a COLLSCAN or the index is not selective
+enough: more than max_examined documents examined per document returned.
+
+Bulk loads (every tower / settlement / road, streamed once into a KD-tree or
+snapshot) are full scans by design and are not declared here.
+
+    python -m bd_indexes                   # create missing indexes, then validate
+    python -m bd_indexes --check           # validate only
+    python -m bd_run 1 4 8 --check-indexes
+"""
+import argparse
+
+from pymongo import ASCENDING, DESCENDING, GEOSPHERE
+from pymongo.errors import OperationFailure
+
+import bd_data
+
+STATE = "Tamil Nadu"
+
+# name → collection, keys, index options, the probe query shape, who issues it and
+# when that access pattern is live ("active")
+INDEXES = {
+    "towers_geometry_2dsphere": {
+        "collection": bd_data.TOWERS_COLLECTION,
+        "keys": [("geometry", GEOSPHERE)],
+        "options": {},
+        "probe": lambda: ({"geometry": {"$near": {"$geometry": {
+            "type": "Point", "coordinates": bd_data.TN_CENTER[::-1]}}}}, 1),
+        "max_examined": 200,         # $near walks covering cells, so some slack
+        "queries": (2, 3, 4, 5, 6, 8, 9, 10),
+        "when": "server-KNN mode (bd_data.use_server_knn / bd_near)",
+        "active": lambda: bd_data.SERVER_KNN,
+    },
+    "districs_st_nm": {
+        "collection": bd_data.DISTRICTS_COLLECTION,
+        "keys": [("properties.st_nm", ASCENDING)],
+        "options": {},
+        "probe": lambda: ({"properties.st_nm": STATE}, 0),
+        "max_examined": 2,
+        "queries": (1, 4, 8),
+        "when": "bd_data.load_districts(state) without a snapshot",
+        "active": lambda: not bd_data.SNAPSHOT_DIR,
+    },
+    "towers_updated_at": {
+        "collection": bd_data.TOWERS_COLLECTION,
+        "keys": [("updated_at", DESCENDING)],
+        "options": {"partialFilterExpression": {"updated_at": {"$exists": True}}},
+        "probe": lambda: ({"updated_at": {"$exists": True}}, 1),
+        "max_examined": 2,
+        "queries": (),
+        "when": "bd_incremental sync in watermark mode",
+        "active": lambda: False,     # not issued by any query
+    },
+}
+
+
+class PlanError(RuntimeError):
+    """A query shape would run without a usable index; .report holds every check."""
+
+    def __init__(self, report):
+        self.report = report
+        bad = [r for r in report if not r["ok"]]
+        super().__init__("index check failed:\n" + "\n".join(_format(r) for r in bad))
+
+
+def _needed(selected):
+    """
+    Index names the selected query numbers use in the current data mode
+    (None: every declared index, regardless of mode).
+    """
+    if selected is None:
+        return list(INDEXES)
+    return [name for name, spec in INDEXES.items()
+            if set(spec["queries"]) & set(selected) and spec["active"]()]
+
+
+# ─────────────────────────────────────────────
+#  CREATE
+# ─────────────────────────────────────────────
+def _has_index(coll, keys):
+    return any(list(info["key"]) == [tuple(k) for k in keys] for info in coll.index_information().values())
+
+
+def ensure(selected=None):
+    """Create every declared index the selected queries need that does not exist yet. Returns names created."""
+    db = bd_data.get_db()
+    created = []
+    for name in _needed(selected):
+        spec = INDEXES[name]
+        coll = db[spec["collection"]]
+        if _has_index(coll, spec["keys"]):
+            continue
+        print(f"  🗂️  Creating {name} on {coll.name}...")
+        # background is ignored from MongoDB 4.2 on, where every build only locks briefly
+        coll.create_index(spec["keys"], name=name, background=True, **spec["options"])
+        created.append(name)
+    return created
+
+
+# ─────────────────────────────────────────────
+#  EXPLAIN
+# ─────────────────────────────────────────────
+def _stages(plan):
+    """Every stage name in an explain plan tree (classic and SBE layouts)."""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+def check_plan(explain, max_examined):
+    """explain() output → (ok, stages, docs examined, docs returned, reason)."""
+    stages = sorted(set(_stages(explain.get("queryPlanner", {}).get("winningPlan", {}))))
+    stats = explain.get("executionStats", {})
+    examined, returned = stats.get("totalDocsExamined", 0), stats.get("nReturned", 0)
+    if "COLLSCAN" in stages:
+        return False, stages, examined, returned, "collection scan"
+    if examined > max_examined * max(returned, 1):
+        return False, stages, examined, returned, f"poor selectivity ({examined:,} examined for {returned:,} returned)"
+    return True, stages, examined, returned, ""
+
+
+def validate(selected=None, fail=True):
+    """
+    explain() the query shape behind every index the selected queries need.
+    Returns the report (one dict per shape); raises PlanError if any fails and fail=True.
+    """
+    db = bd_data.get_db()
+    report = []
+    for name in _needed(selected):
+        spec = INDEXES[name]
+        filt, limit = spec["probe"]()
+        entry = {"index": name, "collection": spec["collection"], "when": spec["when"]}
+        try:
+            explain = db[spec["collection"]].find(filt).limit(limit).explain()
+        except OperationFailure as exc:
+            # $near refuses to run at all without its 2dsphere index
+            entry.update(ok=False, stages=[], examined=0, returned=0, reason=f"query failed: {exc}")
+        else:
+            ok, stages, examined, returned, reason = check_plan(explain, spec["max_examined"])
+            entry.update(ok=ok, stages=stages, examined=examined, returned=returned, reason=reason)
+        report.append(entry)
+
+    for entry in report:
+        print(_format(entry))
+    if fail and not all(r["ok"] for r in report):
+        raise PlanError(report)
+    return report
+
+
+def _format(entry):
+    mark = "✅" if entry["ok"] else "❌"
+    detail = entry["reason"] or "·".join(entry["stages"])
+    return (f"  {mark} {entry['collection']}.{entry['index']}: {detail} "
+            f"({entry['examined']:,} examined / {entry['returned']:,} returned) — {entry['when']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bd_indexes", description=__doc__.split("\n\n")[0])
+    parser.add_argument("queries", nargs="*", type=int, metavar="N",
+                        help="only the indexes these query numbers need; default every declared index")
+    parser.add_argument("--check", action="store_true", help="validate only, create nothing")
+    args = parser.parse_args(argv)
+    selected = args.queries or None
+    if not args.check:
+        created = ensure(selected)
+        print(f"  Created: {', '.join(created) or 'nothing (all present)'}")
+    try:
+        validate(selected)
+    except PlanError:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
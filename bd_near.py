@@ -0,0 +1,154 @@
+"""
+bd_near — server-side $near KNN with many queries in flight (asyncio).
+
+For deployments where the data has to stay in MongoDB, the nearest-tower
+lookups can run as per-point $near queries against the towers' 2dsphere index
+instead of a local KD-tree (bd_data.use_server_knn()). Issued one after another
+from a synchronous loop they cost latency × N; here they run on pymongo's
+AsyncMongoClient with at most `concurrency` in flight (default: the client's
+connection pool size), so wall time ≈ total server work / pool size.
+
+Results always come back in input order. Distances are recomputed locally in
+the same bd_geo.project() metres the KD-tree path uses, so both modes agree.
+
+    bd_data.use_server_knn(concurrency=64)
+    query5_tower_load_hotspots()                 # same call, $near under the hood
+"""
+import asyncio
+
+import numpy as np
+from pymongo import AsyncMongoClient
+
+import bd_data
+import bd_geo
+
+CHUNK = 10_000      # query points turned into tasks at a time (bounds pending coroutines)
+
+_runner = None      # asyncio.Runner kept for the process, so the client's pool is reused
+_client = None
+_positions = (None, None)   # (tower id sequence, id → position) — rebuilt when the towers change
+
+
+def _run(coro):
+    global _runner
+    if _runner is None:
+        _runner = asyncio.Runner()
+    return _runner.run(coro)
+
+
+def _collection(name):
+    global _client
+    if _client is None:
+        _client = AsyncMongoClient(bd_data.MONGO_URI)
+    return _client[bd_data.DB_NAME][name]
+
+
+def close():
+    """Close the async client and its event loop."""
+    global _runner, _client
+    if _client is not None:
+        _run(_client.close())
+        _client = None
+    if _runner is not None:
+        _runner.close()
+        _runner = None
+
+
+# ─────────────────────────────────────────────
+#  BATCHED $near
+# ─────────────────────────────────────────────
+def _near_filter(lon, lat, max_dist_m, min_dist_m):
+    near = {"$geometry": {"type": "Point", "coordinates": [lon, lat]}}
+    if max_dist_m is not None:
+        near["$maxDistance"] = max_dist_m
+    if min_dist_m:
+        near["$minDistance"] = min_dist_m
+    return {"geometry": {"$near": near}}
+
+
+async def _near_all(name, coords, limit, max_dist_m, min_dist_m, concurrency):
+    coll = _collection(name)
+    if concurrency is None:
+        concurrency = _client.options.pool_options.max_pool_size
+    gate = asyncio.Semaphore(concurrency)
+    projection = {"geometry.coordinates": 1}
+
+    async def one(lon, lat):
+        async with gate:
+            cursor = coll.find(_near_filter(lon, lat, max_dist_m, min_dist_m), projection)
+            return await cursor.limit(limit).to_list(None)
+
+    results = []
+    for start in range(0, len(coords), CHUNK):
+        chunk = coords[start:start + CHUNK].tolist()
+        results.extend(await asyncio.gather(*(one(lon, lat) for lon, lat in chunk)))
+    return results
+
+
+def near(name, coords, limit=1, max_dist_m=None, min_dist_m=None, concurrency=None):
+    """
+    One $near query per (n, 2) [lon, lat] point against collection name, run concurrently.
+    Returns a list (input order) of each point's matching documents, nearest first
+    (limit=0: every match within max_dist_m).
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    return _run(_near_all(name, coords, limit, max_dist_m, min_dist_m, concurrency))
+
+
+def _metres(coords, other):
+    a = bd_geo.project(coords[:, 0], coords[:, 1])
+    b = bd_geo.project(other[:, 0], other[:, 1])
+    return np.linalg.norm(a - b, axis=1)
+
+
+def tower_positions():
+    """Tower id → position in load_tower_points() order (resolve once per pass and pass it on)."""
+    global _positions
+    _, ids = bd_data.load_tower_points()
+    if _positions[0] is not ids:
+        _positions = (ids, {_id: k for k, _id in enumerate(ids)})
+    return _positions[1]
+
+
+# ─────────────────────────────────────────────
+#  TOWER LOOKUPS (server-side twins of the KD-tree ones)
+# ─────────────────────────────────────────────
+def nearest_towers(coords, max_dist_m=None, concurrency=None, positions=None):
+    """
+    Nearest tower per point → (idx, dist_m) like bd_geo.nearest_points: -1 / inf where none.
+    positions: tower_positions(), when the caller already resolved it for the pass.
+    """
+    coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+    position = tower_positions() if positions is None else positions
+    hits = near(bd_data.TOWERS_COLLECTION, coords, limit=1, max_dist_m=max_dist_m, concurrency=concurrency)
+
+    idx = np.full(len(coords), -1, dtype=np.int64)
+    found = np.array([bool(h) for h in hits], dtype=bool)
+    idx[found] = [position[h[0]["_id"]] for h in hits if h]
+    dist = np.full(len(coords), np.inf)
+    if found.any():
+        tower_coords = np.array([h[0]["geometry"]["coordinates"][:2] for h in hits if h], dtype=float)
+        dist[found] = _metres(coords[found], tower_coords)
+    return idx, dist
+
+
+def close_tower_pairs(dist_m, min_dist_m=0.0, concurrency=None):
+    """
+    Every unordered tower pair within dist_m → (i, j, dist) with i < j, sorted by
+    distance, like bd_geo.find_close_pairs — one $near per tower, run concurrently.
+    """
+    coords = np.asarray(bd_data.load_tower_points()[0], dtype=float).reshape(-1, 2)
+    position = tower_positions()
+    hits = near(bd_data.TOWERS_COLLECTION, coords, limit=0, max_dist_m=dist_m,
+                min_dist_m=min_dist_m, concurrency=concurrency)
+
+    a = np.array([k for k, h in enumerate(hits) for _ in h], dtype=np.int64)
+    b = np.array([position[doc["_id"]] for h in hits for doc in h], dtype=np.int64)
+    # Each pair is found from both ends — keep one copy (either end's hit counts)
+    pair = np.unique(np.column_stack([np.minimum(a, b), np.maximum(a, b)])[a != b], axis=0).reshape(-1, 2)
+    i, j = pair[:, 0], pair[:, 1]
+    dist = _metres(coords[i], coords[j])
+
+    keep = (dist >= min_dist_m) & (dist <= dist_m)
+    order = np.argsort(dist[keep], kind="stable")
+    return i[keep][order], j[keep][order], dist[keep][order]
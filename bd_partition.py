@@ -0,0 +1,203 @@
+"""
+bd_partition — distance joins split into spatial tiles with halos, run across processes.
+
+Q2 / Q5 (nearest tower per settlement), Q3 (tower pairs within d) and Q9
+(candidate sites × settlements within r) are all "find B within d of A" joins.
+Here they are cut into independent tile jobs:
+
+  • points are bucketed into a grid of cubic tiles in bd_geo.project() ECEF
+    metres — the KD-tree frame, where chord distance is plain Euclidean, so a
+    box grown by d on every side holds every d-neighbour at any latitude;
+  • each A point is OWNED by exactly one tile (its core); the tile's job joins
+    its core against the B points in core + halo (the box grown by d);
+  • results are merged by owner, so nothing is counted twice: a self-join pair
+    (i, j), i < j, is only kept by the tile that owns i.
+
+Tiles run on a spawn ProcessPoolExecutor kept for the process (started on
+first use); small inputs or workers=1 run the same tile jobs in-process.
+Results equal the global cKDTree joins; nearest() falls back to one global
+query for the few points with nothing inside the halo.
+
+    bd_data.use_partitions(workers=8)
+    query3_redundant_towers()                    # same call, tiled under the hood
+"""
+import itertools
+import multiprocessing as mp
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+NEAREST_HALO_M = 10_000.0   # nearest(): search radius inside a tile before the global fallback
+TILES_PER_WORKER = 4        # default tiling: enough tiles to keep every worker busy
+SERIAL_BELOW = 20_000       # owner points: fewer than this run in-process (pool start-up costs more)
+BOX_SLACK_M = 1.0           # halo boxes are grown a little so float rounding never drops a neighbour
+
+_NEIGHBOURS = list(itertools.product((-1, 0, 1), repeat=3))
+_BIAS = 1 << 20
+
+_pool = None
+_pool_workers = None
+
+
+def _executor(workers):
+    global _pool, _pool_workers
+    if _pool is None or _pool_workers != workers:
+        shutdown()
+        # spawn: workers start clean (no inherited MongoClient sockets), as in bd_scheduler
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"))
+        _pool_workers = workers
+    return _pool
+
+
+def shutdown():
+    """Stop the worker pool (the next join starts a new one)."""
+    global _pool, _pool_workers
+    if _pool is not None:
+        _pool.shutdown()
+        _pool, _pool_workers = None, None
+
+
+# ─────────────────────────────────────────────
+#  TILING
+# ─────────────────────────────────────────────
+def tile_size(xyz, halo_m, workers, tile_km=None):
+    """
+    Tile edge in metres: tile_km if given, else the (n, 3) points' footprint cut into
+    ~TILES_PER_WORKER × workers tiles. Never below the halo — a tile's halo box then
+    only reaches into its 26 neighbours.
+    """
+    if tile_km:
+        return max(tile_km * 1000.0, halo_m)
+    extent = np.sort(np.ptp(xyz, axis=0)) if len(xyz) else np.zeros(3)
+    # Points hug the sphere, so the two largest extents span their footprint
+    area = extent[1] * extent[2]
+    return max(np.sqrt(area / (TILES_PER_WORKER * workers)), 2 * halo_m, 1000.0)
+
+
+def _cells(xyz, tile_m):
+    """Occupied tile (i, j, k) → indices of the points inside it."""
+    if len(xyz) == 0:
+        return {}
+    cell = np.floor(xyz / tile_m).astype(np.int64)
+    # Pack (i, j, k) into one int64 (21 bits each — ±1M tiles per axis) so one 1-D sort groups them
+    packed = ((cell[:, 0] + _BIAS) << 42) | ((cell[:, 1] + _BIAS) << 21) | (cell[:, 2] + _BIAS)
+    order = np.argsort(packed, kind="stable")
+    packed = packed[order]
+    starts = np.flatnonzero(np.r_[True, packed[1:] != packed[:-1]])
+    ends = np.r_[starts[1:], len(packed)]
+    return {tuple(cell[order[s]].tolist()): order[s:e] for s, e in zip(starts, ends)}
+
+
+def tiles(owner_xyz, other_xyz, tile_m, halo_m):
+    """
+    One (core, near) per occupied tile: core = owner_xyz indices the tile owns,
+    near = sorted other_xyz indices inside its box grown by halo_m (halo_m ≤ tile_m).
+    """
+    owners = _cells(owner_xyz, tile_m)
+    others = owners if other_xyz is owner_xyz else _cells(other_xyz, tile_m)
+    empty = np.empty(0, dtype=np.int64)
+    for key, core in owners.items():
+        parts = [others[n] for n in (tuple(k + d for k, d in zip(key, step)) for step in _NEIGHBOURS)
+                 if n in others]
+        if not parts:
+            yield core, empty
+            continue
+        near = np.concatenate(parts)
+        lo = np.asarray(key) * tile_m - halo_m - BOX_SLACK_M
+        hi = (np.asarray(key) + 1) * tile_m + halo_m + BOX_SLACK_M
+        pts = other_xyz[near]
+        inside = np.all((pts >= lo) & (pts <= hi), axis=1)
+        yield core, np.sort(near[inside])
+
+
+# ─────────────────────────────────────────────
+#  TILE JOBS (run in the workers)
+# ─────────────────────────────────────────────
+def _join(kind, owner_xyz, other_xyz, dist_m):
+    """
+    kind "nearest" → (local other idx, dist) per owner point (inf where none within dist_m);
+    kind "pairs"   → (local owner idx, local other idx, dist) for every pair within dist_m.
+    """
+    if kind == "nearest":
+        if len(other_xyz) == 0:
+            return np.zeros(len(owner_xyz), dtype=np.int64), np.full(len(owner_xyz), np.inf)
+        dist, idx = cKDTree(other_xyz).query(owner_xyz, k=1, distance_upper_bound=dist_m)
+        return idx, dist
+    if len(other_xyz) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    pairs = cKDTree(owner_xyz).sparse_distance_matrix(cKDTree(other_xyz), dist_m, output_type="ndarray")
+    return pairs["i"].astype(np.int64), pairs["j"].astype(np.int64), pairs["v"]
+
+
+def _run(kind, owner_xyz, other_xyz, dist_m, workers, tile_km):
+    """Every tile's (core, near, _join result), tiles in parallel unless the input is small."""
+    workers = workers or os.cpu_count() or 1
+    tile_m = tile_size(owner_xyz, dist_m, workers, tile_km)
+    layout = list(tiles(owner_xyz, other_xyz, tile_m, dist_m))
+    jobs = ((kind, owner_xyz[core], other_xyz[near], dist_m) for core, near in layout)
+    if workers == 1 or len(owner_xyz) < SERIAL_BELOW or len(layout) == 1:
+        results = [_join(*job) for job in jobs]
+    else:
+        pool = _executor(workers)
+        results = [f.result() for f in [pool.submit(_join, *job) for job in jobs]]
+    return [(core, near, result) for (core, near), result in zip(layout, results)]
+
+
+# ─────────────────────────────────────────────
+#  JOINS
+# ─────────────────────────────────────────────
+def nearest(target_xyz, query_xyz, halo_m=NEAREST_HALO_M, workers=None, tile_km=None):
+    """
+    Nearest target per (n, 3) query point → (idx, dist_m), like bd_geo.nearest_points.
+    Tiles search within halo_m; points with nothing that close get one global query.
+    """
+    idx = np.full(len(query_xyz), -1, dtype=np.int64)
+    dist = np.full(len(query_xyz), np.inf)
+    if len(query_xyz) == 0 or len(target_xyz) == 0:
+        return idx, dist
+
+    for core, near, (j, d) in _run("nearest", query_xyz, target_xyz, halo_m, workers, tile_km):
+        hit = np.isfinite(d)
+        idx[core[hit]] = near[j[hit]]
+        dist[core[hit]] = d[hit]
+
+    miss = np.flatnonzero(idx < 0)
+    if len(miss):
+        dist[miss], idx[miss] = cKDTree(target_xyz).query(query_xyz[miss], k=1)
+    return idx, dist
+
+
+def close_pairs(xyz, dist_m, min_dist_m=0.0, workers=None, tile_km=None):
+    """
+    Spatial self-join on (n, 3) points, like bd_geo.find_close_pairs: every unordered
+    pair within dist_m → (i, j, dist) with i < j, sorted by distance.
+    """
+    found = []
+    for core, near, (a, b, _) in _run("pairs", xyz, xyz, dist_m, workers, tile_km):
+        i, j = core[a], near[b]
+        # Both ends may sit in different tiles — only the tile owning i keeps the pair
+        found.append(np.column_stack([i, j])[i < j])
+    pairs = np.vstack(found) if found else np.empty((0, 2), dtype=np.int64)
+    i, j = pairs[:, 0], pairs[:, 1]
+    dist = np.linalg.norm(xyz[i] - xyz[j], axis=1)
+
+    keep = dist >= min_dist_m
+    order = np.lexsort((j[keep], i[keep], dist[keep]))
+    return i[keep][order], j[keep][order], dist[keep][order]
+
+
+def cross_pairs(a_xyz, b_xyz, dist_m, workers=None, tile_km=None):
+    """
+    Every (a, b) pair of (n, 3) points from two sets within dist_m → (ia, ib, dist),
+    like cKDTree.sparse_distance_matrix (zero distances included).
+    """
+    ia, ib, dist = [], [], []
+    for core, near, (a, b, d) in _run("pairs", a_xyz, b_xyz, dist_m, workers, tile_km):
+        ia.append(core[a])
+        ib.append(near[b])
+        dist.append(d)
+    if not ia:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0)
+    return np.concatenate(ia), np.concatenate(ib), np.concatenate(dist)
@@ -0,0 +1,150 @@
+"""
+bd_points — compact, array-backed point store.
+
+A PointStore keeps points as ONE structured NumPy array, 24 bytes a row:
+
+    coords  float64 (2,)   [lon, lat]
+    id      int32          row position in the source stream (kept by subsets)
+    name    int32          code into a shared vocabulary (bd_data.DictColumn), -1 = unnamed
+
+instead of a pymongo dict per document (nested dicts, a coordinates list, a
+name string) and the per-query lists of {"name", "coords"} dicts built from
+them — roughly a tenth of the memory per settlement. Stores are filled batch by
+batch from projected RawBSONDocument cursors, so only the fields read are ever
+decoded (drivers without raw BSON support, e.g. mongomock, hand over plain dicts
+instead). PointRow is a __slots__ view for the few places that want one object
+per point.
+
+    store = bd_data.load_settlements(names=True)
+    far = store[dist > 5000]                      # still 24 bytes a row
+    for row in far[:3]:
+        print(row.name, row.lon, row.lat)
+"""
+import numpy as np
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+
+from bd_data import DictColumn
+
+POINT_DTYPE = np.dtype([("coords", "<f8", (2,)), ("id", "<i4"), ("name", "<i4")])
+
+# Cursor documents stay raw BSON; fields are decoded only when read
+RAW = CodecOptions(document_class=RawBSONDocument)
+
+
+def raw_reads(coll):
+    """coll reading RAW documents, or coll itself where the driver has no custom document_class (mongomock)."""
+    try:
+        return coll.with_options(codec_options=RAW)
+    except NotImplementedError:
+        return coll
+
+
+class PointRow:
+    """One point as an object: lon, lat, id and name (None if unnamed)."""
+
+    __slots__ = ("lon", "lat", "id", "name")
+
+    def __init__(self, lon, lat, id, name):
+        self.lon = lon
+        self.lat = lat
+        self.id = id
+        self.name = name
+
+    def __repr__(self):
+        return f"PointRow(lon={self.lon:.5f}, lat={self.lat:.5f}, id={self.id}, name={self.name!r})"
+
+
+class PointStore:
+    """Points as one POINT_DTYPE structured array plus the names' vocabulary (None: names not loaded)."""
+
+    __slots__ = ("rows", "vocab")
+
+    def __init__(self, rows, vocab=None):
+        self.rows = rows
+        self.vocab = vocab
+
+    @classmethod
+    def from_columns(cls, coords, names=None, first_id=0):
+        """(n, 2) [lon, lat] coords + optional DictColumn names → store with ids first_id, first_id + 1, ..."""
+        coords = np.asarray(coords, dtype=float).reshape(-1, 2)
+        rows = np.empty(len(coords), dtype=POINT_DTYPE)
+        rows["coords"] = coords
+        rows["id"] = np.arange(first_id, first_id + len(coords))
+        rows["name"] = -1 if names is None else names.codes
+        return cls(rows, None if names is None else names.vocab)
+
+    @classmethod
+    def concat(cls, stores):
+        """One store from several that share a vocabulary (e.g. consecutive settlement batches)."""
+        stores = list(stores)
+        if not stores:
+            return cls(np.empty(0, dtype=POINT_DTYPE))
+        return cls(np.concatenate([s.rows for s in stores]), stores[0].vocab)
+
+    @property
+    def coords(self):
+        """(n, 2) [lon, lat] float64 view (no copy)."""
+        return self.rows["coords"]
+
+    @property
+    def lon(self):
+        return self.rows["coords"][:, 0]
+
+    @property
+    def lat(self):
+        return self.rows["coords"][:, 1]
+
+    @property
+    def ids(self):
+        return self.rows["id"]
+
+    @property
+    def names(self):
+        """Names as a DictColumn over the codes (None when the store was loaded without names)."""
+        return None if self.vocab is None else DictColumn(self.rows["name"], self.vocab)
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __getitem__(self, i):
+        """int → PointRow; slice / mask / index array → PointStore over those rows."""
+        if isinstance(i, (int, np.integer)):
+            (lon, lat), id_, code = self.rows[i].tolist()
+            return PointRow(lon, lat, id_, self.vocab[code] if code >= 0 else None)
+        return PointStore(self.rows[i], self.vocab)
+
+    def __iter__(self):
+        for (lon, lat), id_, code in self.rows.tolist():
+            yield PointRow(lon, lat, id_, self.vocab[code] if code >= 0 else None)
+
+
+def iter_cursor(cursor, batch_size=50_000, names=False):
+    """
+    Stream a projected cursor of GeoJSON Point documents (RAW or plain dicts — see raw_reads)
+    as PointStore batches. ids count documents from 0 across batches; with names=True,
+    properties.name is dictionary-encoded into one vocabulary shared by every batch.
+    """
+    vocab, lookup = ([], {}) if names else (None, None)
+    flat, codes, start = [], [], 0
+    for doc in cursor:
+        flat.extend(doc["geometry"]["coordinates"][:2])
+        if names:
+            props = doc.get("properties")
+            name = props.get("name") if props is not None else None
+            code = -1 if name is None else lookup.get(name)
+            if code is None:
+                code = lookup[name] = len(vocab)
+                vocab.append(name)
+            codes.append(code)
+        if len(flat) >= 2 * batch_size:
+            yield _batch(flat, codes, vocab, start)
+            start += len(flat) // 2
+            flat, codes = [], []
+    if flat:
+        yield _batch(flat, codes, vocab, start)
+
+
+def _batch(flat, codes, vocab, start):
+    names = DictColumn(np.array(codes, dtype=np.int32), vocab) if vocab is not None else None
+    return PointStore.from_columns(np.array(flat, dtype=float).reshape(-1, 2), names, start)
@@ -0,0 +1,193 @@
+"""
+bd_render — compact folium layers for the BD_Q* maps.
+
+Every layer is written as ONE GeoJSON FeatureCollection instead of one folium
+object per point / line / polygon:
+
+  • styles are de-duplicated into a small table and each feature only carries
+    its index into it ("s"), plus an optional tooltip string ("t");
+  • coordinates are rounded to COORD_DECIMALS (≈ 1 m);
+  • points become canvas-rendered CircleMarkers (maps are created with
+    prefer_canvas=True), so the browser draws one <canvas>, not 10k SVG nodes;
+  • polygons are simplified to the pixel size at a chosen detail zoom;
+  • each layer is held to a byte budget — a prefix of priority-ordered features,
+    or an even stride sample of unordered ones.
+"""
+import json
+import os
+import uuid
+
+import folium
+import numpy as np
+import shapely
+from folium.utilities import JsCode
+from shapely.geometry import mapping, shape
+
+import bd_data
+import bd_trace
+
+COORD_DECIMALS = 5              # 1e-5° ≈ 1.1 m
+LAYER_BUDGET_BYTES = 1_000_000  # per layer, before folium's own wrapping
+DETAIL_ZOOM = 10                # polygons keep ~1 px of detail at this zoom
+
+
+def new_map(tiles="CartoDB positron", location=None, zoom_start=7):
+    """folium.Map centred on Tamil Nadu, drawing vector layers on a shared canvas."""
+    return folium.Map(location=location or bd_data.TN_CENTER, zoom_start=zoom_start,
+                      tiles=tiles, prefer_canvas=True)
+
+
+def save_map(m, path):
+    """Save m (timed as the query's "save" phase) and report the file size."""
+    with bd_trace.span("save"):
+        m.save(path)
+    print(f"  ✅ Saved: {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+
+def simplify_tolerance(zoom=DETAIL_ZOOM, lat=bd_data.TN_CENTER[0]):
+    """Degrees spanned by one Web-Mercator pixel at zoom (north–south, at lat)."""
+    return 360.0 / (256 * 2 ** zoom) * np.cos(np.radians(lat))
+
+
+# ─────────────────────────────────────────────
+#  FEATURE BUILDING
+# ─────────────────────────────────────────────
+def _style_codes(style, n):
+    """One style dict or n per-feature dicts → (table, int codes)."""
+    if isinstance(style, dict):
+        return [style], np.zeros(n, dtype=np.int64)
+    table, lookup, codes = [], {}, np.empty(n, dtype=np.int64)
+    for k, s in enumerate(style):
+        key = json.dumps(s, sort_keys=True)
+        if key not in lookup:
+            lookup[key] = len(table)
+            table.append(s)
+        codes[k] = lookup[key]
+    return table, codes
+
+
+def _feature(geometry, code, tooltip):
+    props = {"s": int(code)}
+    if tooltip is not None:
+        props["t"] = tooltip
+    return {"type": "Feature", "geometry": geometry, "properties": props}
+
+
+def _budget_take(n, sizes, budget_bytes, priority):
+    """
+    Indices of the features that fit in budget_bytes.
+    sizes: exact per-feature byte sizes, or a single average to extrapolate from.
+    """
+    if np.ndim(sizes) == 0:
+        keep = n if sizes * n <= budget_bytes else int(budget_bytes // max(sizes, 1))
+        if keep >= n:
+            return np.arange(n)
+        if priority:
+            return np.arange(keep)
+        return np.unique(np.linspace(0, n - 1, keep).astype(np.int64))
+    fits = np.cumsum(sizes) <= budget_bytes
+    return np.arange(n) if fits.all() else np.arange(int(np.argmin(fits)))
+
+
+def _report(name, n, kept):
+    if kept < n:
+        print(f"  ✂️  {name}: {kept:,} of {n:,} features drawn (layer size budget)")
+
+
+def _layer(features, table, name, tooltips, marker=None):
+    # Styles ride in one JS array, built on the first feature; each feature picks its entry by index
+    var = "bd_styles_" + uuid.uuid4().hex[:12]
+    on_each = JsCode(
+        f"function(f, l){{var S = window.{var} || (window.{var} = {json.dumps(table)});"
+        "l.setStyle(S[f.properties.s]);}"
+    )
+    tooltip = (folium.GeoJsonTooltip(fields=["t"], labels=False)
+               if tooltips is not None and features else None)
+    return folium.GeoJson(
+        {"type": "FeatureCollection", "features": features},
+        name=name, marker=marker, on_each_feature=on_each, tooltip=tooltip,
+    )
+
+
+# ─────────────────────────────────────────────
+#  LAYERS
+# ─────────────────────────────────────────────
+def point_layer(lon, lat, style, tooltips=None, name=None,
+                budget_bytes=LAYER_BUDGET_BYTES, priority=False):
+    """
+    Points as a single canvas CircleMarker layer.
+    style    : one dict of Leaflet path options (color, radius, fill_opacity, ...)
+               or one dict per point.
+    tooltips : optional per-point strings (HTML allowed).
+    priority : points are ordered most-important first — keep a prefix when over
+               budget instead of an even sample.
+    """
+    lon = np.round(np.asarray(lon, dtype=float), COORD_DECIMALS)
+    lat = np.round(np.asarray(lat, dtype=float), COORD_DECIMALS)
+    n = len(lon)
+    table, codes = _style_codes(style, n)
+    table = [_leaflet_options(s) for s in table]
+
+    def build(k):
+        return _feature({"type": "Point", "coordinates": [lon[k].item(), lat[k].item()]},
+                        codes[k], None if tooltips is None else tooltips[k])
+
+    sample = [build(k) for k in range(min(n, 64))]
+    avg = np.mean([len(json.dumps(f)) for f in sample]) if sample else 0.0
+    take = _budget_take(n, avg, budget_bytes, priority)
+    _report(name or "points", n, len(take))
+
+    features = [build(k) for k in take.tolist()]
+    return _layer(features, table, name, tooltips, marker=folium.CircleMarker(fill=True))
+
+
+def line_layer(lon1, lat1, lon2, lat2, style, tooltips=None, name=None,
+               budget_bytes=LAYER_BUDGET_BYTES, priority=True):
+    """Straight segments (lon1, lat1) → (lon2, lat2) as one LineString layer."""
+    ends = np.round(np.column_stack([lon1, lat1, lon2, lat2]).astype(float), COORD_DECIMALS)
+    n = len(ends)
+    table, codes = _style_codes(style, n)
+    table = [_leaflet_options(s) for s in table]
+
+    def build(k):
+        a, b, c, d = ends[k].tolist()
+        return _feature({"type": "LineString", "coordinates": [[a, b], [c, d]]},
+                        codes[k], None if tooltips is None else tooltips[k])
+
+    sample = [build(k) for k in range(min(n, 64))]
+    avg = np.mean([len(json.dumps(f)) for f in sample]) if sample else 0.0
+    take = _budget_take(n, avg, budget_bytes, priority)
+    _report(name or "lines", n, len(take))
+
+    return _layer([build(k) for k in take.tolist()], table, name, tooltips)
+
+
+def polygon_layer(geometries, style, tooltips=None, name=None, detail_zoom=DETAIL_ZOOM,
+                  budget_bytes=LAYER_BUDGET_BYTES):
+    """
+    Polygons (GeoJSON dicts or shapely geometries, most important first) as one
+    layer, simplified to ~1 px at detail_zoom and rounded to COORD_DECIMALS.
+    """
+    geoms = np.array([g if isinstance(g, shapely.Geometry) else shape(g) for g in geometries],
+                     dtype=object)
+    geoms = shapely.simplify(geoms, simplify_tolerance(detail_zoom), preserve_topology=True)
+    geoms = shapely.transform(geoms, lambda c: np.round(c, COORD_DECIMALS))
+    n = len(geoms)
+    table, codes = _style_codes(style, n)
+    table = [_leaflet_options(s) for s in table]
+
+    features = [_feature(mapping(g), codes[k], None if tooltips is None else tooltips[k])
+                for k, g in enumerate(geoms)]
+    take = _budget_take(n, [len(json.dumps(f)) for f in features], budget_bytes, True)
+    _report(name or "polygons", n, len(take))
+
+    return _layer([features[k] for k in take.tolist()], table, name, tooltips)
+
+
+def _leaflet_options(style):
+    """folium-style snake_case keys (fill_opacity) → Leaflet camelCase (fillOpacity)."""
+    out = {}
+    for key, value in style.items():
+        head, *rest = key.split("_")
+        out[head + "".join(p.title() for p in rest)] = value
+    return out
@@ -0,0 +1,167 @@
+"""
+bd_roads — road-network distances: road_network compiled into a CSR graph.
+
+Road geometries (LineString / MultiLineString) are compiled once into an
+array-backed graph:
+
+  • vertices are snapped to a SNAP_M grid in UTM metres, so segments that meet
+    (to within a few metres) share a node;
+  • every consecutive vertex pair becomes an edge in both directions, weighted
+    by its great-circle length; parallel duplicates keep the shortest;
+  • the graph is held as CSR arrays — int32 indptr / indices, float64 weights —
+    plus an (n, 2) [lon, lat] node array.
+
+The compiled graph is cached in GRAPH_DIR/graph.npz next to the collection's
+fingerprint (bd_snapshot.fingerprint) and only recompiled when that changes.
+
+Distances from all towers come from ONE multi-source Dijkstra: each tower is a
+virtual node joined to its nearest road node by its straight-line access
+distance, and dijkstra(min_only=True) grows every source at once, so each road
+node ends up with the distance to, and the index of, its closest tower along
+the network. Settlements then only need a nearest-node lookup.
+"""
+import json
+import os
+
+import numpy as np
+from scipy import sparse
+from scipy.sparse.csgraph import dijkstra
+
+import bd_data
+import bd_geo
+import bd_snapshot
+
+GRAPH_DIR = os.environ.get("BD_ROADS_DIR", ".bd_roads")
+GRAPH_FILE = "graph.npz"
+MANIFEST = "manifest.json"
+SNAP_M = 5.0                # vertices closer than ~this share a node
+MAX_ACCESS_M = 2000.0       # tower / settlement farther than this from any road node → off the network
+
+
+# ─────────────────────────────────────────────
+#  COMPILE
+# ─────────────────────────────────────────────
+def compile_graph(lines, snap_m=SNAP_M):
+    """(k, 2) [lon, lat] polylines → graph dict {"nodes", "indptr", "indices", "weights"}."""
+    lines = [np.asarray(line, dtype=float).reshape(-1, 2) for line in lines]
+    lines = [line for line in lines if len(line) >= 2]
+    if not lines:
+        return {"nodes": np.empty((0, 2)), "indptr": np.zeros(1, dtype=np.int32),
+                "indices": np.empty(0, dtype=np.int32), "weights": np.empty(0)}
+    verts = np.vstack(lines)
+
+    # Snap: one node per occupied SNAP_M cell
+    cell = np.round(bd_geo.to_utm(verts[:, 0], verts[:, 1]) / snap_m).astype(np.int64)
+    key = (cell[:, 0] << 32) + cell[:, 1]
+    _, first, node_of = np.unique(key, return_index=True, return_inverse=True)
+    n = len(first)
+
+    # Consecutive vertices of the same line → undirected edge
+    same_line = np.ones(len(verts) - 1, dtype=bool)
+    same_line[np.cumsum([len(line) for line in lines])[:-1] - 1] = False
+    a, b = np.flatnonzero(same_line), np.flatnonzero(same_line) + 1
+    u, v = node_of[a], node_of[b]
+    w = bd_geo.haversine_m(verts[a, 0], verts[a, 1], verts[b, 0], verts[b, 1])
+    keep = u != v
+    u, v, w = np.r_[u[keep], v[keep]], np.r_[v[keep], u[keep]], np.r_[w[keep], w[keep]]
+
+    # Parallel edges: keep the shortest
+    order = np.lexsort((w, v, u))
+    u, v, w = u[order], v[order], w[order]
+    first_edge = np.r_[True, (u[1:] != u[:-1]) | (v[1:] != v[:-1])]
+    u, v, w = u[first_edge], v[first_edge], w[first_edge]
+
+    indptr = np.zeros(n + 1, dtype=np.int32)
+    np.cumsum(np.bincount(u, minlength=n), out=indptr[1:])
+    return {"nodes": verts[first], "indptr": indptr, "indices": v.astype(np.int32), "weights": w}
+
+
+def _read_manifest(graph_dir):
+    try:
+        with open(os.path.join(graph_dir, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def save_graph(graph, fingerprint, graph_dir=GRAPH_DIR):
+    """Write graph arrays, then the manifest (fingerprint + sizes) that marks the cache valid."""
+    os.makedirs(graph_dir, exist_ok=True)
+    path = os.path.join(graph_dir, GRAPH_FILE)
+    with open(path + ".tmp", "wb") as f:
+        np.savez(f, **graph)
+    os.replace(path + ".tmp", path)
+    with open(os.path.join(graph_dir, MANIFEST), "w") as f:
+        json.dump({"fingerprint": fingerprint, "snap_m": SNAP_M, "nodes": len(graph["nodes"]),
+                   "edges": len(graph["indices"])}, f)
+
+
+def load_graph(graph_dir=GRAPH_DIR, check=True):
+    """
+    The compiled road graph — from the on-disk cache when its fingerprint still
+    matches road_network (check=False trusts any existing cache), else compiled
+    from the collection and cached.
+    """
+    manifest = _read_manifest(graph_dir)
+    fp = bd_snapshot.fingerprint(bd_data.roads()) if check or manifest is None else None
+    if manifest is not None and (not check or manifest["fingerprint"] == fp):
+        with np.load(os.path.join(graph_dir, GRAPH_FILE)) as f:
+            return {k: f[k] for k in f.files}
+
+    print(f"  🛣️  Compiling {bd_data.ROADS_COLLECTION} into a road graph...")
+    graph = compile_graph(bd_data.load_road_lines())
+    save_graph(graph, fp, graph_dir)
+    print(f"  {len(graph['nodes']):,} nodes, {len(graph['indices']) // 2:,} edges → {graph_dir}/")
+    return graph
+
+
+# ─────────────────────────────────────────────
+#  DISTANCES
+# ─────────────────────────────────────────────
+def tower_field(graph, tower_coords, max_access_m=MAX_ACCESS_M):
+    """
+    One multi-source Dijkstra from every tower over the road graph.
+    Returns {"index": KD-tree over road nodes, "dist": metres to the nearest tower per
+    node (inf if unreachable), "tower": that tower's position in tower_coords (-1)}.
+    Towers farther than max_access_m from every road node do not seed the search.
+    """
+    nodes = graph["nodes"]
+    n = len(nodes)
+    field = {"index": bd_geo.build_point_index(nodes), "dist": np.full(n, np.inf),
+             "tower": np.full(n, -1, dtype=np.int64)}
+    if n == 0 or len(tower_coords) == 0:
+        return field
+
+    snap, access = bd_geo.nearest_points(field["index"], tower_coords, max_dist_m=max_access_m)
+    seeded = np.flatnonzero(snap >= 0)
+    m = len(seeded)
+    if m == 0:
+        return field
+
+    # Towers as m virtual nodes n..n+m-1, each with one edge onto its road node
+    roads = sparse.csr_matrix((graph["weights"], graph["indices"], graph["indptr"]), shape=(n, n))
+    access_edges = sparse.csr_matrix((np.maximum(access[seeded], 1e-9), (np.arange(m), snap[seeded])),
+                                     shape=(m, n))
+    full = sparse.bmat([[roads, None], [access_edges, sparse.csr_matrix((m, m))]], format="csr")
+
+    dist, _, sources = dijkstra(full, directed=True, indices=np.arange(n, n + m), min_only=True,
+                                return_predecessors=True)
+    field["dist"] = dist[:n]
+    reached = sources[:n] >= n
+    field["tower"][reached] = seeded[sources[:n][reached] - n]
+    return field
+
+
+def lookup(field, coords, max_access_m=MAX_ACCESS_M):
+    """
+    Road distance to the nearest tower for (n, 2) [lon, lat] points → (tower idx, dist_m):
+    straight-line access to the nearest road node plus that node's network distance.
+    Points farther than max_access_m from every road node get -1 / inf.
+    """
+    node, access = bd_geo.nearest_points(field["index"], coords, max_dist_m=max_access_m)
+    on = node >= 0
+    dist = np.full(len(node), np.inf)
+    dist[on] = access[on] + field["dist"][node[on]]
+    tower = np.full(len(node), -1, dtype=np.int64)
+    tower[on] = field["tower"][node[on]]
+    return tower, dist
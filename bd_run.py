@@ -0,0 +1,145 @@
+"""
+bd_run — run any subset of the BD_Q* queries in one process.
+
+    python -m bd_run                 # all ten
+    python -m bd_run 2 5 9           # just Q2, Q5 and Q9
+    python -m bd_run --snapshot .bd_snapshot 1 4
+    python -m bd_run --snapshot .bd_snapshot --offline 1 4   # no MongoDB needed
+    python -m bd_run 3 6 --trace trace.json --profile cprofile
+    python -m bd_run 2 5 9 --incremental .bd_incremental
+    python -m bd_run 3 4 5 6 --server-knn 64   # $near on the server, 64 in flight
+    python -m bd_run 1 4 8 --check-indexes
+    python -m bd_run 2 3 5 9 --partitions 8    # distance joins tiled over 8 processes
+    python -m bd_run 2 5 6 9 --stream          # bounded memory: settlements never held whole
+
+Query modules (and their folium / shapely / scipy imports) are only imported
+when selected, and tower / settlement / district data is loaded once and shared
+by every selected query, so the full suite costs one startup and one data load.
+--offline serves the --snapshot files as they are, without checking the
+collections for changes, so no MongoDB server is needed. --trace breaks each
+query down into fetch / compute / render / save time and MongoDB round-trips
+(see bd_trace) and writes the report as JSON.
+--incremental serves towers, the nearest-tower pass and Q6's tile pyramid from
+bd_incremental's persisted state instead of recomputing them. --server-knn answers the
+nearest-tower lookups with concurrent server-side $near queries (bd_near).
+--check-indexes creates the indexes the selected queries rely on and explains
+their query shapes first, stopping on a collection scan (bd_indexes).
+--partitions cuts the distance joins into halo-padded tiles run across worker
+processes (bd_partition). --stream reads settlements batch by batch, one batch
+ahead, into running aggregates instead of caching them (bd_stream).
+"""
+import argparse
+import importlib
+import time
+
+import bd_data
+import bd_trace
+
+# query number → (module, function)
+QUERIES = {
+    1: ("BD_Q1", "query1_district_dead_zones"),
+    2: ("BD_Q2", "query2_uncovered_settlements"),
+    3: ("BD_Q3", "query3_redundant_towers"),
+    4: ("BD_Q4", "query4_district_centroid_remoteness"),
+    5: ("BD_Q5", "query5_tower_load_hotspots"),
+    6: ("BD_Q6", "query6_distance_heatmap"),
+    7: ("BD_Q7", "query7_coastal_vs_inland"),
+    8: ("BD_Q8", "query8_voronoi_coverage_zones"),
+    9: ("BD_Q9", "query9_optimal_new_tower_placement"),
+    10: ("BD_Q10", "query10_road_distance_heatmap"),
+}
+
+
+def resolve(n):
+    """Import query n's module on demand and return its query function."""
+    module, func = QUERIES[n]
+    return getattr(importlib.import_module(module), func)
+
+
+def run(selected=None, snapshot_dir=None, offline=False, cache=True, summary=False, trace=None, profile=None,
+        incremental=None, server_knn=None, check_indexes=False, partitions=None, stream=False):
+    """
+    Run the selected queries (default: all) in order, sharing one data load.
+    offline: trust snapshot_dir as it is — no freshness check against MongoDB.
+    trace: path of a bd_trace JSON report to write (profile: None, "cprofile", "tracemalloc").
+    incremental: bd_incremental state directory to take the nearest-tower assignment from.
+    server_knn: run nearest-tower lookups as $near queries, this many in flight (0 = pool size).
+    check_indexes: ensure + explain-validate the indexes first (bd_indexes.PlanError on failure).
+    partitions: run the distance joins tiled across this many processes (0 = every core).
+    stream: bounded-memory mode — settlements are streamed per batch, never cached.
+    Returns {query number: result}.
+    """
+    selected = sorted(set(selected or QUERIES))
+    if trace or profile:
+        bd_trace.enable(profile)
+    if snapshot_dir:
+        bd_data.use_snapshot(snapshot_dir, check=not offline)
+    bd_data.enable_cache(cache)
+    if server_knn is not None:
+        bd_data.use_server_knn(concurrency=server_knn or None)
+    if partitions is not None:
+        bd_data.use_partitions(workers=partitions or None)
+    if stream:
+        bd_data.use_streaming()
+    if check_indexes:
+        import bd_indexes
+        bd_indexes.ensure(selected)
+        bd_indexes.validate(selected)
+    if incremental:
+        import bd_incremental
+        bd_incremental.prime(incremental)
+    if summary:
+        bd_data.print_summary()
+
+    results, timings, reports = {}, {}, {}
+    for n in selected:
+        t0 = time.perf_counter()
+        with bd_trace.query(f"Q{n}") as reports[n]:
+            results[n] = resolve(n)()
+        timings[n] = time.perf_counter() - t0
+
+    print("\n⏱  Timings")
+    for n in selected:
+        detail = f"   ({bd_trace.summary_line(reports[n])})" if reports[n] else ""
+        print(f"  Q{n}: {timings[n]:.2f}s{detail}")
+    print(f"  Total: {sum(timings.values()):.2f}s")
+    if trace:
+        bd_trace.write_report(trace)
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bd_run", description=__doc__.split("\n\n")[0])
+    parser.add_argument("queries", nargs="*", type=int, metavar="N",
+                        help="query numbers to run (1–10); default all")
+    parser.add_argument("--snapshot", metavar="DIR", help="serve data from a local columnar snapshot")
+    parser.add_argument("--offline", action="store_true",
+                        help="with --snapshot: skip the freshness check, no database round-trips")
+    parser.add_argument("--no-cache", action="store_true", help="re-load data for every query")
+    parser.add_argument("--summary", action="store_true", help="print collection counts first")
+    parser.add_argument("--trace", metavar="FILE", help="write a per-query JSON instrumentation report")
+    parser.add_argument("--profile", choices=bd_trace.PROFILES, help="profile each query (implies tracing)")
+    parser.add_argument("--incremental", metavar="DIR",
+                        help="take towers and nearest-tower distances from a bd_incremental state")
+    parser.add_argument("--server-knn", type=int, nargs="?", const=0, metavar="N",
+                        help="server-side $near lookups, N in flight (default: connection pool size)")
+    parser.add_argument("--check-indexes", action="store_true",
+                        help="create missing indexes and stop if a query shape would scan a collection")
+    parser.add_argument("--partitions", type=int, nargs="?", const=0, metavar="N",
+                        help="tile the distance joins across N worker processes (default: every core)")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream settlements batch by batch into running aggregates (bounded memory)")
+    args = parser.parse_args(argv)
+    unknown = [n for n in args.queries if n not in QUERIES]
+    if unknown:
+        parser.error(f"unknown query number(s): {unknown} — choose from 1–10")
+    if args.offline and not args.snapshot:
+        parser.error("--offline needs --snapshot DIR")
+    run(args.queries, snapshot_dir=args.snapshot, offline=args.offline, cache=not args.no_cache,
+        summary=args.summary, trace=args.trace, profile=args.profile, incremental=args.incremental,
+        server_knn=args.server_knn, check_indexes=args.check_indexes, partitions=args.partitions,
+        stream=args.stream)
+
+
+if __name__ == "__main__":
+    main()
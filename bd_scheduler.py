@@ -0,0 +1,254 @@
+"""
+bd_scheduler — run the BD_Q* queries concurrently over shared intermediate data.
+
+Each query declares the intermediate nodes it reads (tower points, settlement
+points, nearest-tower distances, district polygons, the road graph). The
+scheduler builds every needed node exactly once in the parent, in dependency
+order, publishes the arrays through multiprocessing.shared_memory and runs the queries in a process
+pool. Workers map the same pages instead of unpickling copies, and their
+bd_data loaders are primed with those views, so no query re-reads or
+re-computes a shared input. Wall time ≈ node build + slowest query.
+
+    python -m bd_scheduler                    # all ten, one worker per core
+    python -m bd_scheduler 2 5 6 9 --workers 4 --snapshot .bd_snapshot
+    python -m bd_scheduler --trace trace.json  # per-node and per-query bd_trace report
+"""
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+from bson import ObjectId
+
+import bd_data
+import bd_trace
+from bd_run import QUERIES, resolve
+
+STATE = "Tamil Nadu"
+
+# node → nodes it is computed from
+NODES = {
+    "towers":      (),
+    "settlements": (),
+    "nearest":     ("towers", "settlements"),
+    "districts":   (),
+    "roads":       (),
+}
+
+# query → nodes it reads
+QUERY_INPUTS = {
+    1: ("towers", "districts"),
+    2: ("towers", "settlements", "nearest"),
+    3: ("towers",),
+    4: ("towers", "districts"),
+    5: ("towers", "settlements", "nearest"),
+    6: ("towers", "settlements", "nearest"),
+    7: ("towers", "settlements"),
+    8: ("towers", "settlements", "nearest", "districts"),
+    9: ("towers", "settlements", "nearest"),
+    10: ("towers", "settlements", "nearest", "roads"),
+}
+
+
+def plan(selected):
+    """Nodes needed by the selected queries, in dependency (topological) order."""
+    order = []
+
+    def visit(node):
+        for dep in NODES[node]:
+            visit(dep)
+        if node not in order:
+            order.append(node)
+
+    for n in selected:
+        for node in QUERY_INPUTS[n]:
+            visit(node)
+    return order
+
+
+# ─────────────────────────────────────────────
+#  SHARED MEMORY
+# ─────────────────────────────────────────────
+class SharedArrays:
+    """Parent-side owner of the shared-memory blocks; unlinks them on close()."""
+
+    def __init__(self):
+        self.blocks = []
+        self.spec = {}      # key → (shm name, shape, dtype str — or field list for structured arrays)
+
+    def put(self, key, arr):
+        arr = np.ascontiguousarray(arr)
+        shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        self.blocks.append(shm)
+        self.spec[key] = (shm.name, arr.shape, arr.dtype.descr if arr.dtype.names else arr.dtype.str)
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+
+_attached = []      # worker-side handles, kept alive as long as the views are
+
+
+def _view(spec, key):
+    name, shape, dtype = spec[key]
+    shm = shared_memory.SharedMemory(name=name)
+    _attached.append(shm)
+    return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf)
+
+
+class _ObjectIdColumn:
+    def __init__(self, raw):
+        self.raw = raw
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, i):
+        return ObjectId(self.raw[i].tobytes())
+
+
+# ─────────────────────────────────────────────
+#  NODE BUILD (parent) / ATTACH (workers)
+# ─────────────────────────────────────────────
+def build_nodes(nodes, shared):
+    """Compute each node once through bd_data's cache and publish it. Returns (small objects, timings)."""
+    bd_data.enable_cache(True)
+    objects, timings = {}, {}
+    for node in nodes:
+        t0 = time.perf_counter()
+        with bd_trace.query(f"node {node}"):
+            _build_node(node, shared, objects)
+        timings[node] = time.perf_counter() - t0
+    return objects, timings
+
+
+def _build_node(node, shared, objects):
+    if node == "towers":
+        coords, ids = bd_data.load_tower_points()
+        shared.put("tower_coords", coords)
+        if len(ids) and all(isinstance(i, ObjectId) for i in ids):
+            raw = np.frombuffer(b"".join(i.binary for i in ids), dtype=np.uint8)
+            shared.put("tower_ids", raw.reshape(-1, 12))
+        else:
+            objects["tower_ids"] = list(ids)
+    elif node == "settlements":
+        store = bd_data.load_settlements(names=True)
+        shared.put("settlement_rows", store.rows)
+        objects["settlement_vocab"] = store.vocab
+    elif node == "nearest":
+        idx, dist = bd_data.load_nearest_towers()
+        shared.put("nearest_idx", idx)
+        shared.put("nearest_dist", dist)
+    elif node == "districts":
+        objects["districts"] = bd_data.load_districts(STATE)
+    elif node == "roads":
+        for name, arr in bd_data.load_road_graph().items():
+            shared.put(f"road_{name}", arr)
+
+
+def _attach(spec, objects, trace=False, profile=None):
+    """Worker initializer: prime bd_data's cache with shared-memory views of every node."""
+    if trace:
+        bd_trace.enable(profile)
+    bd_data.enable_cache(True)
+    if "tower_coords" in spec:
+        ids = _ObjectIdColumn(_view(spec, "tower_ids")) if "tower_ids" in spec else objects["tower_ids"]
+        bd_data.prime_cache("towers", (_view(spec, "tower_coords"), ids))
+    if "settlement_rows" in spec:
+        import bd_points
+        bd_data.prime_cache("settlements", bd_points.PointStore(_view(spec, "settlement_rows"),
+                                                                objects["settlement_vocab"]))
+    if "nearest_idx" in spec:
+        bd_data.prime_cache("nearest", (_view(spec, "nearest_idx"), _view(spec, "nearest_dist")))
+    if "districts" in objects:
+        bd_data.prime_cache(("districts", STATE), objects["districts"])
+    if "road_nodes" in spec:
+        bd_data.prime_cache("road_graph", {name: _view(spec, f"road_{name}")
+                                           for name in ("nodes", "indptr", "indices", "weights")})
+
+
+def _run_query(n, return_result):
+    t0 = time.perf_counter()
+    with bd_trace.query(f"Q{n}") as report:
+        result = resolve(n)()
+    return n, time.perf_counter() - t0, result if return_result else None, report
+
+
+# ─────────────────────────────────────────────
+#  SCHEDULER
+# ─────────────────────────────────────────────
+def run(selected=None, workers=None, snapshot_dir=None, return_results=False, trace=None, profile=None):
+    """
+    Build the shared nodes for the selected queries once, then run the queries in a
+    process pool. Returns {query number: result} (results only if return_results=True —
+    some are large and would be pickled back to the parent).
+    trace: path of a bd_trace JSON report covering every node build and query.
+    """
+    selected = sorted(set(selected or QUERIES))
+    tracing = bool(trace or profile)
+    if tracing:
+        bd_trace.enable(profile)
+    workers = workers or min(len(selected), os.cpu_count() or 1)
+    if snapshot_dir:
+        bd_data.use_snapshot(snapshot_dir)
+
+    t_start = time.perf_counter()
+    nodes = plan(selected)
+    print(f"\n🧩 Shared nodes: {', '.join(nodes)}")
+
+    shared = SharedArrays()
+    results, timings = {}, {}
+    try:
+        objects, node_timings = build_nodes(nodes, shared)
+        for node, t in node_timings.items():
+            print(f"  {node:<12} built in {t:.2f}s")
+
+        # spawn: workers start clean (no inherited MongoClient sockets) and attach by name
+        ctx = mp.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                 initializer=_attach,
+                                 initargs=(shared.spec, objects, tracing, profile)) as pool:
+            futures = [pool.submit(_run_query, n, return_results) for n in selected]
+            for fut in as_completed(futures):
+                n, elapsed, result, report = fut.result()
+                timings[n] = elapsed
+                results[n] = result
+                bd_trace.record(report)
+                detail = f"   ({bd_trace.summary_line(report)})" if report else ""
+                print(f"  ✅ Q{n} finished in {elapsed:.2f}s{detail}")
+    finally:
+        shared.close()
+
+    wall = time.perf_counter() - t_start
+    print(f"\n⏱  Wall: {wall:.2f}s  |  Sum of query times: {sum(timings.values()):.2f}s"
+          f"  |  Slowest: Q{max(timings, key=timings.get)} {max(timings.values()):.2f}s")
+    if trace:
+        bd_trace.write_report(trace, extra={"wall_s": wall, "workers": workers})
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bd_scheduler", description=__doc__.split("\n\n")[0])
+    parser.add_argument("queries", nargs="*", type=int, metavar="N",
+                        help="query numbers to run (1–10); default all")
+    parser.add_argument("--workers", type=int, help="worker processes (default: one per query, up to CPU count)")
+    parser.add_argument("--snapshot", metavar="DIR", help="build nodes from a local columnar snapshot")
+    parser.add_argument("--trace", metavar="FILE", help="write a per-node / per-query JSON instrumentation report")
+    parser.add_argument("--profile", choices=bd_trace.PROFILES, help="profile each query (implies tracing)")
+    args = parser.parse_args(argv)
+    unknown = [n for n in args.queries if n not in QUERIES]
+    if unknown:
+        parser.error(f"unknown query number(s): {unknown} — choose from 1–10")
+    run(args.queries, workers=args.workers, snapshot_dir=args.snapshot, trace=args.trace,
+        profile=args.profile)
+
+
+if __name__ == "__main__":
+    main()
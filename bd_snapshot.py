@@ -0,0 +1,224 @@
+"""
+bd_snapshot — local columnar snapshot of the towers / settlements / districts collections.
+
+Each collection is exported once into <snapshot_dir>/<collection>/ as plain .npy
+columns (opened with mmap_mode="r", so reads are zero-copy views) plus a
+manifest.json holding a cheap fingerprint of the source collection:
+
+    towers_clean_fixed/       coords.npy (n, 2) float64 [lon, lat], ids.npy (n, 12) uint8
+    population_points_fixed/  coords.npy, ids.npy, name_codes.npy int32, names.json
+    districs/                 wkb.npy uint8, wkb_offsets.npy int64, properties.json
+
+The fingerprint is (estimated_document_count, max _id) — both answered from
+metadata / the _id index. Inserts and deletes are detected; in-place edits
+to existing documents are not, so call refresh(force=True) after those.
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+import shapely
+from bson import ObjectId
+from shapely.geometry import mapping, shape
+
+import bd_data
+
+SNAPSHOT_DIR = os.environ.get("BD_SNAPSHOT_DIR", ".bd_snapshot")
+MANIFEST = "manifest.json"
+
+
+def fingerprint(coll):
+    """Cheap change detector for a collection — no collection scan."""
+    last = coll.find_one({}, {"_id": 1}, sort=[("_id", -1)])
+    return {
+        "count": coll.estimated_document_count(),
+        "max_id": str(last["_id"]) if last else None,
+    }
+
+
+def _read_manifest(path):
+    try:
+        with open(os.path.join(path, MANIFEST)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def is_stale(coll, snapshot_dir=SNAPSHOT_DIR):
+    manifest = _read_manifest(os.path.join(snapshot_dir, coll.name))
+    return manifest is None or manifest.get("fingerprint") != fingerprint(coll)
+
+
+# ─────────────────────────────────────────────
+#  EXPORT
+# ─────────────────────────────────────────────
+def _encode_ids(ids):
+    if isinstance(ids, np.ndarray) and ids.dtype == np.uint8 and ids.ndim == 2:
+        return ids, "objectid"     # already raw ObjectId bytes
+    if len(ids) and all(isinstance(i, ObjectId) for i in ids):
+        # (n, 12) uint8 rather than "S12" — numpy strips trailing NUL bytes from S-strings
+        raw = np.frombuffer(b"".join(i.binary for i in ids), dtype=np.uint8)
+        return raw.reshape(-1, 12), "objectid"
+    return np.array([str(i) for i in ids]), "str"
+
+
+def write_points(out_dir, coords, ids, names=None):
+    """
+    Write point columns into out_dir: coords (n, 2) [lon, lat], ids (ObjectIds, raw
+    (n, 12) uint8 or anything str()-able) and optional names (None where unnamed).
+    """
+    np.save(os.path.join(out_dir, "coords.npy"), np.asarray(coords, dtype=float).reshape(-1, 2))
+    id_arr, id_type = _encode_ids(ids)
+    np.save(os.path.join(out_dir, "ids.npy"), id_arr)
+
+    if names is not None:
+        # Dictionary-encode names: int32 codes + vocabulary, -1 = missing
+        vocab, codes = {}, np.empty(len(names), dtype=np.int32)
+        for k, n in enumerate(names):
+            codes[k] = -1 if n is None else vocab.setdefault(n, len(vocab))
+        np.save(os.path.join(out_dir, "name_codes.npy"), codes)
+        with open(os.path.join(out_dir, "names.json"), "w") as f:
+            json.dump(list(vocab), f)
+    return {"id_type": id_type, "rows": len(id_arr)}
+
+
+def write_districts(out_dir, docs):
+    """Write district documents ({"properties", "geometry"}) into out_dir as WKB + properties."""
+    blobs, props = [], []
+    for doc in docs:
+        blobs.append(shapely.to_wkb(shape(doc["geometry"])))
+        props.append(doc.get("properties") or {})
+
+    offsets = np.zeros(len(blobs) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in blobs])
+    np.save(os.path.join(out_dir, "wkb.npy"), np.frombuffer(b"".join(blobs), dtype=np.uint8))
+    np.save(os.path.join(out_dir, "wkb_offsets.npy"), offsets)
+    with open(os.path.join(out_dir, "properties.json"), "w") as f:
+        json.dump(props, f, default=str)
+    return {"rows": len(blobs)}
+
+
+def _export_points(coll, out_dir, with_names):
+    ids, coords, names = [], [], []
+    projection = {"geometry.coordinates": 1}
+    if with_names:
+        projection["properties.name"] = 1
+    for doc in coll.find({}, projection).batch_size(50_000):
+        ids.append(doc["_id"])
+        coords.append(doc["geometry"]["coordinates"][:2])
+        if with_names:
+            names.append((doc.get("properties") or {}).get("name"))
+    return write_points(out_dir, coords, ids, names if with_names else None)
+
+
+def _export_districts(coll, out_dir):
+    return write_districts(out_dir, coll.find({}, {"geometry": 1, "properties": 1}))
+
+
+def write_collection(name, writer, fp, snapshot_dir=SNAPSHOT_DIR):
+    """Run writer(tmp_dir) → meta for one collection in a temp dir, then swap it in atomically."""
+    final_dir = os.path.join(snapshot_dir, name)
+    tmp_dir = final_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    meta = writer(tmp_dir)
+    meta["fingerprint"] = fp
+    with open(os.path.join(tmp_dir, MANIFEST), "w") as f:
+        json.dump(meta, f)
+
+    shutil.rmtree(final_dir, ignore_errors=True)
+    os.replace(tmp_dir, final_dir)
+    return meta
+
+
+def export_collection(coll, snapshot_dir=SNAPSHOT_DIR):
+    """Export one MongoDB collection's columns into the snapshot."""
+    fp = fingerprint(coll)
+    if coll.name == bd_data.DISTRICTS_COLLECTION:
+        writer = lambda out_dir: _export_districts(coll, out_dir)
+    else:
+        with_names = coll.name == bd_data.POPULATION_COLLECTION
+        writer = lambda out_dir: _export_points(coll, out_dir, with_names)
+    return write_collection(coll.name, writer, fp, snapshot_dir)
+
+
+def refresh(force=False, snapshot_dir=SNAPSHOT_DIR):
+    """Re-export every collection whose fingerprint changed. Returns the names refreshed."""
+    refreshed = []
+    for coll in (bd_data.towers(), bd_data.population(), bd_data.districs()):
+        if force or is_stale(coll, snapshot_dir):
+            print(f"  📦 Snapshotting {coll.name}...")
+            export_collection(coll, snapshot_dir)
+            refreshed.append(coll.name)
+    return refreshed
+
+
+# ─────────────────────────────────────────────
+#  READ (zero-copy memory-mapped views)
+# ─────────────────────────────────────────────
+class IdColumn:
+    """Read-only id sequence over ids.npy, decoding ObjectIds on access."""
+
+    def __init__(self, raw, id_type):
+        self.raw = raw
+        self.id_type = id_type
+
+    def __len__(self):
+        return len(self.raw)
+
+    def __getitem__(self, i):
+        if self.id_type == "objectid":
+            return ObjectId(self.raw[i].tobytes())
+        return str(self.raw[i])
+
+
+def _collection_dir(name, snapshot_dir):
+    return os.path.join(snapshot_dir, name)
+
+
+def _load(name, column, snapshot_dir):
+    return np.load(os.path.join(_collection_dir(name, snapshot_dir), column), mmap_mode="r")
+
+
+def tower_points(snapshot_dir=SNAPSHOT_DIR):
+    """(coords, ids) for every tower — coords is a memory-mapped (n, 2) [lon, lat] view."""
+    name = bd_data.TOWERS_COLLECTION
+    manifest = _read_manifest(_collection_dir(name, snapshot_dir))
+    return (_load(name, "coords.npy", snapshot_dir),
+            IdColumn(_load(name, "ids.npy", snapshot_dir), manifest["id_type"]))
+
+
+def settlement_columns(snapshot_dir=SNAPSHOT_DIR):
+    """(coords, name_codes, vocabulary) for every settlement — arrays are memory-mapped."""
+    name = bd_data.POPULATION_COLLECTION
+    with open(os.path.join(_collection_dir(name, snapshot_dir), "names.json")) as f:
+        vocab = json.load(f)
+    return (_load(name, "coords.npy", snapshot_dir),
+            _load(name, "name_codes.npy", snapshot_dir),
+            vocab)
+
+
+def district_docs(state=None, snapshot_dir=SNAPSHOT_DIR):
+    """District documents shaped like the Mongo ones: {"properties": ..., "geometry": GeoJSON}."""
+    name = bd_data.DISTRICTS_COLLECTION
+    with open(os.path.join(_collection_dir(name, snapshot_dir), "properties.json")) as f:
+        props = json.load(f)
+    wkb = _load(name, "wkb.npy", snapshot_dir)
+    offsets = _load(name, "wkb_offsets.npy", snapshot_dir)
+
+    docs = []
+    for k, p in enumerate(props):
+        if state and p.get("st_nm") != state:
+            continue
+        geom = shapely.from_wkb(wkb[offsets[k]:offsets[k + 1]].tobytes())
+        docs.append({"properties": p, "geometry": mapping(geom)})
+    return docs
+
+
+if __name__ == "__main__":
+    import sys
+    print(f"Snapshot dir: {SNAPSHOT_DIR}")
+    done = refresh(force="--force" in sys.argv)
+    print(f"  ✅ Refreshed: {done or 'nothing (snapshot is current)'}")
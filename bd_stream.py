@@ -0,0 +1,157 @@
+"""
+bd_stream — bounded-memory streaming over population_points_fixed.
+
+In streaming mode (bd_data.use_streaming() / BD_STREAM=1) settlements are
+never materialised: iter_settlement_batches / iter_settlement_nearest read the
+collection (or snapshot) in batch_size chunks, each chunk flows through the
+query's nearest-tower / classification step as a generator stage, and the
+results are folded into running aggregates. A prefetch thread reads the next
+batch while the current one is being processed, so cursor I/O and BSON decoding
+overlap with the KD-tree and NumPy work.
+
+The aggregates all take .add(rows) per batch and hand back .result():
+
+  • Collect   — every row (the non-streaming behaviour);
+  • Reservoir — a uniform random sample of at most k rows (map layers);
+  • Histogram — counts over fixed bin edges (distance distributions).
+
+keep(k) picks Collect normally and Reservoir(k) in streaming mode, so a query
+writes one loop for both.
+"""
+import queue
+import threading
+
+import numpy as np
+
+import bd_data
+
+PREFETCH = 2        # batches read ahead of the consumer
+
+
+# ─────────────────────────────────────────────
+#  SOURCE
+# ─────────────────────────────────────────────
+def prefetch(batches, depth=PREFETCH):
+    """
+    Iterate batches produced on a background thread, at most depth ahead.
+    Exceptions in the producer are re-raised here; closing the generator stops it.
+    """
+    q = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def produce():
+        try:
+            for item in batches:
+                while not stop.is_set():
+                    try:
+                        q.put((item, None), timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+                if stop.is_set():
+                    return
+            q.put((done, None))
+        except BaseException as exc:
+            q.put((done, exc))
+
+    worker = threading.Thread(target=produce, name="bd_stream.prefetch", daemon=True)
+    worker.start()
+    try:
+        while True:
+            item, exc = q.get()
+            if item is done:
+                if exc is not None:
+                    raise exc
+                return
+            yield item
+    finally:
+        stop.set()
+
+
+# ─────────────────────────────────────────────
+#  RUNNING AGGREGATES
+# ─────────────────────────────────────────────
+class Collect:
+    """Keeps every row added; result() is their concatenation (empty if nothing was added)."""
+
+    def __init__(self, empty=None):
+        self.parts = []
+        self.empty = empty
+        self.seen = 0
+
+    def add(self, rows):
+        self.parts.append(rows)
+        self.seen += len(rows)
+
+    def result(self):
+        return np.concatenate(self.parts) if self.parts else self.empty
+
+
+class Reservoir:
+    """
+    A uniform random sample of at most k rows from everything added (algorithm R,
+    vectorised per batch). Memory is k rows whatever the stream length.
+    """
+
+    def __init__(self, k, seed=0, empty=None):
+        self.k = k
+        self.rng = np.random.default_rng(seed)
+        self.sample = empty
+        self.seen = 0
+
+    def add(self, rows):
+        n = len(rows)
+        if n == 0:
+            return
+        if self.seen == 0:
+            self.sample = rows[:0].copy()
+        fill = min(max(self.k - len(self.sample), 0), n)
+        if fill:
+            self.sample = np.concatenate([self.sample, rows[:fill]])
+        if fill < n:
+            # Row t (0-based over the whole stream) replaces slot j ~ U[0, t] when j < k;
+            # repeated slots keep the last assignment, as a sequential pass would
+            t = self.seen + np.arange(fill, n)
+            j = (self.rng.random(len(t)) * (t + 1)).astype(np.int64)
+            hit = j < self.k
+            self.sample[j[hit]] = rows[fill:][hit]
+        self.seen += n
+
+    def result(self):
+        return self.sample
+
+
+class Histogram:
+    """Running counts of values over fixed bin edges (values past the last edge land in .over)."""
+
+    def __init__(self, edges):
+        self.edges = np.asarray(edges, dtype=float)
+        self.counts = np.zeros(len(self.edges) - 1, dtype=np.int64)
+        self.over = 0
+        self.seen = 0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=float)
+        self.counts += np.histogram(values, self.edges)[0]
+        self.over += int((values > self.edges[-1]).sum())
+        self.seen += len(values)
+
+    def result(self):
+        return self.counts
+
+    def quantile(self, q):
+        """Approximate q-quantile (interpolated within its bin); inf if it lies past the last edge."""
+        target = q * self.seen
+        cum = np.cumsum(self.counts)
+        b = int(np.searchsorted(cum, target))
+        if b >= len(self.counts):
+            return float("inf")
+        before = cum[b - 1] if b else 0
+        frac = (target - before) / max(self.counts[b], 1)
+        return float(self.edges[b] + frac * (self.edges[b + 1] - self.edges[b]))
+
+
+def keep(k, seed=0, empty=None):
+    """Every row normally; a Reservoir of k rows in streaming mode. empty: the result if no rows arrive."""
+    return Reservoir(k, seed, empty) if bd_data.STREAMING else Collect(empty)
@@ -0,0 +1,182 @@
+"""
+bd_synth — deterministic synthetic Tamil Nadu data for benchmarks.
+
+Generates the four collections the BD_Q* queries read, shaped like the real ones:
+
+    towers_clean_fixed       Point, clustered around towns (rural gaps are real)
+    population_points_fixed  Point + properties.name (repeating names, some unnamed)
+    districs                 Voronoi-partitioned Polygons, properties.district / st_nm
+    road_network             2-point LineString segments joining nearby road nodes
+
+Arrays are generated with NumPy and only turned into documents chunk by chunk
+while loading, so the 1M scale does not hold a million dicts in memory.
+write_snapshot() skips the database altogether and writes bd_snapshot's columnar
+files directly — the stand-in that scales to 1M without a mongod — and
+write_road_graph() does the same for bd_roads' compiled road graph.
+
+    data = generate(100_000, seed=7)
+    load(bd_data.get_db(), data)            # or: write_snapshot(data, ".bd_bench_snapshot")
+"""
+import numpy as np
+import shapely
+from shapely.geometry import mapping
+
+import bd_data
+
+# lon_min, lat_min, lon_max, lat_max
+TN_BBOX = (76.2, 8.0, 80.35, 13.6)
+N_DISTRICTS = 38
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+
+def parse_scale(label):
+    """'10k' / '100k' / '1m' or a plain integer → (label, settlement count)."""
+    label = str(label).lower()
+    if label in SCALES:
+        return label, SCALES[label]
+    return label, int(label)
+
+
+# ─────────────────────────────────────────────
+#  GENERATORS
+# ─────────────────────────────────────────────
+def _uniform(rng, n):
+    x0, y0, x1, y1 = TN_BBOX
+    return np.column_stack([rng.uniform(x0, x1, n), rng.uniform(y0, y1, n)])
+
+
+def _clustered(rng, n, towns, clustered_frac, spread_deg):
+    """n points: clustered_frac scattered around random towns (Gaussian), the rest uniform."""
+    k = int(n * clustered_frac)
+    around = towns[rng.integers(0, len(towns), k)] + rng.normal(0.0, spread_deg, (k, 2))
+    pts = np.vstack([around, _uniform(rng, n - k)])
+    x0, y0, x1, y1 = TN_BBOX
+    pts[:, 0] = np.clip(pts[:, 0], x0, x1)
+    pts[:, 1] = np.clip(pts[:, 1], y0, y1)
+    return pts[rng.permutation(n)]
+
+
+def _districts(rng):
+    seeds = shapely.multipoints(_uniform(rng, N_DISTRICTS))
+    bbox = shapely.box(*TN_BBOX)
+    cells = shapely.intersection(shapely.get_parts(shapely.voronoi_polygons(seeds, extend_to=bbox)), bbox)
+    docs = [{"geometry": mapping(c), "properties": {"district": f"District {k:02d}", "st_nm": "Tamil Nadu"}}
+            for k, c in enumerate(cells)]
+    # A neighbouring state west of the box, so state filters have something to exclude
+    x0, y0, _, y1 = TN_BBOX
+    docs.append({"geometry": mapping(shapely.box(x0 - 1.0, y0, x0, y1)),
+                 "properties": {"district": "Outside 00", "st_nm": "Kerala"}})
+    return docs
+
+
+def _roads(rng, n_segments, towns):
+    """Road nodes (towns + scattered junctions), each joined to its 3 nearest neighbours."""
+    import bd_geo
+    n_nodes = max(n_segments // 2, len(towns) + 1)
+    nodes = np.vstack([towns, _clustered(rng, n_nodes - len(towns), towns, 0.7, 0.15)])
+    _, nbr = bd_geo.build_point_index(nodes).query(bd_geo.project(nodes[:, 0], nodes[:, 1]), k=4)
+    a = np.repeat(np.arange(len(nodes)), 3)
+    b = nbr[:, 1:].ravel()
+    edges = np.unique(np.sort(np.column_stack([a, b]), axis=1), axis=0)
+    edges = edges[rng.permutation(len(edges))[:n_segments]]
+    return nodes[edges]          # (m, 2, 2) — segment × endpoint × [lon, lat]
+
+
+def generate(n_settlements, seed=0, towers_per_settlement=0.25, roads_per_settlement=0.1):
+    """
+    Synthetic data at a given settlement count → dict of arrays / documents:
+    {"towers": (n, 2), "settlements": (n, 2), "names": list, "districts": [docs], "roads": (m, 2, 2)}.
+    """
+    rng = np.random.default_rng(seed)
+    n_towns = max(20, n_settlements // 2_000)
+    towns = _uniform(rng, n_towns)
+
+    n_towers = max(1, int(n_settlements * towers_per_settlement))
+    towers = _clustered(rng, n_towers, towns, clustered_frac=0.8, spread_deg=0.08)
+    settlements = _clustered(rng, n_settlements, towns, clustered_frac=0.5, spread_deg=0.25)
+
+    # Village names repeat across the state; ~5% of points are unnamed
+    codes = rng.integers(0, max(1, n_settlements // 3), n_settlements)
+    unnamed = rng.random(n_settlements) < 0.05
+    names = [None if u else f"Village {c}" for c, u in zip(codes.tolist(), unnamed.tolist())]
+
+    return {
+        "towers": towers,
+        "settlements": settlements,
+        "names": names,
+        "districts": _districts(rng),
+        "roads": _roads(rng, max(1, int(n_settlements * roads_per_settlement)), towns),
+    }
+
+
+# ─────────────────────────────────────────────
+#  LOADING
+# ─────────────────────────────────────────────
+def _point_docs(coords, names=None):
+    docs = []
+    for k, (lon, lat) in enumerate(coords.tolist()):
+        doc = {"geometry": {"type": "Point", "coordinates": [lon, lat]}}
+        if names is not None:
+            doc["properties"] = {"name": names[k]}
+        docs.append(doc)
+    return docs
+
+
+def _road_docs(segments):
+    return [{"geometry": {"type": "LineString", "coordinates": seg}, "properties": {"highway": "road"}}
+            for seg in segments.tolist()]
+
+
+def synthetic_ids(n):
+    """n distinct ObjectIds as raw (n, 12) uint8 bytes: fixed timestamp + big-endian counter."""
+    raw = np.zeros((n, 12), dtype=np.uint8)
+    raw[:, :4] = np.frombuffer(np.array([1_700_000_000], dtype=">u4").tobytes(), dtype=np.uint8)
+    raw[:, 4:] = np.arange(n, dtype=">u8").view(np.uint8).reshape(n, 8)
+    return raw
+
+
+def write_snapshot(data, snapshot_dir):
+    """Write generated data straight into a bd_snapshot directory (no database involved)."""
+    import bd_snapshot
+    jobs = {
+        bd_data.TOWERS_COLLECTION: lambda d: bd_snapshot.write_points(
+            d, data["towers"], synthetic_ids(len(data["towers"]))),
+        bd_data.POPULATION_COLLECTION: lambda d: bd_snapshot.write_points(
+            d, data["settlements"], synthetic_ids(len(data["settlements"])), data["names"]),
+        bd_data.DISTRICTS_COLLECTION: lambda d: bd_snapshot.write_districts(d, data["districts"]),
+    }
+    counts = {}
+    for name, writer in jobs.items():
+        meta = bd_snapshot.write_collection(name, writer, {"count": None, "max_id": "synthetic"},
+                                            snapshot_dir)
+        counts[name] = meta["rows"]
+    return counts
+
+
+def write_road_graph(data, graph_dir=None):
+    """Compile the generated road segments straight into bd_roads' graph cache."""
+    import bd_roads
+    graph = bd_roads.compile_graph(data["roads"])
+    bd_roads.save_graph(graph, {"count": len(data["roads"]), "max_id": "synthetic"},
+                        graph_dir or bd_roads.GRAPH_DIR)
+    return len(graph["nodes"])
+
+
+def load(db, data, drop=True, chunk_size=50_000):
+    """Insert generated data into db's four collections, chunk by chunk. Returns row counts."""
+    jobs = {
+        bd_data.TOWERS_COLLECTION: (len(data["towers"]), lambda s, e: _point_docs(data["towers"][s:e])),
+        bd_data.POPULATION_COLLECTION: (len(data["settlements"]),
+                                        lambda s, e: _point_docs(data["settlements"][s:e], data["names"][s:e])),
+        bd_data.DISTRICTS_COLLECTION: (len(data["districts"]), lambda s, e: [dict(d) for d in data["districts"][s:e]]),
+        bd_data.ROADS_COLLECTION: (len(data["roads"]), lambda s, e: _road_docs(data["roads"][s:e])),
+    }
+    counts = {}
+    for name, (n, docs) in jobs.items():
+        coll = db[name]
+        if drop:
+            coll.drop()
+        for start in range(0, n, chunk_size):
+            coll.insert_many(docs(start, min(start + chunk_size, n)), ordered=False)
+        counts[name] = n
+    return counts
@@ -0,0 +1,240 @@
+"""
+bd_tiles — static XYZ PNG tile pyramids rendered with NumPy.
+
+Point values are quantised to a 255-colour palette, stamped into Web-Mercator
+pixels at each zoom level as small discs (max per pixel, so isolated settlements
+stay visible) and written as palette PNGs under {z}/{x}/{y}.png. The browser
+only fetches pre-drawn images, so map load time no longer depends on point count.
+"""
+import os
+import shutil
+import struct
+import zlib
+
+import numpy as np
+
+TILE_SIZE = 256
+
+# Same ramp the old folium HeatMap used: blue → cyan → yellow → orange → red
+DEFAULT_STOPS = {
+    0.0: "#0000ff", 0.2: "#0000ff", 0.4: "#00ffff",
+    0.6: "#ffff00", 0.8: "#ffa500", 1.0: "#ff0000",
+}
+
+
+def lonlat_to_pixel(lon, lat, zoom):
+    """Vectorized lon/lat → global Web-Mercator pixel coordinates (int64) at zoom."""
+    scale = TILE_SIZE * (1 << zoom)
+    lat = np.radians(np.clip(np.asarray(lat, dtype=float), -85.0511, 85.0511))
+    x = (np.asarray(lon, dtype=float) + 180.0) / 360.0 * scale
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / np.pi) / 2.0 * scale
+    return (np.clip(x, 0, scale - 1).astype(np.int64),
+            np.clip(y, 0, scale - 1).astype(np.int64))
+
+
+def colour_lut(stops=None):
+    """Gradient stops {fraction: '#rrggbb'} → (256, 3) uint8 lookup table."""
+    stops = stops or DEFAULT_STOPS
+    pos = np.array(sorted(stops), dtype=float)
+    rgb = np.array([[int(stops[p][k:k + 2], 16) for k in (1, 3, 5)] for p in sorted(stops)],
+                   dtype=float)
+    ramp = np.linspace(0.0, 1.0, 256)
+    return np.stack([np.interp(ramp, pos, rgb[:, c]) for c in range(3)], axis=1).astype(np.uint8)
+
+
+def write_png(path, indices, palette, alpha=255):
+    """
+    Minimal palette PNG encoder (zlib + struct) — no imaging library needed.
+    indices : (h, w) uint8, 0 = transparent, k ≥ 1 = palette[k - 1].
+    """
+    h, w = indices.shape
+    raw = np.zeros((h, w + 1), dtype=np.uint8)   # leading 0 = filter type "None"
+    raw[:, 1:] = indices
+    plte = np.vstack([np.zeros((1, 3), dtype=np.uint8), palette]).tobytes()
+    trns = bytes([0]) + bytes([alpha]) * len(palette)
+
+    def chunk(tag, data):
+        return (struct.pack(">I", len(data)) + tag + data
+                + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF))
+
+    with open(path, "wb") as f:
+        f.write(b"\x89PNG\r\n\x1a\n")
+        f.write(chunk(b"IHDR", struct.pack(">IIBBBBB", w, h, 8, 3, 0, 0, 0)))
+        f.write(chunk(b"PLTE", plte))
+        f.write(chunk(b"tRNS", trns))
+        f.write(chunk(b"IDAT", zlib.compress(raw.tobytes(), 6)))
+        f.write(chunk(b"IEND", b""))
+
+
+def _disc_offsets(radius):
+    yy, xx = np.mgrid[-radius:radius + 1, -radius:radius + 1]
+    inside = xx ** 2 + yy ** 2 <= radius ** 2
+    return yy[inside], xx[inside]
+
+
+def _fan_out(gx, gy, r):
+    """
+    (tile x, tile y, point index) for every tile a radius-r disc around each pixel touches.
+    A point can bleed into the neighbouring tile when it sits within r px of an edge,
+    so it fans out to up to 4 tiles (for r < 256).
+    """
+    parts = []
+    for ox in (0, 1):
+        for oy in (0, 1):
+            tx = (gx - r) // TILE_SIZE + ox
+            ty = (gy - r) // TILE_SIZE + oy
+            hit = (tx <= (gx + r) // TILE_SIZE) & (ty <= (gy + r) // TILE_SIZE)
+            parts.append((tx[hit], ty[hit], np.flatnonzero(hit)))
+    return (np.concatenate(p) for p in zip(*parts))
+
+
+def tile_keys(lon, lat, zooms=range(6, 13), radius_px=4):
+    """{zoom: sorted unique tile keys (x * 2**z + y)} of every tile the points' discs touch."""
+    keys = {}
+    for z in zooms:
+        gx, gy = lonlat_to_pixel(lon, lat, z)
+        tx, ty, _ = _fan_out(gx, gy, int(radius_px))
+        keys[z] = np.unique(tx * (1 << z) + ty)
+    return keys
+
+
+def _colours(values, vmax):
+    """Values → palette indices 1..255 (0 is reserved for "empty"), clipped to [0, vmax]."""
+    values = np.clip(np.asarray(values, dtype=float), 0.0, vmax)
+    return (1 + np.round(values / vmax * 254)).astype(np.uint8)
+
+
+def render_tile_pyramid(lon, lat, values, out_dir, zooms=range(6, 13), vmax=30.0,
+                        radius_px=4, stops=None, alpha=200, only=None):
+    """
+    Rasterize point values into a PNG tile pyramid under out_dir/{z}/{x}/{y}.png.
+    Values are clipped to [0, vmax] before colouring; only non-empty tiles are written.
+    only: {zoom: tile keys} (see tile_keys) — re-render just those tiles in place and
+    leave the rest of an existing pyramid untouched.
+    Returns the number of tiles written.
+    """
+    colour = _colours(values, vmax)
+    if only is None and os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+
+    n_tiles = 0
+    for z in zooms:
+        if only is not None and not len(only.get(z, ())):
+            continue
+        gx, gy = lonlat_to_pixel(lon, lat, z)
+        n_tiles += _render_zoom(gx, gy, colour, z, out_dir, radius_px, stops, alpha,
+                                None if only is None else only[z])
+    return n_tiles
+
+
+def copy_pyramid(src_dir, out_dir):
+    """Replace out_dir with a copy of an already rendered pyramid. Returns the number of tiles copied."""
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    shutil.copytree(src_dir, out_dir)
+    return sum(f.endswith(".png") for _, _, files in os.walk(out_dir) for f in files)
+
+
+def _render_zoom(gx, gy, colour, z, out_dir, radius_px, stops, alpha, only_keys):
+    """Stamp global pixels (gx, gy) with palette indices colour into zoom z's tiles. Returns tiles written."""
+    palette = colour_lut(stops)[1:]    # 255 colours, index 0 is reserved for "empty"
+    r = int(radius_px)
+    pad = 2 * r                      # tile-local coords span ±r, plus ±r for the disc
+    size = TILE_SIZE + 2 * pad
+    dy, dx = _disc_offsets(r)
+
+    tx, ty, k = _fan_out(gx, gy, r)
+    key = tx * (1 << z) + ty
+    if only_keys is not None:
+        keep = np.isin(key, only_keys)
+        tx, ty, k, key = tx[keep], ty[keep], k[keep], key[keep]
+    lx = gx[k] - tx * TILE_SIZE + pad
+    ly = gy[k] - ty * TILE_SIZE + pad
+    c = colour[k]
+
+    order = np.argsort(key, kind="stable")
+    key, tx, ty, lx, ly, c = key[order], tx[order], ty[order], lx[order], ly[order], c[order]
+    starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+    ends = np.r_[starts[1:], len(key)]
+
+    n_tiles = 0
+    for s, e in zip(starts, ends):
+        # Many points share a pixel at low zooms: keep each pixel's highest colour,
+        # then stamp the disc offset by offset (pixels are unique, so no ufunc.at)
+        packed = np.sort((ly[s:e] * size + lx[s:e]) * 256 + c[s:e])
+        packed = packed[np.r_[packed[1:] >> 8 != packed[:-1] >> 8, True]]
+        pix = packed >> 8
+        py, px, pc = pix // size, pix % size, (packed & 255).astype(np.uint8)
+
+        # Higher palette index = farther = wins
+        canvas = np.zeros((size, size), dtype=np.uint8)
+        for oy, ox in zip(dy.tolist(), dx.tolist()):
+            rows, cols = py + oy, px + ox
+            canvas[rows, cols] = np.maximum(canvas[rows, cols], pc)
+
+        tile_dir = os.path.join(out_dir, str(z), str(int(tx[s])))
+        os.makedirs(tile_dir, exist_ok=True)
+        write_png(os.path.join(tile_dir, f"{int(ty[s])}.png"),
+                  canvas[pad:pad + TILE_SIZE, pad:pad + TILE_SIZE], palette, alpha)
+        n_tiles += 1
+    return n_tiles
+
+
+class PixelMax:
+    """
+    Running per-pixel maximum colour at one zoom, folded in batch by batch, so a
+    pyramid can be rendered from a stream: memory follows the occupied pixels, not
+    the point count. Lower zooms are exact — a pixel at z - 1 is its z pixel halved.
+    """
+
+    MERGE_MIN = 1 << 20     # pending pixels before the first merge
+
+    def __init__(self, zoom, vmax=30.0):
+        self.zoom = zoom
+        self.vmax = vmax
+        self.packed = np.empty(0, dtype=np.int64)   # sorted ((gy << zoom + 8) + gx) << 8 | colour, one per pixel
+        self.pending = []
+        self.n_pending = 0
+
+    def add(self, lon, lat, values):
+        gx, gy = lonlat_to_pixel(lon, lat, self.zoom)
+        self.pending.append((((gy << (self.zoom + 8)) + gx) << 8) | _colours(values, self.vmax))
+        self.n_pending += len(gx)
+        # Merge once pending outgrows the merged set — O(n log n) overall
+        if self.n_pending >= max(len(self.packed), self.MERGE_MIN):
+            self._merge()
+
+    def _merge(self):
+        if self.pending:
+            self.packed = _max_per_pixel(np.concatenate([self.packed] + self.pending))
+            self.pending, self.n_pending = [], 0
+
+    def pixels(self, z):
+        """(gx, gy, colour) of every occupied pixel at zoom z ≤ self.zoom."""
+        self._merge()
+        pix = self.packed >> 8
+        gx, gy = pix & ((1 << (self.zoom + 8)) - 1), pix >> (self.zoom + 8)
+        shift = self.zoom - z
+        if shift:
+            packed = _max_per_pixel((((gy >> shift) << (z + 8)) + (gx >> shift)) << 8 | (self.packed & 255))
+            pix = packed >> 8
+            return pix & ((1 << (z + 8)) - 1), pix >> (z + 8), (packed & 255).astype(np.uint8)
+        return gx, gy, (self.packed & 255).astype(np.uint8)
+
+    def render(self, out_dir, zooms=range(6, 13), radius_px=4, stops=None, alpha=200):
+        """Write the pyramid (zooms ≤ self.zoom) like render_tile_pyramid. Returns the number of tiles."""
+        if os.path.isdir(out_dir):
+            shutil.rmtree(out_dir)
+        n_tiles = 0
+        for z in zooms:
+            gx, gy, colour = self.pixels(z)
+            n_tiles += _render_zoom(gx, gy, colour, z, out_dir, radius_px, stops, alpha, None)
+        return n_tiles
+
+
+def _max_per_pixel(packed):
+    """Sorted packed pixel << 8 | colour values, keeping only each pixel's highest colour."""
+    if len(packed) == 0:
+        return packed
+    packed = np.sort(packed)
+    return packed[np.r_[packed[1:] >> 8 != packed[:-1] >> 8, True]]
@@ -0,0 +1,258 @@
+"""
+bd_trace — per-query instrumentation: phase timers, MongoDB round-trips, profiling.
+
+Off by default; every hook is a no-op until enable() is called and a query() is open.
+
+  • phases  — each query marks where it is with phase("compute") / phase("render");
+              bd_data's loaders are timed as "fetch" and bd_render.save_map as
+              "save" automatically. Times are exclusive (a fetch inside compute is
+              only counted once), so the spans of a query add up to its wall time.
+  • mongo   — a pymongo CommandListener attributes every command to the open query:
+              count per command name, request / reply bytes and server-side time.
+              It is registered globally, so enable() must run before the first
+              MongoClient is created (bd_data creates its client lazily).
+  • profile — optional "cprofile" (top functions by cumulative time) or
+              "tracemalloc" (peak traced memory and top allocation sites) per query.
+
+    bd_trace.enable(profile="tracemalloc")
+    with bd_trace.query("Q2"):
+        query2_uncovered_settlements()
+    bd_trace.write_report("trace.json")
+"""
+import contextlib
+import cProfile
+import datetime
+import json
+import pstats
+import sys
+import time
+import tracemalloc
+
+import bson
+from pymongo import monitoring
+
+PROFILES = ("cprofile", "tracemalloc")
+TOP_N = 15
+
+_enabled = False
+_profile = None
+_report = None      # report dict of the open query
+_stack = []         # open spans: [name, time spent in child spans]
+_lap = None         # the span opened by phase()
+_reports = []
+_started = None
+_unattributed = None
+
+
+def _mongo_totals():
+    return {"commands": 0, "failed": 0, "by_command": {}, "request_bytes": 0,
+            "reply_bytes": 0, "server_ms": 0.0}
+
+
+def _bson_size(doc):
+    try:
+        return len(bson.encode(doc))
+    except Exception:       # raw / unencodable replies are counted as 0 bytes
+        return 0
+
+
+class _MongoListener(monitoring.CommandListener):
+    """Attributes each command to the open query (or to the run when none is open)."""
+
+    def __init__(self):
+        self.request_bytes = {}
+
+    def _bucket(self):
+        if not _enabled:
+            return None
+        return _report["mongo"] if _report is not None else _unattributed
+
+    def started(self, event):
+        if self._bucket() is not None:
+            self.request_bytes[event.request_id] = _bson_size(event.command)
+
+    def _finish(self, event, reply_bytes, failed):
+        request_bytes = self.request_bytes.pop(event.request_id, 0)
+        m = self._bucket()
+        if m is None:
+            return
+        m["commands"] += 1
+        m["failed"] += failed
+        m["by_command"][event.command_name] = m["by_command"].get(event.command_name, 0) + 1
+        m["request_bytes"] += request_bytes
+        m["reply_bytes"] += reply_bytes
+        m["server_ms"] += event.duration_micros / 1000.0
+
+    def succeeded(self, event):
+        self._finish(event, _bson_size(event.reply), 0)
+
+    def failed(self, event):
+        self._finish(event, 0, 1)
+
+
+_listener = None
+
+
+def enable(profile=None):
+    """Turn instrumentation on for the rest of the process. profile: None, "cprofile" or "tracemalloc"."""
+    global _enabled, _profile, _listener, _started, _unattributed
+    if profile not in (None,) + PROFILES:
+        raise ValueError(f"profile must be one of {PROFILES} or None, got {profile!r}")
+    _enabled, _profile = True, profile
+    _started = datetime.datetime.now(datetime.timezone.utc)
+    _unattributed = _mongo_totals()
+    if _listener is None:
+        _listener = _MongoListener()
+        monitoring.register(_listener)
+
+
+def disable():
+    """Stop collecting (already collected reports are kept)."""
+    global _enabled
+    _enabled = False
+
+
+def enabled():
+    return _enabled
+
+
+# ─────────────────────────────────────────────
+#  SPANS
+# ─────────────────────────────────────────────
+@contextlib.contextmanager
+def span(name):
+    """Time a block under name (exclusive of nested spans). No-op outside a query()."""
+    if _report is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    _stack.append([name, 0.0])
+    try:
+        yield
+    finally:
+        _, child = _stack.pop()
+        elapsed = time.perf_counter() - t0
+        spans = _report["spans"]
+        spans[name] = spans.get(name, 0.0) + elapsed - child
+        if _stack:
+            _stack[-1][1] += elapsed
+
+
+def phase(name):
+    """Lap marker: close the query's current phase and start timing the next one."""
+    global _lap
+    if _report is None:
+        return
+    _end_lap()
+    _lap = span(name)
+    _lap.__enter__()
+
+
+def _end_lap():
+    global _lap
+    if _lap is not None:
+        _lap.__exit__(None, None, None)
+        _lap = None
+
+
+def traced(iterable, name="fetch"):
+    """Wrap an iterator so the time spent producing each item is recorded under name."""
+    it = iter(iterable)
+    while True:
+        with span(name):
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+        yield item
+
+
+# ─────────────────────────────────────────────
+#  QUERY REPORTS
+# ─────────────────────────────────────────────
+@contextlib.contextmanager
+def query(label):
+    """Collect one report for the enclosed query run. Yields the report dict (None when disabled)."""
+    global _report
+    if not _enabled:
+        yield None
+        return
+
+    report = {"query": label, "wall_s": 0.0, "spans": {}, "mongo": _mongo_totals()}
+    _report = report
+    prof = None
+    if _profile == "cprofile":
+        prof = cProfile.Profile()
+        prof.enable()
+    elif _profile == "tracemalloc":
+        tracemalloc.start()
+
+    t0 = time.perf_counter()
+    try:
+        yield report
+    finally:
+        _end_lap()
+        report["wall_s"] = time.perf_counter() - t0
+        report["spans"]["other"] = max(0.0, report["wall_s"] - sum(report["spans"].values()))
+        if prof is not None:
+            prof.disable()
+            report["profile"] = _cprofile_top(prof)
+        elif _profile == "tracemalloc":
+            report["profile"] = _tracemalloc_top()
+            tracemalloc.stop()
+        _stack.clear()
+        _report = None
+        _reports.append(report)
+
+
+def _cprofile_top(prof):
+    stats = pstats.Stats(prof)
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:TOP_N]
+    return {"kind": "cprofile", "top": [
+        {"function": f"{file}:{line}({func})", "ncalls": nc, "tottime_s": tt, "cumtime_s": ct}
+        for (file, line, func), (_, nc, tt, ct, _) in rows
+    ]}
+
+
+def _tracemalloc_top():
+    _, peak = tracemalloc.get_traced_memory()
+    top = tracemalloc.take_snapshot().statistics("lineno")[:TOP_N]
+    return {"kind": "tracemalloc", "peak_mb": peak / 1e6, "top": [
+        {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "size_mb": s.size / 1e6,
+         "count": s.count}
+        for s in top
+    ]}
+
+
+def record(report):
+    """Add a report produced elsewhere (e.g. in a worker process) to this run's reports."""
+    if report is not None:
+        _reports.append(report)
+
+
+def reports():
+    return list(_reports)
+
+
+def summary_line(report):
+    """One-line "fetch 1.2s · compute 0.4s · … · 3 cmds" rendering of a report."""
+    parts = [f"{k} {v:.2f}s" for k, v in report["spans"].items() if v >= 0.005]
+    m = report["mongo"]
+    if m["commands"]:
+        parts.append(f"{m['commands']} cmds, {m['reply_bytes'] / 1e6:.2f} MB")
+    return " · ".join(parts)
+
+
+def write_report(path, extra=None):
+    """Write every collected report plus run metadata as JSON."""
+    out = {
+        "started": _started.isoformat(timespec="seconds") if _started else None,
+        "argv": sys.argv,
+        "profile": _profile,
+        "queries": _reports,
+        "mongo_outside_queries": _unattributed,
+    }
+    out.update(extra or {})
+    with open(path, "w") as f:
+        json.dump(out, f, indent=2, default=str)
+    print(f"  ✅ Saved: {path}")